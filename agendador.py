@@ -0,0 +1,237 @@
+# Serviço residente: mantém a VPN e as conexões Firebird aquecidas e roda os
+# jobs (imagem resumo das entradas e PDFs de OS) em intervalos configuráveis.
+# Cada execução paga só a consulta e a renderização — sem subir a VPN, importar
+# as bibliotecas ou conectar de novo a cada vez, como no cron.
+#
+# Uso: python agendador.py --intervalo-resumo 300 --intervalo-relatorios 3600
+# Os PDFs seguem a semana corrente (--periodo semana_atual), salvo outro
+# período em --relatorios-args.
+import argparse
+import os
+import shlex
+import signal
+import threading
+import time
+
+from dotenv import load_dotenv
+
+import gerar_imagem_resumo_entradas as resumo
+import gerar_relatorios_os as relatorios
+import metricas
+from consultas_os import executar, liberar_preparados
+from vpn_manager import start_vpn, stop_vpn_se_iniciada, tunnel_ativo
+
+load_dotenv()
+
+# Intervalos em segundos (0 desliga o job)
+INTERVALO_RESUMO = float(os.getenv("AGENDADOR_INTERVALO_RESUMO", "300"))
+INTERVALO_RELATORIOS = float(os.getenv("AGENDADOR_INTERVALO_RELATORIOS", "3600"))
+# Ping das conexões entre jobs: mantém o túnel/NAT ativo e detecta quedas cedo
+INTERVALO_SAUDE = float(os.getenv("AGENDADOR_INTERVALO_SAUDE", "60"))
+
+SQL_SAUDE = "SELECT 1 FROM RDB$DATABASE"
+
+
+class ConexaoQuente:
+    """
+    Conexão Firebird reaproveitada entre execuções. obter() testa a conexão
+    (SQL_SAUDE) e, se ela caiu, garante a VPN e reconecta com fabrica().
+    """
+
+    def __init__(self, nome, fabrica):
+        self.nome = nome
+        self.fabrica = fabrica
+        self.conn = None
+        self.reconexoes = 0
+
+    def _saudavel(self):
+        if self.conn is None or getattr(self.conn, "closed", False):
+            return False
+        try:
+            executar(self.conn, SQL_SAUDE).fetchone()
+            # Encerra a transação: o fdb usa snapshot por padrão, e uma transação
+            # longa faria os jobs seguintes enxergarem dados antigos
+            self.conn.rollback()
+            return True
+        except Exception as e:
+            print(f"[{self.nome}] conexão indisponível: {e}")
+            return False
+
+    def fechar(self):
+        if self.conn is None:
+            return
+        liberar_preparados(self.conn)
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+        self.conn = None
+
+    def obter(self):
+        """
+        Conexão pronta para uso, em transação nova.
+        """
+        if self._saudavel():
+            return self.conn
+        self.fechar()
+        if not tunnel_ativo() and not start_vpn():
+            raise ConnectionError("VPN indisponível")
+        inicio = time.monotonic()
+        self.conn = self.fabrica()
+        self.reconexoes += 1
+        print(f"[{self.nome}] conectado ao Firebird em {time.monotonic() - inicio:.2f}s "
+              f"(conexão nº {self.reconexoes})")
+        return self.conn
+
+    def liberar(self):
+        # Fim do job: não deixa transação aberta segurando o snapshot
+        if self.conn is not None:
+            try:
+                self.conn.rollback()
+            except Exception:
+                pass
+
+
+class Tarefa:
+    def __init__(self, nome, intervalo, funcao):
+        self.nome = nome
+        self.intervalo = intervalo
+        self.funcao = funcao
+        self.proxima = time.monotonic()
+        self.execucoes = 0
+        self.falhas = 0
+
+    def rodar(self):
+        inicio = time.monotonic()
+        try:
+            self.funcao()
+            print(f"[{self.nome}] concluído em {time.monotonic() - inicio:.2f}s")
+        except Exception as e:
+            self.falhas += 1
+            print(f"[{self.nome}] erro após {time.monotonic() - inicio:.2f}s: {e}")
+        self.execucoes += 1
+        # Intervalo contado do início; se atrasou, não tenta "recuperar" execuções perdidas
+        self.proxima = max(inicio + self.intervalo, time.monotonic())
+
+
+def rodar_agendador(tarefas, conexoes, parar, intervalo_saude=INTERVALO_SAUDE, uma_vez=False):
+    """
+    Laço principal: roda as tarefas vencidas e, entre elas, testa as conexões
+    a cada intervalo_saude. Termina quando o evento parar é acionado (ou após
+    uma rodada de cada tarefa, com uma_vez=True).
+    """
+    proxima_saude = time.monotonic() + intervalo_saude
+    while not parar.is_set():
+        for tarefa in tarefas:
+            if parar.is_set():
+                break
+            if time.monotonic() >= tarefa.proxima:
+                tarefa.rodar()
+        if uma_vez:
+            break
+
+        agora = time.monotonic()
+        if intervalo_saude > 0 and agora >= proxima_saude:
+            for conexao in conexoes:
+                try:
+                    conexao.obter()
+                    conexao.liberar()
+                except Exception as e:
+                    print(f"[{conexao.nome}] falha ao reconectar: {e}")
+            proxima_saude = time.monotonic() + intervalo_saude
+
+        prazos = [t.proxima for t in tarefas]
+        if intervalo_saude > 0:
+            prazos.append(proxima_saude)
+        parar.wait(max(0.0, min(prazos) - time.monotonic()))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Agendador residente dos relatórios de entradas")
+    parser.add_argument("--intervalo-resumo", type=float, default=INTERVALO_RESUMO,
+                        help="segundos entre as imagens resumo (0 desliga)")
+    parser.add_argument("--intervalo-relatorios", type=float, default=INTERVALO_RELATORIOS,
+                        help="segundos entre os PDFs de OS (0 desliga)")
+    parser.add_argument("--intervalo-saude", type=float, default=INTERVALO_SAUDE,
+                        help="segundos entre os testes das conexões ociosas (0 desliga)")
+    parser.add_argument("--renderer", choices=["pillow", "matplotlib"],
+                        default=os.getenv("ENTRADAS_RENDERER", "pillow"),
+                        help="backend da imagem resumo")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="imagem resumo a partir do snapshot local")
+    parser.add_argument("--por-grupo", action="store_true",
+                        help="imagem resumo também por filial e por vendedor (ver gerar_imagem_resumo_entradas)")
+    parser.add_argument("--relatorios-args", default=os.getenv("AGENDADOR_RELATORIOS_ARGS", ""),
+                        help='argumentos repassados a gerar_relatorios_os (ex.: "--fast-table --workers 2"); '
+                             'sem período informado, usa --periodo semana_atual')
+    parser.add_argument("--uma-vez", action="store_true",
+                        help="roda cada job uma vez e sai (teste)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    args_relatorios = relatorios.parse_args(shlex.split(args.relatorios_args))
+    if not (args_relatorios.periodo or args_relatorios.dt_ini or args_relatorios.backfill):
+        # Serviço residente: acompanha a semana corrente em vez do período fixo da execução avulsa
+        args_relatorios.periodo = "semana_atual"
+
+    # Charsets diferentes em cada script: uma conexão quente para cada job
+    conn_resumo = ConexaoQuente("resumo", resumo.conectar)
+    conn_relatorios = ConexaoQuente("relatorios", lambda: relatorios.get_conn(relatorios.db_config_padrao()))
+
+    def job_resumo():
+        with metricas.execucao("resumo"):
+            try:
+                with metricas.span("conexao"):
+                    con = conn_resumo.obter()
+                resumo.gerar_resumo(con, renderer=args.renderer, snapshot=args.snapshot, por_grupo=args.por_grupo)
+            finally:
+                conn_resumo.liberar()
+
+    def job_relatorios():
+        with metricas.execucao("relatorios") as ex:
+            try:
+                with metricas.span("conexao"):
+                    con = conn_relatorios.obter()
+                gerados, falhas = relatorios.executar_relatorios(con, args_relatorios)
+                ex.contar(documentos=len(gerados), falhas=len(falhas))
+            finally:
+                conn_relatorios.liberar()
+
+    tarefas, conexoes = [], []
+    if args.intervalo_resumo > 0:
+        tarefas.append(Tarefa("resumo", args.intervalo_resumo, job_resumo))
+        conexoes.append(conn_resumo)
+    if args.intervalo_relatorios > 0:
+        tarefas.append(Tarefa("relatorios", args.intervalo_relatorios, job_relatorios))
+        conexoes.append(conn_relatorios)
+    if not tarefas:
+        print("Nenhum job habilitado.")
+        return
+
+    parar = threading.Event()
+
+    def _sinal(signum, frame):
+        print(f"Sinal {signum} recebido; encerrando após o job atual.")
+        parar.set()
+
+    signal.signal(signal.SIGTERM, _sinal)
+    signal.signal(signal.SIGINT, _sinal)
+
+    if not start_vpn():
+        print("Erro ao iniciar a VPN. Abortando execução.")
+        return
+
+    try:
+        rodar_agendador(tarefas, conexoes, parar, intervalo_saude=args.intervalo_saude, uma_vez=args.uma_vez)
+    finally:
+        for conexao in conexoes:
+            conexao.fechar()
+        for tarefa in tarefas:
+            print(f"[{tarefa.nome}] {tarefa.execucoes} execução(ões), {tarefa.falhas} falha(s)")
+        stop_vpn_se_iniciada()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,54 @@
-QUERY_ENTRADA_DETALHADO = """
-    Select /* Quebra */
-	       o.situacao, case o.situacao
-	                   when '90' then 'Cancelado'
-	                   when '99' then 'Encerrado' 
-	                   else s.descricao end desc_situacao,
-	        REPLACE(L.descricao, 'REMESSA RETORNO - ', '') AS descricao_linha, --acrescentado por Michele
-	       /* Ordem */
-	       --:EX_RESUMO RESUMIDO,
-	       o.ordem, o.abertura, o.cadastro,  t.nome,
-	       /* Equipamento */
-	       e.produto RR, e.descricao desc_equipamento,
-	       /*Previa conclusao*/
-	       cast(o.Ent_Prev as date) Prev_Conclusao,
-	       /* Vendedor */
-	       o.vendedor, v.nomered nome_vendedor,
-	       t.vendedortmk vendedor_interno, v2.nomered nome_vend_interno
-	  From osordem o
-	  inner join cadastro t on t.codigo = o.cadastro
-	  inner join osequipamentos e on e.equipamento = o.equipamento
-	  Inner Join Ceprodutos p On p.Produto = e.Produto
-	  LEFT OUTER JOIN celinhas L ON P.LINHA = L.LINHA -- inserido
-	  left outer join ossituacao s on s.situacao = o.situacao
-	  left outer join vendedores v on v.vendedor = o.vendedor
-	  left outer join vendedores v2 on v2.vendedor = t.vendedortmk
-	 Where o.Abertura Between '2025-08-03' and '2025-08-09' 
-	 order by o.situacao, o.ordem
-"""
\ No newline at end of file
+import os
+
+from dotenv import load_dotenv
+
+from consultas_os import SELECT_ENTRADA_DETALHADO, montar_consulta
+
+load_dotenv()
+
+# Nome do logger do DataWrapper (wrapper.py)
+APP_NAME = os.getenv("APP_NAME", "relatorios_entradas")
+
+
+def _consulta_env(nome):
+    """
+    SQL de uma consulta do datalake (Postgres) que não fica no repositório:
+    texto na variável de ambiente nome ou, se nome_ARQUIVO estiver definida,
+    conteúdo desse arquivo .sql. None se não configurada.
+    """
+    arquivo = os.getenv(f"{nome}_ARQUIVO")
+    if arquivo:
+        with open(arquivo, encoding="utf-8") as f:
+            return f.read()
+    return os.getenv(nome) or None
+
+
+# Consultas do DataWrapper (get_*, carregar_todos); sem configuração, a
+# leitura falha com erro claro em vez de impedir o import do wrapper
+QUERY_PAGAMENTO = _consulta_env("QUERY_PAGAMENTO")
+QUERY_GROUP_GEF = _consulta_env("QUERY_GROUP_GEF")
+QUERY_GROUP_EMPENHO = _consulta_env("QUERY_GROUP_EMPENHO")
+QUERY_DATA_VENCIMENTO = _consulta_env("QUERY_DATA_VENCIMENTO")
+
+# Entradas detalhadas por período de abertura.
+# Parâmetros posicionais: (dt_ini, dt_fim), p.ex. cur.execute(QUERY_ENTRADA_DETALHADO, (dt_ini, dt_fim))
+QUERY_ENTRADA_DETALHADO, _ = montar_consulta(
+    SELECT_ENTRADA_DETALHADO,
+    where=("o.Abertura BETWEEN ? AND ?",),
+    order_by="o.situacao, o.ordem",
+)
+
+# Grupos da imagem resumo de entradas (gerar_imagem_resumo_entradas):
+# cada grupo soma as linhas (p.linha) listadas; "chave" define a ordem das
+# linhas na imagem e "meta" o alvo mensal (None = sem meta/percentual).
+# Incluir um grupo aqui não custa consulta extra: a agregação é uma só.
+GRUPOS_ENTRADA = [
+    {"chave": "ZZZZF", "descricao": "Equip. de grande porte", "meta": None,
+     "linhas": ["RR0139", "RR0140", "RR0108", "RR0131", "RR0141", "RR0137", "RR0148", "RR0117"]},
+    {"chave": "ZZZZB", "descricao": "Motores Part / Alt.", "meta": 470, "linhas": ["RR0100", "RR0103"]},
+    {"chave": "ZZZZA", "descricao": "MOTOR EMP CC", "meta": 330, "linhas": ["RR0101"]},
+    {"chave": "ZZZZC", "descricao": "MOTOR EMP CA", "meta": 160, "linhas": ["RR0102"]},
+    {"chave": "ZZZZD", "descricao": "TRANSMISSÃO", "meta": 70, "linhas": ["RR0128"]},
+    {"chave": "ZZZZE", "descricao": "POLIA DE FREIO", "meta": 150, "linhas": ["RR0115"]},
+    {"chave": "ZZZZG", "descricao": "PLACAS ELETRÔNICAS", "meta": 161, "linhas": ["RR0105"]},
+]
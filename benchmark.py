@@ -0,0 +1,235 @@
+# Benchmark offline dos dois geradores, com dados sintéticos (sem Firebird/VPN):
+# PDF de OS (generate_pdf) em 1k/10k/100k linhas e a imagem resumo (PNG).
+# Cada caso roda em um processo novo para medir o pico de memória (RSS) dele.
+#
+#   python benchmark.py --saida bench.json                 # mede e grava
+#   python benchmark.py --baseline bench_base.json         # compara e sinaliza regressões
+#   python benchmark.py --salvar-baseline bench_base.json  # grava como nova referência
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from multiprocessing import get_context
+
+TAMANHOS_PDF = (1_000, 10_000, 100_000)
+
+SITUACOES = [("10", "Aberta"), ("20", "Em análise"), ("30", "Aguardando peça"), ("90", "Cancelado"),
+             ("99", "Encerrado")]
+LINHAS = [("MTR01", "MOTOR EMP CC"), ("MTR02", "MOTOR EMP CA"), ("ALT01", "Motores Part / Alt."),
+          ("BOM01", "BOMBA INJETORA"), ("TUR01", "TURBINA"), ("DIV01", "DIVERSOS")]
+VENDEDORES = [(17, "JOAO"), (29, "MARIA"), (5, "CARLOS"), (8, "ANA"), (12, "PEDRO")]
+NOMES = ["TRANSPORTES", "AGRO", "MINERADORA", "CONSTRUTORA", "LOCADORA", "COMERCIO", "INDUSTRIA"]
+
+
+# ------------ dados sintéticos ------------
+def linhas_detalhe(n, seed=42):
+    """
+    n linhas no formato de gerar_relatorios_os.get_data_from_firebird com
+    com_chaves=True: 12 colunas exibidas (texto) + vendedor, linha e nome
+    reduzido; ordenadas por situação e ordem, como a consulta.
+    """
+    rnd = random.Random(seed)
+    inicio = datetime(2025, 8, 3, 7, 0)
+    rows = []
+    for i in range(n):
+        situacao, desc_sit = rnd.choice(SITUACOES)
+        linha, desc_linha = rnd.choice(LINHAS)
+        vend_id, vend_nome = rnd.choice(VENDEDORES)
+        interno_id, interno_nome = rnd.choice(VENDEDORES)
+        abertura = inicio + timedelta(minutes=rnd.randrange(7 * 24 * 60))
+        nome = f"{rnd.choice(NOMES)} {rnd.choice('ABCDEFGH')}{rnd.randrange(1000)} LTDA"
+        produto = f"RR{rnd.randrange(10000):05d}"
+        rows.append((
+            situacao, desc_sit, desc_linha, str(100000 + i), str(abertura), str(rnd.randrange(1, 99999)),
+            nome, produto, f"{desc_linha} {rnd.choice(['12V', '24V', 'TRIFASICO', 'MONOFASICO'])}",
+            str(abertura.date() + timedelta(days=rnd.randrange(3, 30))),
+            f"{vend_id} - {vend_nome}", f"{interno_id} - {interno_nome}",
+            vend_id, linha, vend_nome,
+        ))
+    rows.sort(key=lambda r: (r[0], int(r[3])))
+    return rows
+
+
+def linhas_resumo(seed=42):
+    """
+    Saída da consulta SELECT_SEMANAS_LINHA (linha, sem01..sem05, total) para
+    todas as linhas dos grupos de appconfig.
+    """
+    import appconfig as cfg
+    rnd = random.Random(seed)
+    saida = []
+    for g in cfg.GRUPOS_ENTRADA:
+        for linha in g["linhas"]:
+            semanas = [rnd.randrange(0, 40) for _ in range(4)] + [rnd.randrange(0, 10)]
+            saida.append((linha, *semanas, sum(semanas)))
+    return saida
+
+
+# ------------ casos ------------
+def _caso_pdf(n, fast, destino):
+    import gerar_relatorios_os as rel
+    rows = linhas_detalhe(n)
+    filtro = rel.texto_filtro(date(2025, 8, 3), date(2025, 8, 9))
+    inicio = time.perf_counter()
+    rel.generate_pdf(destino, rel.strip_chaves(rows), filtro, resumo_linha=rel.resumo_from_rows(rows), fast=fast)
+    return time.perf_counter() - inicio
+
+
+def _caso_png(renderer, destino):
+    import gerar_imagem_resumo_entradas as img
+    por_linha = linhas_resumo()
+    inicio = time.perf_counter()
+    df = img.agrupar_entradas(por_linha)
+    img.renderizar(df, renderer=renderer, title=img.titulo_mes(date(2025, 8, 1)), outfile=destino,
+                   figsize=img.FIGSIZE, col_widths=img.COL_WIDTHS, font_size=img.FONTE_TABELA,
+                   logo_path="logo_moya.png")
+    return time.perf_counter() - inicio
+
+
+def _rodar_caso(nome, tipo, parametro, pasta):
+    # Executado em processo próprio: ru_maxrss é o pico deste caso
+    destino = os.path.join(pasta, f"{nome}.{'pdf' if tipo.startswith('pdf') else 'png'}")
+    if tipo == "pdf":
+        segundos = _caso_pdf(parametro, False, destino)
+    elif tipo == "pdf_fast":
+        segundos = _caso_pdf(parametro, True, destino)
+    else:
+        segundos = _caso_png(parametro, destino)
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss_kb //= 1024  # macOS reporta em bytes
+    return {"segundos": round(segundos, 4), "pico_rss_mb": round(rss_kb / 1024, 1),
+            "tamanho_bytes": os.path.getsize(destino)}
+
+
+def casos(tamanhos=TAMANHOS_PDF, tabelas=("paragraph", "fast"), renderers=("pillow", "matplotlib"),
+          max_paragraph=10_000):
+    # Table+Paragraph com 100k linhas leva dezenas de minutos: limitado por max_paragraph
+    lista = []
+    for n in tamanhos:
+        for tabela in tabelas:
+            if tabela == "paragraph" and max_paragraph and n > max_paragraph:
+                continue
+            tipo = "pdf_fast" if tabela == "fast" else "pdf"
+            lista.append((f"{tipo}_{n // 1000}k" if n >= 1000 else f"{tipo}_{n}", tipo, n))
+    for renderer in renderers:
+        lista.append((f"png_{renderer}", "png", renderer))
+    return lista
+
+
+def executar(lista, repeticoes=1):
+    """
+    Roda cada caso repeticoes vezes (cada uma em processo novo) e guarda a
+    melhor medida de tempo e o maior pico de RSS.
+    """
+    resultados = {}
+    ctx = get_context("spawn")
+    with tempfile.TemporaryDirectory() as pasta:
+        for nome, tipo, parametro in lista:
+            medidas = []
+            for _ in range(repeticoes):
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                    medidas.append(pool.submit(_rodar_caso, nome, tipo, parametro, pasta).result())
+            res = {
+                "segundos": min(m["segundos"] for m in medidas),
+                "pico_rss_mb": max(m["pico_rss_mb"] for m in medidas),
+                "tamanho_bytes": medidas[-1]["tamanho_bytes"],
+            }
+            resultados[nome] = res
+            print(f"{nome:<18} {res['segundos']:>9.3f}s  {res['pico_rss_mb']:>8.1f} MB  "
+                  f"{res['tamanho_bytes'] / 1024:>9.1f} KB")
+    return resultados
+
+
+# Diferenças de tempo menores que isso são ruído (casos de décimos de segundo)
+FOLGA_MINIMA_S = 0.05
+
+
+def comparar(resultados, baseline, tolerancia=0.2, tolerancia_rss=0.15):
+    """
+    Lista de regressões: tempo acima de (1 + tolerancia) ou RSS acima de
+    (1 + tolerancia_rss) da baseline, para os casos presentes nas duas.
+    """
+    regressoes = []
+    for nome, atual in resultados.items():
+        ref = baseline.get("casos", {}).get(nome)
+        if not ref:
+            continue
+        if (ref["segundos"] and atual["segundos"] > ref["segundos"] * (1 + tolerancia)
+                and atual["segundos"] - ref["segundos"] > FOLGA_MINIMA_S):
+            regressoes.append(f"{nome}: tempo {ref['segundos']:.3f}s -> {atual['segundos']:.3f}s "
+                              f"(+{(atual['segundos'] / ref['segundos'] - 1) * 100:.0f}%)")
+        if ref["pico_rss_mb"] and atual["pico_rss_mb"] > ref["pico_rss_mb"] * (1 + tolerancia_rss):
+            regressoes.append(f"{nome}: memória {ref['pico_rss_mb']:.1f} MB -> {atual['pico_rss_mb']:.1f} MB "
+                              f"(+{(atual['pico_rss_mb'] / ref['pico_rss_mb'] - 1) * 100:.0f}%)")
+    return regressoes
+
+
+def _gravar(caminho, resultados):
+    dados = {
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "maquina": platform.machine(),
+        "cpus": os.cpu_count(),
+        "casos": resultados,
+    }
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(dados, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {caminho}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline dos geradores de PDF e PNG")
+    parser.add_argument("--tamanhos", default=",".join(str(n) for n in TAMANHOS_PDF),
+                        help="linhas dos PDFs, separadas por vírgula")
+    parser.add_argument("--tabelas", default="paragraph,fast",
+                        help="tipos de tabela do PDF: paragraph (Table+Paragraph) e/ou fast (FastTable)")
+    parser.add_argument("--max-paragraph", type=int, default=10_000,
+                        help="maior tamanho medido com a tabela paragraph (0 = sem limite)")
+    parser.add_argument("--renderers", default="pillow,matplotlib", help="backends da imagem resumo")
+    parser.add_argument("--repeticoes", type=int, default=1, help="execuções por caso (vale a melhor)")
+    parser.add_argument("--saida", help="grava os resultados neste JSON")
+    parser.add_argument("--baseline", help="JSON de referência para detectar regressões")
+    parser.add_argument("--salvar-baseline", help="grava os resultados como nova referência neste JSON")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="folga de tempo antes de acusar regressão")
+    parser.add_argument("--tolerancia-rss", type=float, default=0.15, help="folga de memória antes de acusar regressão")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    lista = casos(
+        tamanhos=[int(n) for n in args.tamanhos.split(",") if n.strip()],
+        tabelas=[t.strip() for t in args.tabelas.split(",") if t.strip()],
+        renderers=[r.strip() for r in args.renderers.split(",") if r.strip()],
+        max_paragraph=args.max_paragraph,
+    )
+    resultados = executar(lista, repeticoes=args.repeticoes)
+
+    if args.saida:
+        _gravar(args.saida, resultados)
+    if args.salvar_baseline:
+        _gravar(args.salvar_baseline, resultados)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressoes = comparar(resultados, baseline, args.tolerancia, args.tolerancia_rss)
+        if regressoes:
+            print("REGRESSÕES em relação a", args.baseline)
+            for r in regressoes:
+                print("  " + r)
+            return 1
+        print("Sem regressões em relação a", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
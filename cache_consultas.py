@@ -0,0 +1,186 @@
+# Cache em disco de resultados de consultas (DataFrames), opcional no DataWrapper.
+# Chave = sha256 de banco + texto da consulta + parâmetros, seguido do sha256
+# das opções de leitura que mudam o DataFrame (no DataWrapper, copy e dtypes).
+# Cada entrada é um arquivo <chave>-<expira_em>.parquet (ou .pkl sem pyarrow);
+# o mtime marca o último acesso, usado para o descarte LRU quando o diretório
+# passa do limite.
+import glob
+import hashlib
+import os
+import threading
+import time
+
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_DIR = os.getenv("PG_CACHE_DIR", ".cache_consultas")
+CACHE_MAX_MB = float(os.getenv("PG_CACHE_MAX_MB", "512"))
+CACHE_TTL = float(os.getenv("PG_CACHE_TTL", "300"))
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "expirados": 0, "gravados": 0, "descartados": 0}
+
+
+def _parquet_disponivel():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+_EXT = ".parquet" if _parquet_disponivel() else ".pkl"
+
+
+def _chave_consulta(query, params, banco):
+    h = hashlib.sha256()
+    h.update(banco.encode())
+    h.update(b"\0")
+    h.update(query.encode())
+    h.update(b"\0")
+    h.update(repr(params).encode())
+    return h.hexdigest()
+
+
+def _normalizar(valor):
+    # dict (p.ex. dtypes) em ordem estável; tipos/dtypes pelo nome
+    if isinstance(valor, dict):
+        return tuple(sorted((str(k), _normalizar(v)) for k, v in valor.items()))
+    return valor if valor is None or isinstance(valor, (bool, int, float, str)) else str(valor)
+
+
+def chave(query, params=None, banco="datalake", opcoes=None):
+    """
+    <consulta>_<opções>: a mesma consulta lida com opções diferentes (que mudam
+    colunas/dtypes do resultado) ocupa entradas separadas.
+    """
+    opcoes = hashlib.sha256(repr(_normalizar(opcoes or {})).encode()).hexdigest()[:16]
+    return f"{_chave_consulta(query, params, banco)}_{opcoes}"
+
+
+def _arquivos(k, diretorio):
+    return glob.glob(os.path.join(diretorio, f"{k}-*.parquet")) + glob.glob(os.path.join(diretorio, f"{k}-*.pkl"))
+
+
+def _expira_em(caminho):
+    nome = os.path.basename(caminho)
+    try:
+        return float(nome.rsplit("-", 1)[1].rsplit(".", 1)[0])
+    except (IndexError, ValueError):
+        return 0.0
+
+
+def _contar(evento):
+    with _lock:
+        _stats[evento] += 1
+
+
+def _ler_arquivo(caminho):
+    if caminho.endswith(".parquet"):
+        return pd.read_parquet(caminho)
+    return pd.read_pickle(caminho)
+
+
+def obter(query, params=None, banco="datalake", diretorio=CACHE_DIR, opcoes=None):
+    """
+    DataFrame em cache e ainda válido, ou None.
+    """
+    k = chave(query, params, banco, opcoes)
+    agora = time.time()
+    for caminho in _arquivos(k, diretorio):
+        if _expira_em(caminho) <= agora:
+            _contar("expirados")
+            _remover(caminho)
+            continue
+        try:
+            df = _ler_arquivo(caminho)
+        except Exception:
+            # Arquivo truncado/corrompido: trata como ausente
+            _remover(caminho)
+            continue
+        try:
+            os.utime(caminho)  # último acesso, para o LRU
+        except OSError:
+            pass
+        _contar("hits")
+        return df
+    _contar("misses")
+    return None
+
+
+def gravar(df, query, params=None, banco="datalake", ttl=CACHE_TTL, diretorio=CACHE_DIR,
+           max_mb=CACHE_MAX_MB, opcoes=None):
+    """
+    Grava df com validade de ttl segundos (substitui a entrada anterior da mesma chave).
+    """
+    os.makedirs(diretorio, exist_ok=True)
+    k = chave(query, params, banco, opcoes)
+    destino = os.path.join(diretorio, f"{k}-{time.time() + ttl:.0f}{_EXT}")
+    tmp = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if _EXT == ".parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_pickle(tmp)
+    # Rename atômico: outro processo nunca lê um arquivo pela metade
+    os.replace(tmp, destino)
+    for antigo in _arquivos(k, diretorio):
+        if antigo != destino:
+            _remover(antigo)
+    _contar("gravados")
+    _limitar(diretorio, max_mb)
+
+
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+def _limitar(diretorio, max_mb):
+    # LRU: descarta os de acesso mais antigo até caber no limite
+    entradas = []
+    for caminho in glob.glob(os.path.join(diretorio, "*-*.*")):
+        if caminho.endswith(".tmp"):
+            continue
+        try:
+            st = os.stat(caminho)
+        except OSError:
+            continue
+        entradas.append((st.st_mtime, st.st_size, caminho))
+    total = sum(e[1] for e in entradas)
+    limite = max_mb * 1024 * 1024
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= limite:
+            break
+        _remover(caminho)
+        total -= tamanho
+        _contar("descartados")
+
+
+def invalidar(query=None, params=None, banco="datalake", diretorio=CACHE_DIR):
+    """
+    Remove as entradas de query/params (com quaisquer opções de leitura), ou
+    todo o cache se query for None. Retorna quantos arquivos foram removidos.
+    """
+    if query is None:
+        caminhos = glob.glob(os.path.join(diretorio, "*-*.parquet")) + glob.glob(os.path.join(diretorio, "*-*.pkl"))
+    else:
+        caminhos = _arquivos(f"{_chave_consulta(query, params, banco)}_*", diretorio)
+    for caminho in caminhos:
+        _remover(caminho)
+    return len(caminhos)
+
+
+def estatisticas():
+    """
+    Contadores do processo: hits, misses, expirados, gravados, descartados e
+    taxa de acerto (hits / consultas).
+    """
+    with _lock:
+        s = dict(_stats)
+    consultas = s["hits"] + s["misses"]
+    s["taxa_acerto"] = s["hits"] / consultas if consultas else 0.0
+    return s
@@ -0,0 +1,122 @@
+# Carga em massa do datalake (Postgres) via COPY (query) TO STDOUT.
+# O servidor envia CSV em fluxo e o parser em C do pandas monta as colunas já
+# com o dtype certo, sem criar uma tupla Python por linha como o read_sql_query.
+# Os tipos vêm de cursor.description (OID do Postgres), num LIMIT 0 da consulta.
+import os
+import threading
+
+import pandas as pd
+
+# OID do Postgres -> dtype do pandas ("data" = coluna para parse_dates)
+_TIPOS_PG = {
+    16: "boolean",                  # bool
+    20: "Int64", 21: "Int64", 23: "Int64",  # int8, int2, int4
+    700: "float64", 701: "float64",  # float4, float8
+    1700: "float64",                # numeric (sem Decimal)
+    25: "string", 1042: "string", 1043: "string", 19: "string",  # text, bpchar, varchar, name
+    1082: "data", 1114: "data", 1184: "data",  # date, timestamp, timestamptz
+}
+
+
+# Marcador de NULL no CSV do COPY: sem ele, NULL e '' saem ambos como campo vazio
+NULO_COPY = r"\N"
+
+
+def tipos_do_resultado(conn, sql):
+    """
+    {coluna: dtype} a partir do cursor.description de sql (já com parâmetros),
+    sem trazer linhas. Colunas de data vêm como "data"; tipos não mapeados, None.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT * FROM ({sql}) AS _q LIMIT 0")
+        return {col.name: _TIPOS_PG.get(col.type_code) for col in cur.description}
+
+
+def _opcoes_csv(tipos, dtypes):
+    tipos = dict(tipos)
+    tipos.update(dtypes or {})
+    datas = [c for c, t in tipos.items() if t == "data"]
+    dtype = {c: t for c, t in tipos.items() if t and t != "data"}
+    # bool do COPY sai como t/f
+    bools = [c for c, t in dtype.items() if t in ("boolean", "bool")]
+    for c in bools:
+        dtype[c] = "object"
+    return dict(dtype=dtype, parse_dates=datas, keep_default_na=False, na_values=[NULO_COPY]), bools
+
+
+def _converter_bools(df, bools):
+    for c in bools:
+        df[c] = df[c].map({"t": True, "f": False}).astype("boolean")
+    return df
+
+
+def iter_copy(conn, query, params=None, dtypes=None, chunksize=100_000):
+    """
+    Gera DataFrames de até chunksize linhas lendo COPY (query) TO STDOUT em
+    fluxo (memória limitada ao bloco). dtypes sobrepõe os tipos inferidos
+    pelo cursor.description. conn deve ficar aberta até o fim da iteração.
+    NULL sai do COPY como NULO_COPY (NA no DataFrame) e a string vazia como
+    "" (fica ''), como no read_sql_query.
+    """
+    with conn.cursor() as cur:
+        sql = cur.mogrify(query, params).decode() if params is not None else query
+    sql = sql.strip().rstrip(";")
+    opcoes, bools = _opcoes_csv(tipos_do_resultado(conn, sql), dtypes)
+
+    r, w = os.pipe()
+    leitor = os.fdopen(r, "rb")
+    escritor = os.fdopen(w, "wb")
+    erro = []
+
+    def _copiar():
+        try:
+            with conn.cursor() as cur:
+                cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true, NULL '{NULO_COPY}')",
+                                escritor)
+        except Exception as e:
+            erro.append(e)
+        finally:
+            try:
+                escritor.close()
+            except OSError:
+                pass
+
+    # O COPY escreve no pipe em outra thread enquanto o pandas consome aqui
+    t = threading.Thread(target=_copiar, daemon=True)
+    t.start()
+    try:
+        with pd.read_csv(leitor, chunksize=chunksize, **opcoes) as blocos:
+            for bloco in blocos:
+                yield _converter_bools(bloco, bools)
+    except pd.errors.EmptyDataError:
+        pass
+    except Exception:
+        # CSV truncado porque o COPY falhou: o erro do banco é o que interessa
+        leitor.close()
+        t.join()
+        if erro:
+            raise erro[0]
+        raise
+    finally:
+        # Consumidor parou antes do fim: fechar o leitor destrava o COPY (EPIPE)
+        leitor.close()
+        t.join()
+    if erro:
+        raise erro[0]
+
+
+def ler_copy(conn, query, params=None, dtypes=None):
+    """
+    Resultado inteiro de query em um DataFrame via COPY (ver iter_copy).
+    """
+    blocos = list(iter_copy(conn, query, params, dtypes, chunksize=1_000_000))
+    if not blocos:
+        # Sem linhas: DataFrame vazio com as colunas/tipos do resultado
+        with conn.cursor() as cur:
+            sql = cur.mogrify(query, params).decode() if params is not None else query
+        tipos = tipos_do_resultado(conn, sql.strip().rstrip(";"))
+        return pd.DataFrame({c: pd.Series(dtype="datetime64[ns]" if t == "data" else (t or "object"))
+                             for c, t in tipos.items()})
+    if len(blocos) == 1:
+        return blocos[0]
+    return pd.concat(blocos, ignore_index=True)
@@ -1,29 +1,158 @@
 import psycopg2
+import psycopg2.pool
+import atexit
 import os
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Tamanho dos pools (por banco) e espera máxima por uma conexão livre
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "1"))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "5"))
+PG_POOL_TIMEOUT = float(os.getenv("PG_POOL_TIMEOUT", "30"))
+
+
+def _params_datalake():
+    return dict(host=os.getenv("DT_HOST"),
+                database=os.getenv("DT_DATABASE"),
+                port=os.getenv("DT_PORT"),
+                user=os.getenv("DT_USER"),
+                password=os.getenv("DT_PASSWORD"))
+
+
+def _params_datatalk():
+    return dict(host=os.getenv("GUVI_HOST"),
+                database=os.getenv("GUVI_DATABASE"),
+                port=os.getenv("GUVI_PORT"),
+                user=os.getenv("GUVI_USER"),
+                password=os.getenv("GUVI_PASSWORD"))
+
+
 # Configuração da conexão DATA-LAKE
-def start_connection_datalake(): 
-    
-    conn = psycopg2.connect(host=os.getenv("DT_HOST"), 
-                            database=os.getenv("DT_DATABASE"), 
-                            port=os.getenv("DT_PORT"), 
-                            user=os.getenv("DT_USER"),
-                            password=os.getenv("DT_PASSWORD")
-                            )
+def start_connection_datalake():
+    """
+    Conexão avulsa (quem chama fecha). Para uso repetido prefira
+    conexao("datalake"), que reaproveita conexões do pool.
+    """
+    conn = psycopg2.connect(**_params_datalake())
     #print("Conexão bem-sucedida. O banco de dados está ativo.")
     return conn
 
 # Configuração da conexão DATA-LAKE
-def start_connection_datatalk(): 
-    
-    conn = psycopg2.connect(host=os.getenv("GUVI_HOST"), 
-                            database=os.getenv("GUVI_DATABASE"), 
-                            port=os.getenv("GUVI_PORT"), 
-                            user=os.getenv("GUVI_USER"),
-                            password=os.getenv("GUVI_PASSWORD")
-                            )
+def start_connection_datatalk():
+    """
+    Conexão avulsa (quem chama fecha). Para uso repetido prefira
+    conexao("datatalk"), que reaproveita conexões do pool.
+    """
+    conn = psycopg2.connect(**_params_datatalk())
     #print("Conexão bem-sucedida. O banco de dados está ativo.")
-    return conn
\ No newline at end of file
+    return conn
+
+
+class PoolConexoes:
+    """
+    Pool de conexões psycopg2 (ThreadedConnectionPool) com:
+      - espera por conexão livre (até timeout) em vez de PoolError ao lotar;
+      - teste na retirada (SELECT 1): conexão morta é descartada e trocada;
+      - devolução com rollback, para não reaproveitar transação aberta/abortada.
+    """
+
+    def __init__(self, params, minconn=PG_POOL_MIN, maxconn=PG_POOL_MAX, timeout=PG_POOL_TIMEOUT):
+        self.params = params
+        self.timeout = timeout
+        self._pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, **params)
+        self._livres = threading.BoundedSemaphore(maxconn)
+
+    @staticmethod
+    def _saudavel(conn):
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def retirar(self):
+        if not self._livres.acquire(timeout=self.timeout):
+            raise psycopg2.pool.PoolError(f"nenhuma conexão livre em {self.timeout:g}s")
+        try:
+            conn = self._pool.getconn()
+            if not self._saudavel(conn):
+                # Servidor reiniciou / conexão ociosa derrubada: descarta e abre outra
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            return conn
+        except Exception:
+            self._livres.release()
+            raise
+
+    def devolver(self, conn):
+        try:
+            descartar = bool(conn.closed)
+            if not descartar:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    descartar = True
+            self._pool.putconn(conn, close=descartar)
+        finally:
+            self._livres.release()
+
+    @contextmanager
+    def conexao(self):
+        conn = self.retirar()
+        try:
+            yield conn
+        finally:
+            self.devolver(conn)
+
+    def fechar(self):
+        if not self._pool.closed:
+            self._pool.closeall()
+
+
+_FABRICAS = {
+    "datalake": _params_datalake,
+    "datatalk": _params_datatalk,
+}
+_POOLS = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(banco="datalake"):
+    """
+    Pool do banco ("datalake" = DT_*, "datatalk" = GUVI_*), criado na primeira
+    chamada e compartilhado pelo processo.
+    """
+    with _POOLS_LOCK:
+        pool = _POOLS.get(banco)
+        if pool is None:
+            pool = PoolConexoes(_FABRICAS[banco]())
+            _POOLS[banco] = pool
+        return pool
+
+
+def conexao(banco="datalake"):
+    """
+    Empresta uma conexão do pool: `with conexao() as conn: ...`.
+    Na saída a conexão volta ao pool (com rollback do que não foi commitado).
+    """
+    return get_pool(banco).conexao()
+
+
+def fechar_pools():
+    """
+    Fecha todas as conexões dos pools (registrado em atexit).
+    """
+    with _POOLS_LOCK:
+        for pool in _POOLS.values():
+            pool.fechar()
+        _POOLS.clear()
+
+
+atexit.register(fechar_pools)
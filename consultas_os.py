@@ -0,0 +1,274 @@
+# Camada comum de consultas sobre as entradas de OS (Firebird).
+# Todas partem do mesmo join e filtram o período com o.abertura BETWEEN ? AND ?
+# (parâmetros), o que permite ao Firebird usar o índice de abertura — ao
+# contrário de EXTRACT(YEAR/MONTH FROM o.abertura).
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+JOIN_ENTRADAS = """
+      FROM osordem o
+      INNER JOIN cadastro t ON t.codigo = o.cadastro
+      INNER JOIN osequipamentos e ON e.equipamento = o.equipamento
+      INNER JOIN ceprodutos p ON p.produto = e.produto
+      LEFT JOIN celinhas L ON p.linha = L.linha
+      LEFT JOIN ossituacao s ON s.situacao = o.situacao
+      LEFT JOIN vendedores v ON v.vendedor = o.vendedor
+      LEFT JOIN vendedores v2 ON v2.vendedor = t.vendedortmk"""
+
+# Clientes excluídos (t.nome NOT LIKE ...) em cada relatório
+EXCLUIR_NOMES_RELATORIO = ("%JCC%", "LOG %")
+EXCLUIR_NOMES_RESUMO = ("%JCC%", "LOG P%")
+
+SELECT_DETALHE = """
+    SELECT
+           o.situacao,
+           CASE o.situacao
+             WHEN '90' THEN 'Cancelado'
+             WHEN '99' THEN 'Encerrado'
+             ELSE s.descricao
+           END AS desc_situacao,
+           REPLACE(L.descricao, 'REMESSA RETORNO - ', '') AS descricao_linha,
+           o.ordem, o.abertura, o.cadastro,  t.nome,
+           e.produto AS RR, e.descricao AS desc_equipamento,
+           CAST(o.Ent_Prev AS DATE) AS Prev_Conclusao,
+           o.vendedor || ' - ' || v.nomered AS nome_vendedor,
+           t.vendedortmk || ' - ' || v2.nomered AS nome_vend_interno"""
+
+# Colunas do QUERY_ENTRADA_DETALHADO (appconfig): vendedor e nome separados
+SELECT_ENTRADA_DETALHADO = """
+    Select /* Quebra */
+           o.situacao, case o.situacao
+                       when '90' then 'Cancelado'
+                       when '99' then 'Encerrado'
+                       else s.descricao end desc_situacao,
+           REPLACE(L.descricao, 'REMESSA RETORNO - ', '') AS descricao_linha,
+           /* Ordem */
+           o.ordem, o.abertura, o.cadastro,  t.nome,
+           /* Equipamento */
+           e.produto RR, e.descricao desc_equipamento,
+           /*Previa conclusao*/
+           cast(o.Ent_Prev as date) Prev_Conclusao,
+           /* Vendedor */
+           o.vendedor, v.nomered nome_vendedor,
+           t.vendedortmk vendedor_interno, v2.nomered nome_vend_interno"""
+
+# Resumo mensal: uma passada agrupada por linha com as semanas do mês
+# (dias 1-7, 8-14, 15-21, 22-28, 29+); o agrupamento em grupos é feito depois.
+_SOMAS_SEMANAS = """
+        SUM(CASE WHEN EXTRACT(DAY FROM o.abertura) BETWEEN 1 AND 7 THEN 1 ELSE 0 END) AS sem01,
+        SUM(CASE WHEN EXTRACT(DAY FROM o.abertura) BETWEEN 8 AND 14 THEN 1 ELSE 0 END) AS sem02,
+        SUM(CASE WHEN EXTRACT(DAY FROM o.abertura) BETWEEN 15 AND 21 THEN 1 ELSE 0 END) AS sem03,
+        SUM(CASE WHEN EXTRACT(DAY FROM o.abertura) BETWEEN 22 AND 28 THEN 1 ELSE 0 END) AS sem04,
+        SUM(CASE WHEN EXTRACT(DAY FROM o.abertura) >= 29 THEN 1 ELSE 0 END) AS sem05,
+        COUNT(e.produto) AS total"""
+SELECT_SEMANAS_LINHA = """
+    SELECT
+        p.linha,""" + _SOMAS_SEMANAS
+
+# Mesmas somas quebradas também por filial e vendedor (imagens por grupo):
+# a passada é uma só e os totais de cada grupo saem do agrupamento em memória.
+SELECT_SEMANAS_FILIAL_VENDEDOR = """
+    SELECT
+        o.filial, o.vendedor, COALESCE(v.nomered, '') AS nome_vendedor,
+        p.linha,""" + _SOMAS_SEMANAS
+
+
+def condicoes_excluir_nomes(padroes, coluna="t.nome"):
+    """
+    Condições "coluna NOT LIKE '<padrão>'" de EXCLUIR_NOMES_*; compartilhadas
+    com o snapshot (snapshot_os), para os dois aplicarem a mesma regra.
+    """
+    # Literal (não parâmetro): mantém o texto do SQL estável para o cache de prep
+    return ["%s NOT LIKE '%s'" % (coluna, padrao.replace("'", "''")) for padrao in padroes]
+
+
+def montar_consulta(select, dt_ini=None, dt_fim=None, vendedor=None, filial=None, linhas=None,
+                    excluir_nomes=(), where=(), params=(), group_by=None, order_by=None):
+    """
+    Monta SELECT + JOIN_ENTRADAS + WHERE com parâmetros posicionais (?).
+    Período (o.abertura BETWEEN ? AND ?) só entra se dt_ini/dt_fim forem
+    informados; vendedor, filial e linhas (lista de p.linha) são opcionais.
+    where/params acrescentam condições livres. Retorna (sql, params).
+    """
+    condicoes = []
+    valores = []
+    if dt_ini is not None and dt_fim is not None:
+        condicoes.append("o.abertura BETWEEN ? AND ?")
+        valores += [dt_ini, dt_fim]
+    condicoes += condicoes_excluir_nomes(excluir_nomes)
+    if vendedor is not None:
+        condicoes.append("o.vendedor = ?")
+        valores.append(vendedor)
+    if filial is not None:
+        condicoes.append("o.filial = ?")
+        valores.append(filial)
+    if linhas:
+        condicoes.append("p.linha IN (%s)" % ", ".join("?" for _ in linhas))
+        valores += list(linhas)
+    condicoes += list(where)
+    valores += list(params)
+
+    sql = select + JOIN_ENTRADAS
+    if condicoes:
+        sql += "\n     WHERE " + "\n       AND ".join(condicoes)
+    if group_by:
+        sql += f"\n     GROUP BY {group_by}"
+    if order_by:
+        sql += f"\n     ORDER BY {order_by}"
+    return sql, tuple(valores)
+
+
+# ------------ prepared statements reaproveitados ------------
+_PREPARADOS = {}
+
+
+def executar(conn, sql, params=()):
+    """
+    Executa sql na conexão e devolve o cursor. Em conexões fdb o statement é
+    preparado uma vez (cursor.prep) e reaproveitado nas chamadas seguintes com
+    o mesmo SQL no processo; outras conexões (sqlite, replay) executam direto.
+    O cursor devolvido é compartilhado: consuma o resultado antes de executar
+    o mesmo SQL de novo e não o feche.
+    """
+    chave = (id(conn), sql)
+    entrada = _PREPARADOS.get(chave)
+    # Guarda a própria conexão na entrada: evita reaproveitar um id() reciclado
+    if entrada is None or entrada[0] is not conn or getattr(conn, "closed", False):
+        cur = conn.cursor()
+        if not hasattr(cur, "prep"):
+            cur.execute(sql, params)
+            return cur
+        entrada = (conn, cur, cur.prep(sql))
+        _PREPARADOS[chave] = entrada
+    _, cur, ps = entrada
+    cur.execute(ps, params)
+    return cur
+
+
+def liberar_preparados(conn):
+    """
+    Descarta os statements preparados de conn (chamar antes de conn.close()).
+    """
+    for chave in [k for k, v in _PREPARADOS.items() if v[0] is conn]:
+        _, cur, ps = _PREPARADOS.pop(chave)
+        try:
+            cur.close()
+        except Exception:
+            pass
+
+
+# ------------ fetch colunar tipado ------------
+def _tipo_coluna(descricao):
+    # cursor.description do fdb: (nome, tipo Python, display, interno, precisão, escala, nulo)
+    tipo, escala = descricao[1], descricao[5]
+    if tipo is int or (tipo is Decimal and not escala):
+        return "int"
+    if tipo in (float, Decimal):
+        return "float"
+    return "obj"
+
+
+def _dtype(tipo):
+    return {"int": np.int64, "float": np.float64}.get(tipo, object)
+
+
+def _preencher(destino, nulos, inicio, valores, tipo):
+    fim = inicio + len(valores)
+    if tipo != "int":
+        # float: None vira NaN e Decimal vira float na própria atribuição
+        destino[inicio:fim] = valores
+        return
+    try:
+        destino[inicio:fim] = valores
+    except TypeError:
+        mascara = np.fromiter((v is None for v in valores), dtype=bool, count=len(valores))
+        destino[inicio:fim] = [0 if v is None else v for v in valores]
+        nulos[inicio:fim] = mascara
+
+
+def _coluna_final(valores, nulos, tipo):
+    if tipo == "int" and nulos.any():
+        return pd.arrays.IntegerArray(valores, nulos)
+    return valores
+
+
+def iter_colunas(cur, batch_size=5000):
+    """
+    Lê o cursor em lotes de fetchmany e entrega cada lote já em colunas:
+    {nome: array}. Inteiros (e NUMERIC de escala 0) vêm em int64 — com nulos,
+    IntegerArray —, NUMERIC com escala e floats em float64 (NULL = NaN);
+    texto e datas ficam em arrays de objetos.
+    """
+    descricao = cur.description
+    nomes = [d[0] for d in descricao]
+    tipos = [_tipo_coluna(d) for d in descricao]
+    while True:
+        lote = cur.fetchmany(batch_size)
+        if not lote:
+            break
+        n = len(lote)
+        colunas = {}
+        for nome, tipo, valores in zip(nomes, tipos, zip(*lote)):
+            destino = np.empty(n, dtype=_dtype(tipo))
+            nulos = np.zeros(n, dtype=bool)
+            _preencher(destino, nulos, 0, valores, tipo)
+            colunas[nome] = _coluna_final(destino, nulos, tipo)
+        yield colunas
+
+
+def fetch_colunas(cur, batch_size=5000):
+    """
+    Resultado inteiro do cursor em colunas tipadas (ver iter_colunas), lido
+    em lotes direto em arrays pré-alocados (dobrando a capacidade quando
+    preciso), sem lista de tuplas intermediária. Retorna {nome: array}.
+    """
+    descricao = cur.description
+    nomes = [d[0] for d in descricao]
+    tipos = [_tipo_coluna(d) for d in descricao]
+    capacidade = batch_size
+    arrays = [np.empty(capacidade, dtype=_dtype(t)) for t in tipos]
+    nulos = [np.zeros(capacidade, dtype=bool) for _ in tipos]
+    n = 0
+    while True:
+        lote = cur.fetchmany(batch_size)
+        if not lote:
+            break
+        if n + len(lote) > capacidade:
+            while n + len(lote) > capacidade:
+                capacidade *= 2
+            for j, tipo in enumerate(tipos):
+                novo = np.empty(capacidade, dtype=_dtype(tipo))
+                novo[:n] = arrays[j][:n]
+                arrays[j] = novo
+                mascara = np.zeros(capacidade, dtype=bool)
+                mascara[:n] = nulos[j][:n]
+                nulos[j] = mascara
+        for j, valores in enumerate(zip(*lote)):
+            _preencher(arrays[j], nulos[j], n, valores, tipos[j])
+        n += len(lote)
+    return {nome: _coluna_final(arrays[j][:n], nulos[j][:n], tipos[j]) for j, nome in enumerate(nomes)}
+
+
+def fetch_dataframe(cur, batch_size=5000, categorias=()):
+    """
+    DataFrame a partir de fetch_colunas. Colunas em categorias (nomes como no
+    cursor.description) viram Categorical — útil para textos muito repetidos.
+    """
+    colunas = fetch_colunas(cur, batch_size)
+    for nome in categorias:
+        colunas[nome] = pd.Categorical(colunas[nome])
+    return pd.DataFrame(colunas, copy=False)
+
+
+def textos_coluna(valores):
+    """
+    str() de cada valor da coluna, calculado uma vez por valor distinto
+    (factorize); NULL continua None.
+    """
+    codigos, distintos = pd.factorize(valores)
+    textos = np.empty(len(distintos) + 1, dtype=object)
+    textos[:-1] = [str(v) for v in distintos]
+    textos[-1] = None  # código -1 (NULL) aponta para a última posição
+    return textos[codigos]
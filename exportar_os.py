@@ -0,0 +1,241 @@
+# Exportação dos dados brutos das entradas (mesmas colunas de
+# appconfig.QUERY_ENTRADA_DETALHADO) em CSV ou XLSX, para quem quer filtrar
+# por conta própria em vez de ler o PDF. O cursor é lido em lotes de
+# fetchmany e cada lote vai direto para os arquivos: memória constante,
+# qualquer que seja o período. Uma passada gera o arquivo geral e os por
+# vendedor (mesmos nomes dos PDFs: rel_GERAL, rel_<id>).
+import csv
+import gzip
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from consultas_os import EXCLUIR_NOMES_RELATORIO, SELECT_ENTRADA_DETALHADO, executar, montar_consulta
+
+CABECALHO = [
+    "SITUACAO", "DESC_SITUACAO", "DESCRICAO_LINHA", "ORDEM", "ABERTURA", "CADASTRO", "NOME",
+    "RR", "DESC_EQUIPAMENTO", "PREV_CONCLUSAO", "VENDEDOR", "NOME_VENDEDOR",
+    "VENDEDOR_INTERNO", "NOME_VEND_INTERNO",
+]
+IDX_VENDEDOR = 10  # o.vendedor em SELECT_ENTRADA_DETALHADO
+
+FORMATOS = ("csv", "xlsx")
+
+
+def consulta_exportacao(dt_ini, dt_fim):
+    # Mesmos filtros dos PDFs (período e nomes excluídos), colunas do QUERY_ENTRADA_DETALHADO
+    return montar_consulta(SELECT_ENTRADA_DETALHADO, dt_ini, dt_fim,
+                           excluir_nomes=EXCLUIR_NOMES_RELATORIO, order_by="o.situacao, o.ordem")
+
+
+# ------------ CSV ------------
+class EscritorCsv:
+    """
+    CSV com ";" (abre direto no Excel em pt-BR) e BOM UTF-8; gz=True grava .csv.gz.
+    """
+
+    def __init__(self, caminho, cabecalho, gz=False):
+        self.caminho = caminho
+        if gz:
+            self._arquivo = gzip.open(caminho, "wt", encoding="utf-8-sig", newline="", compresslevel=6)
+        else:
+            self._arquivo = open(caminho, "w", encoding="utf-8-sig", newline="")
+        self._csv = csv.writer(self._arquivo, delimiter=";")
+        self._csv.writerow(cabecalho)
+
+    def escrever(self, linhas):
+        self._csv.writerows(linhas)
+
+    def fechar(self):
+        self._arquivo.close()
+
+
+# ------------ XLSX ------------
+# XLSX mínimo escrito em fluxo: a planilha vai para o zip à medida que as
+# linhas chegam (strings inline, sem tabela de strings compartilhadas), então
+# nada do conjunto fica em memória.
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Entradas" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+# Estilos: 0 = padrão, 1 = data e hora, 2 = data, 3 = cabeçalho (negrito)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="2"><numFmt numFmtId="164" formatCode="dd/mm/yyyy hh:mm"/>'
+    '<numFmt numFmtId="165" formatCode="dd/mm/yyyy"/></numFmts>'
+    '<fonts count="2"><font><sz val="10"/><name val="Arial"/></font>'
+    '<font><b/><sz val="10"/><name val="Arial"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="4"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '</styleSheet>'
+)
+_EPOCA_EXCEL = datetime(1899, 12, 30)
+# Caracteres de controle não são aceitos em XML
+_INVALIDOS_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+LIMITE_LINHAS_XLSX = 1_048_576
+
+
+def _celula_texto(valor):
+    texto = escape(_INVALIDOS_XML.sub("", str(valor)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _celula_numero(valor):
+    return f"<c><v>{valor}</v></c>"
+
+
+def _celula_data_hora(valor):
+    return f'<c s="1"><v>{(valor - _EPOCA_EXCEL).total_seconds() / 86400:.8f}</v></c>'
+
+
+def _celula_data(valor):
+    return f'<c s="2"><v>{(valor - _EPOCA_EXCEL.date()).days}</v></c>'
+
+
+# Despacho pelo tipo exato (o caminho de cada célula é o custo do XLSX)
+_CELULA_POR_TIPO = {
+    str: _celula_texto,
+    int: _celula_numero,
+    float: _celula_numero,
+    Decimal: _celula_numero,
+    datetime: _celula_data_hora,
+    date: _celula_data,
+    bool: lambda valor: f'<c t="b"><v>{int(valor)}</v></c>',
+    type(None): lambda valor: "<c/>",
+}
+
+
+def _celula(valor):
+    return _CELULA_POR_TIPO.get(type(valor), _celula_texto)(valor)
+
+
+class EscritorXlsx:
+    """
+    Planilha única (XLSX) escrita em fluxo, com números e datas tipados.
+    """
+
+    def __init__(self, caminho, cabecalho):
+        self.caminho = caminho
+        self._zip = zipfile.ZipFile(caminho, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6)
+        self._folha = io.TextIOWrapper(self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True),
+                                       encoding="utf-8")
+        self._folha.write(
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            '<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" '
+            'activePane="bottomLeft" state="frozen"/></sheetView></sheetViews><sheetData>'
+        )
+        texto = "".join(f'<c t="inlineStr" s="3"><is><t>{escape(h)}</t></is></c>' for h in cabecalho)
+        self._folha.write(f"<row>{texto}</row>")
+        self._linhas = 1
+
+    def escrever(self, linhas):
+        self._linhas += len(linhas)
+        if self._linhas > LIMITE_LINHAS_XLSX:
+            raise ValueError(f"{self.caminho}: mais de {LIMITE_LINHAS_XLSX} linhas (limite do XLSX); use CSV")
+        self._folha.write("".join("<row>" + "".join(map(_celula, linha)) + "</row>" for linha in linhas))
+
+    def fechar(self):
+        self._folha.write("</sheetData></worksheet>")
+        self._folha.close()
+        self._zip.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        self._zip.writestr("_rels/.rels", _RELS)
+        self._zip.writestr("xl/workbook.xml", _WORKBOOK)
+        self._zip.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        self._zip.writestr("xl/styles.xml", _STYLES)
+        self._zip.close()
+
+
+def _escritor(out_dir, nome, formato, gz):
+    if formato == "xlsx":
+        return EscritorXlsx(str(out_dir / f"{nome}.xlsx"), CABECALHO)
+    return EscritorCsv(str(out_dir / f"{nome}.csv{'.gz' if gz else ''}"), CABECALHO, gz=gz)
+
+
+def exportar_entradas(conn, dt_ini, dt_fim, out_dir, formato="csv", gz=False, filtro_ids=None, batch_size=5000):
+    """
+    Uma consulta, lida em lotes de fetchmany(batch_size): cada lote vai para
+    rel_GERAL e, separado por o.vendedor, para rel_<id> (só os vendedores de
+    filtro_ids; vazio/None = todos). gz vale para CSV (o XLSX já é compactado).
+    Como nos PDFs, arquivo sem linhas não é gerado (nem o rel_GERAL).
+    Retorna (arquivos gerados, total de linhas).
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportação inválido: {formato}")
+    cur = executar(conn, *consulta_exportacao(dt_ini, dt_fim))
+
+    geral = None
+    por_vendedor = {}
+    total = 0
+    try:
+        while True:
+            lote = cur.fetchmany(batch_size)
+            if not lote:
+                break
+            total += len(lote)
+            if geral is None:
+                geral = _escritor(out_dir, "rel_GERAL", formato, gz)
+            geral.escrever(lote)
+            grupos = {}
+            for linha in lote:
+                vend_id = linha[IDX_VENDEDOR]
+                if vend_id is None or (filtro_ids and vend_id not in filtro_ids):
+                    continue
+                grupos.setdefault(vend_id, []).append(linha)
+            for vend_id, linhas in grupos.items():
+                escritor = por_vendedor.get(vend_id)
+                if escritor is None:
+                    escritor = por_vendedor[vend_id] = _escritor(out_dir, f"rel_{vend_id}", formato, gz)
+                escritor.escrever(linhas)
+    finally:
+        for escritor in [geral, *por_vendedor.values()]:
+            if escritor is not None:
+                escritor.fechar()
+
+    arquivos = ([geral.caminho] if geral else []) + [por_vendedor[v].caminho for v in sorted(por_vendedor, key=str)]
+    return arquivos, total
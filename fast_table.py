@@ -0,0 +1,197 @@
+from bisect import bisect_right
+from itertools import accumulate
+
+from reportlab.lib import colors
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus.flowables import Flowable
+
+
+class _Layout:
+    """
+    Layout pré-calculado de todas as linhas: texto já quebrado por célula,
+    altura de cada linha e alturas acumuladas (para wrap/split em O(log n)).
+    Compartilhado entre os pedaços de uma FastTable dividida entre páginas.
+    """
+
+    def __init__(self, rows, col_widths, headers, font, font_size, leading,
+                 header_font, header_leading, padding, header_bottom_padding, overflow):
+        self.font = font
+        self.font_size = font_size
+        self.leading = leading
+        self.header_font = header_font
+        self.header_leading = header_leading
+        self.padding = padding
+        self.header_bottom_padding = header_bottom_padding
+        self.col_widths = list(col_widths)
+        self.text_widths = [w - 2 * padding for w in self.col_widths]
+        self._cache = {}
+
+        self.header_lines = [self._wrap(str(h), w, header_font, "wrap")
+                             for h, w in zip(headers, self.text_widths)]
+        self.header_height = (max(len(c) for c in self.header_lines) * header_leading
+                              + padding + header_bottom_padding)
+
+        self.cells = []
+        heights = []
+        for row in rows:
+            cells = [self._wrap(str(v), w, font, overflow) for v, w in zip(row, self.text_widths)]
+            self.cells.append(cells)
+            heights.append(max(len(c) for c in cells) * leading + 2 * padding)
+        self.heights = heights
+        self.offsets = [0.0] + list(accumulate(heights))
+
+    def _wrap(self, text, width, font, overflow):
+        # Valores repetem muito (situação, linha, vendedor): mede uma vez só
+        key = (text, width, font, overflow)
+        lines = self._cache.get(key)
+        if lines is not None:
+            return lines
+
+        size = self.font_size
+        if not text or stringWidth(text, font, size) <= width:
+            lines = (text,)
+        elif overflow == "truncate":
+            lines = (self._truncate(text, width, font),)
+        else:
+            # Quebra gulosa por palavras, como o Paragraph (palavra longa transborda)
+            space = stringWidth(" ", font, size)
+            out, cur, cur_w = [], [], 0.0
+            for word in text.split():
+                w = stringWidth(word, font, size)
+                if cur and cur_w + space + w > width:
+                    out.append(" ".join(cur))
+                    cur, cur_w = [word], w
+                else:
+                    cur_w = cur_w + space + w if cur else w
+                    cur.append(word)
+            if cur:
+                out.append(" ".join(cur))
+            lines = tuple(out) or ("",)
+        self._cache[key] = lines
+        return lines
+
+    def _truncate(self, text, width, font):
+        size = self.font_size
+        ellipsis = "…"
+        avail = width - stringWidth(ellipsis, font, size)
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if stringWidth(text[:mid], font, size) <= avail:
+                lo = mid
+            else:
+                hi = mid - 1
+        return text[:lo] + ellipsis
+
+
+class FastTable(Flowable):
+    """
+    Tabela desenhada direto no canvas, para relatórios com muitas linhas.
+    Substitui Table + um Paragraph por célula: cada valor é medido/quebrado uma
+    vez (com cache), a altura das linhas é pré-calculada e o split entre páginas
+    é por busca binária, repetindo o cabeçalho em cada pedaço. Mantém larguras,
+    zebra, grade e cores da tabela de detalhe de gerar_relatorios_os.
+
+    overflow: "wrap" (quebra por palavras, como Paragraph) ou "truncate"
+    (uma linha por célula, cortada com reticências).
+    """
+
+    def __init__(self, rows, col_widths, headers,
+                 font="Helvetica", font_size=5, leading=9.2,
+                 header_font="Helvetica-Bold", header_leading=9.6,
+                 padding=3, header_bottom_padding=3,
+                 header_bg=colors.HexColor("#a51a19"), header_fg=colors.white,
+                 row_backgrounds=(colors.HexColor("#FFFFFF"), colors.HexColor("#F7F7F7")),
+                 grid_color=colors.HexColor("#DDDDDD"), grid_width=0.25,
+                 overflow="wrap", _layout=None, _start=0, _end=None):
+        super().__init__()
+        if _layout is None:
+            _layout = _Layout(rows, col_widths, headers, font, font_size, leading,
+                              header_font, header_leading, padding, header_bottom_padding, overflow)
+        self._layout = _layout
+        self._start = _start
+        self._end = len(_layout.heights) if _end is None else _end
+        self.header_bg = header_bg
+        self.header_fg = header_fg
+        self.row_backgrounds = row_backgrounds
+        self.grid_color = grid_color
+        self.grid_width = grid_width
+        self.width = sum(_layout.col_widths)
+        self.hAlign = "CENTER"  # como Table
+
+    def _body_height(self, start, end):
+        offsets = self._layout.offsets
+        return offsets[end] - offsets[start]
+
+    def wrap(self, availWidth, availHeight):
+        self.height = self._layout.header_height + self._body_height(self._start, self._end)
+        return self.width, self.height
+
+    def _piece(self, start, end):
+        return FastTable(None, None, None, header_bg=self.header_bg, header_fg=self.header_fg,
+                         row_backgrounds=self.row_backgrounds, grid_color=self.grid_color,
+                         grid_width=self.grid_width, _layout=self._layout, _start=start, _end=end)
+
+    def split(self, availWidth, availHeight):
+        layout = self._layout
+        room = availHeight - layout.header_height
+        # Último índice cuja altura acumulada ainda cabe na página
+        end = bisect_right(layout.offsets, layout.offsets[self._start] + room, lo=self._start) - 1
+        if end <= self._start:
+            return []
+        if end >= self._end:
+            return [self]
+        return [self._piece(self._start, end), self._piece(end, self._end)]
+
+    def draw(self):
+        layout = self._layout
+        canv = self.canv
+        col_x = [0.0] + list(accumulate(layout.col_widths))
+        pad = layout.padding
+        y_top = self.height
+
+        # ===== Cabeçalho =====
+        canv.setFillColor(self.header_bg)
+        canv.rect(0, y_top - layout.header_height, self.width, layout.header_height, stroke=0, fill=1)
+        canv.setFillColor(self.header_fg)
+        canv.setFont(layout.header_font, layout.font_size)
+        for j, lines in enumerate(layout.header_lines):
+            y = y_top - pad - layout.font_size
+            for line in lines:
+                w = stringWidth(line, layout.header_font, layout.font_size)
+                canv.drawString(col_x[j] + pad + (layout.text_widths[j] - w) / 2.0, y, line)
+                y -= layout.header_leading
+
+        # ===== Zebra (recomeça em cada pedaço/página, como o ROWBACKGROUNDS da Table) =====
+        row_tops = []
+        y = y_top - layout.header_height
+        n_bg = len(self.row_backgrounds)
+        for i in range(self._start, self._end):
+            h = layout.heights[i]
+            row_tops.append(y)
+            bg = self.row_backgrounds[(i - self._start) % n_bg] if n_bg else None
+            if bg is not None:
+                canv.setFillColor(bg)
+                canv.rect(0, y - h, self.width, h, stroke=0, fill=1)
+            y -= h
+        y_bottom = y
+
+        # ===== Texto =====
+        canv.setFillColor(colors.black)
+        canv.setFont(layout.font, layout.font_size)
+        for i, top in zip(range(self._start, self._end), row_tops):
+            for j, lines in enumerate(layout.cells[i]):
+                x = col_x[j] + pad
+                y = top - pad - layout.font_size
+                for line in lines:
+                    if line:
+                        canv.drawString(x, y, line)
+                    y -= layout.leading
+
+        # ===== Grade =====
+        canv.setStrokeColor(self.grid_color)
+        canv.setLineWidth(self.grid_width)
+        horizontals = [y_top, y_top - layout.header_height] + [t - layout.heights[i] for i, t in
+                                                               zip(range(self._start, self._end), row_tops)]
+        canv.lines([(0, hy, self.width, hy) for hy in horizontals] +
+                   [(cx, y_top, cx, y_bottom) for cx in col_x])
@@ -2,19 +2,26 @@ from dotenv import load_dotenv
 import fdb
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import os
-from datetime import datetime
+import argparse
+import calendar
+from datetime import datetime, date, time
 import locale
-from git import Repo
-from matplotlib.offsetbox import OffsetImage, AnnotationBbox
-from vpn_manager import start_vpn, stop_vpn
+from functools import lru_cache
+from vpn_manager import start_vpn, stop_vpn_se_iniciada
+import metricas
+import snapshot_os
+from gravacao_fb import abrir_conexao
+from publicador_git import aguardar_publicacoes, get_publicador
+from consultas_os import (EXCLUIR_NOMES_RESUMO, SELECT_SEMANAS_FILIAL_VENDEDOR, SELECT_SEMANAS_LINHA, executar,
+                         fetch_dataframe, liberar_preparados, montar_consulta)
+import appconfig as cfg
 import atexit
 
 load_dotenv()
 
 # Registra a função para desligar a VPN quando o script terminar
-atexit.register(stop_vpn)
+atexit.register(stop_vpn_se_iniciada)
 
 # ============ CONFIGURAÇÃO DA CONEXÃO ============
 FB_HOST = os.getenv("DT_HOST")
@@ -36,12 +43,23 @@ MESES = {
     11: "NOVEMBRO",
     12: "DEZEMBRO"
 }
-mes_atual = MESES[datetime.now().month]
-ano_atual = datetime.now().year
+
+
+def titulo_mes(hoje=None):
+    # Calculado a cada execução: o agendador roda por vários meses no mesmo processo
+    hoje = hoje or date.today()
+    return f"ENTRADAS DE {MESES[hoje.month]} {hoje.year}"
+
+
+def titulo_grupo(rotulo, hoje=None):
+    # Mês abreviado: o título por filial/vendedor cabe na faixa sem encostar na logo
+    hoje = hoje or date.today()
+    return f"ENTRADAS {rotulo} - {hoje.month:02d}/{hoje.year}"
+
 
 # ============ CONFIG DA IMAGEM ============
-TITULO = f"ENTRADAS DE {mes_atual} {ano_atual}"          # ajuste conforme seu filtro
 ARQUIVO_SAIDA = "entradas_moya.png"  # caminho/arquivo de saída
+GRUPOS_DIR = os.getenv("ENTRADAS_GRUPOS_DIR", "entradas_grupos")  # imagens por filial/vendedor (--por-grupo)
 FIGSIZE = (8, 3)                           # largura x altura (polegadas) – ajuste se quiser
 FONTE_TABELA = 9                             # tamanho da fonte da tabela
 logo_path = 'logo_moya.png'
@@ -51,144 +69,6 @@ HEADER_BG = "#a51a19"
 HEADER_FG = "white"
 META_BG = "#1E3A8A"
 
-# ============ SUA QUERY ============
-SQL = """
-WITH base AS (
-    SELECT
-        p.linha,
-        TRIM(REPLACE(l.descricao, 'REMESSA RETORNO - ', '')) AS descricao,
-        o.abertura AS dt,
-        e.produto,
-        o.filial,
-        t.nome
-    FROM osordem o
-    JOIN cadastro t ON t.codigo = o.cadastro
-    JOIN osequipamentos e ON e.equipamento = o.equipamento
-    JOIN ceprodutos p ON p.produto = e.produto
-    LEFT JOIN celinhas l ON p.linha = l.linha
-    LEFT JOIN ossituacao s ON s.situacao = o.situacao
-    LEFT JOIN vendedores v ON v.vendedor = o.vendedor
-    LEFT JOIN vendedores v2 ON v2.vendedor = t.vendedortmk
-    WHERE EXTRACT(YEAR FROM o.abertura) = EXTRACT(YEAR FROM CURRENT_DATE)
-      AND EXTRACT(MONTH FROM o.abertura) = EXTRACT(MONTH FROM CURRENT_DATE)
-      AND t.nome NOT LIKE '%JCC%'
-      AND t.nome NOT LIKE 'LOG P%'
-),
-agg AS (
-    SELECT
-        linha,
-        descricao,
-        SUM(CASE WHEN EXTRACT(DAY FROM dt) BETWEEN 1 AND 7 THEN 1 ELSE 0 END) AS sem01,
-        SUM(CASE WHEN EXTRACT(DAY FROM dt) BETWEEN 8 AND 14 THEN 1 ELSE 0 END) AS sem02,
-        SUM(CASE WHEN EXTRACT(DAY FROM dt) BETWEEN 15 AND 21 THEN 1 ELSE 0 END) AS sem03,
-        SUM(CASE WHEN EXTRACT(DAY FROM dt) BETWEEN 22 AND 28 THEN 1 ELSE 0 END) AS sem04,
-        SUM(CASE WHEN EXTRACT(DAY FROM dt) >= 29 THEN 1 ELSE 0 END) AS sem05,
-        COUNT(produto) AS total
-    FROM base
-    GROUP BY linha, descricao
-)
-SELECT * FROM (
-    SELECT
-        'ZZZZF' as linha,
-        'Equip. de grande porte' as descricao,
-        SUM(a.sem01) as sem01,
-        SUM(a.sem02) as sem02,
-        SUM(a.sem03) as sem03,
-        SUM(a.sem04) as sem04,
-        SUM(a.sem05) as sem05,
-        SUM(a.total) as total,
-        null as meta,
-        null as perc
-    FROM agg a
-    WHERE linha IN ('RR0139','RR0140','RR0108','RR0131','RR0141','RR0137','RR0148','RR0117')
-    UNION ALL
-    SELECT
-        'ZZZZB' as linha,
-        'Motores Part / Alt.' as descricao,
-        SUM(a.sem01) as sem01,
-        SUM(a.sem02) as sem02,
-        SUM(a.sem03) as sem03,
-        SUM(a.sem04) as sem04,
-        SUM(a.sem05) as sem05,
-        SUM(a.total) as total,
-        470 as meta,
-        CASE WHEN 960 = 0 THEN NULL ELSE CAST((SUM(a.total) * 100.0) / 960 AS NUMERIC(9,2)) END AS perc
-    FROM agg a
-    WHERE linha IN ('RR0100', 'RR0103')
-    UNION ALL
-    SELECT
-        'ZZZZA' as linha,
-        'MOTOR EMP CC' as descricao,
-        SUM(a.sem01) as sem01,
-        SUM(a.sem02) as sem02,
-        SUM(a.sem03) as sem03,
-        SUM(a.sem04) as sem04,
-        SUM(a.sem05) as sem05,
-        SUM(a.total) as total,
-        330 as meta,
-        CASE WHEN 960 = 0 THEN NULL ELSE CAST((SUM(a.total) * 100.0) / 960 AS NUMERIC(9,2)) END AS perc
-    FROM agg a
-    WHERE linha IN ('RR0101')
-    UNION ALL
-    SELECT
-        'ZZZZC' as linha,
-        'MOTOR EMP CA' as descricao,
-        SUM(a.sem01) as sem01,
-        SUM(a.sem02) as sem02,
-        SUM(a.sem03) as sem03,
-        SUM(a.sem04) as sem04,
-        SUM(a.sem05) as sem05,
-        SUM(a.total) as total,
-        160 as meta,
-        CASE WHEN 960 = 0 THEN NULL ELSE CAST((SUM(a.total) * 100.0) / 960 AS NUMERIC(9,2)) END AS perc
-    FROM agg a
-    WHERE linha IN ('RR0102')
-    UNION ALL
-    SELECT
-        'ZZZZD' as linha,
-        'TRANSMISSÃO' as descricao,
-        SUM(a.sem01) as sem01,
-        SUM(a.sem02) as sem02,
-        SUM(a.sem03) as sem03,
-        SUM(a.sem04) as sem04,
-        SUM(a.sem05) as sem05,
-        SUM(a.total) as total,
-        70 as meta,
-        CASE WHEN 960 = 0 THEN NULL ELSE CAST((SUM(a.total) * 100.0) / 960 AS NUMERIC(9,2)) END AS perc
-    FROM agg a
-    WHERE linha IN ('RR0128')
-    UNION ALL
-    SELECT
-        'ZZZZE' as linha,
-        'POLIA DE FREIO' as descricao,
-        SUM(a.sem01) as sem01,
-        SUM(a.sem02) as sem02,
-        SUM(a.sem03) as sem03,
-        SUM(a.sem04) as sem04,
-        SUM(a.sem05) as sem05,
-        SUM(a.total) as total,
-        150 as meta,
-        CASE WHEN 960 = 0 THEN NULL ELSE CAST((SUM(a.total) * 100.0) / 960 AS NUMERIC(9,2)) END AS perc
-    FROM agg a
-    WHERE linha IN ('RR0115')
-    UNION ALL
-    SELECT
-        'ZZZZG' as linha,
-        'PLACAS ELETRÔNICAS' as descricao,
-        SUM(a.sem01) as sem01,
-        SUM(a.sem02) as sem02,
-        SUM(a.sem03) as sem03,
-        SUM(a.sem04) as sem04,
-        SUM(a.sem05) as sem05,
-        SUM(a.total) as total,
-        161 as meta,
-        CASE WHEN 960 = 0 THEN NULL ELSE CAST((SUM(a.total) * 100.0) / 960 AS NUMERIC(9,2)) END AS perc
-    FROM agg a
-    WHERE linha IN ('RR0105')
-) resultado
-ORDER BY linha, descricao;
-"""
-
 COL_WIDTHS = [0.372, 0.103, 0.100, 0.100, 0.100, 0.100, 0.098, 0.098, 0.098]
 
 # ============ FUNÇÕES AUXILIARES ============
@@ -205,21 +85,124 @@ def _fmt_pct(x):
         return ""
     return f"{round(float(x))}%"
 
-def render_entradas_table(
-    df: pd.DataFrame,
-    title: str,
-    outfile: str,
-    figsize=(12, 6),
-    header_bg=HEADER_BG,
-    meta_bg=META_BG,
-    header_fg=HEADER_FG,
-    col_widths=COL_WIDTHS,
-    font_size=FONTE_TABELA,
-    logo_path=logo_path
-):
+def agrupar_entradas(por_linha, grupos=None) -> pd.DataFrame:
     """
-    Espera df com colunas:
-    ['descricao','sem01','sem02','sem03','sem04','sem05','total','meta','perc']
+    Recebe a agregação por linha (linha, sem01..sem05, total) — DataFrame
+    tipado do Firebird (fetch_dataframe) ou tuplas do snapshot — e soma por grupo de cfg.GRUPOS_ENTRADA em uma operação
+    vetorizada. Retorna uma linha por grupo, ordenada pela chave, com meta e
+    perc = total / meta * 100. Grupos sem entradas saem com NaN (como o SUM
+    sem linhas do SQL antigo).
+    """
+    grupos = grupos if grupos is not None else cfg.GRUPOS_ENTRADA
+    semanas = ["sem01", "sem02", "sem03", "sem04", "sem05", "total"]
+    if isinstance(por_linha, pd.DataFrame):
+        df = por_linha.set_axis(["linha"] + semanas, axis=1)
+    else:
+        df = pd.DataFrame(por_linha, columns=["linha"] + semanas)
+    # Só converte o que não chegou numérico (colunas do fetch tipado já vêm em int64)
+    texto = [c for c in semanas if not pd.api.types.is_numeric_dtype(df[c])]
+    if texto:
+        df[texto] = df[texto].apply(pd.to_numeric, errors="coerce")
+
+    mapa ={linha: g["chave"] for g in grupos for linha in g["linhas"]}
+    df["chave"] = df["linha"].map(mapa)
+    somas = df.dropna(subset=["chave"]).groupby("chave")[semanas].sum()
+
+    meta = pd.DataFrame(
+        [{"chave": g["chave"], "descricao": g["descricao"], "meta": g["meta"]} for g in grupos]
+    ).set_index("chave")
+    out = meta.join(somas, how="left")
+    out["meta"] = pd.to_numeric(out["meta"], errors="coerce")
+    out["perc"] = np.where(out["meta"] > 0, out["total"] / out["meta"] * 100.0, np.nan)
+    out = out.reset_index().rename(columns={"chave": "linha"})
+    out = out.sort_values(["linha", "descricao"]).reset_index(drop=True)
+    return out[["linha", "descricao"] + semanas + ["meta", "perc"]]
+
+
+def todas_linhas(grupos=None):
+    grupos = grupos if grupos is not None else cfg.GRUPOS_ENTRADA
+    return sorted({linha for g in grupos for linha in g["linhas"]})
+
+
+def periodo_mes_atual(hoje=None):
+    """
+    Primeiro e último instante do mês corrente (mesmo recorte do EXTRACT no SQL).
+    """
+    hoje = hoje or date.today()
+    ultimo = calendar.monthrange(hoje.year, hoje.month)[1]
+    return date(hoje.year, hoje.month, 1), datetime.combine(date(hoje.year, hoje.month, ultimo), time.max)
+
+
+def montar_sql_resumo(dt_ini, dt_fim, grupos=None, por_filial_vendedor=False):
+    """
+    Uma passada agrupada por p.linha (semanas + total) no período, restrita às
+    linhas usadas nos grupos. por_filial_vendedor=True quebra também por
+    o.filial e o.vendedor (SELECT_SEMANAS_FILIAL_VENDEDOR). Retorna (sql, params).
+    """
+    if por_filial_vendedor:
+        select, group_by = SELECT_SEMANAS_FILIAL_VENDEDOR, "o.filial, o.vendedor, v.nomered, p.linha"
+    else:
+        select, group_by = SELECT_SEMANAS_LINHA, "p.linha"
+    return montar_consulta(select, dt_ini, dt_fim, linhas=todas_linhas(grupos),
+                           excluir_nomes=EXCLUIR_NOMES_RESUMO, group_by=group_by)
+
+
+def resumos_por_grupo(agregado, grupos=None):
+    """
+    Resumos a partir da agregação por filial/vendedor/linha
+    (SELECT_SEMANAS_FILIAL_VENDEDOR ou o equivalente do snapshot): o geral,
+    um por filial e um por vendedor, todos da mesma passada. As metas são da
+    empresa inteira, então nos resumos por filial/vendedor META e % ficam
+    vazios. Retorna [(nome, rótulo, df)] com nome "geral", "filial_<n>" ou
+    "vendedor_<id>" e rótulo None no geral; as OS sem filial/vendedor formam
+    os grupos "filial_sem" / "vendedor_sem".
+    """
+    grupos = grupos if grupos is not None else cfg.GRUPOS_ENTRADA
+    semanas = ["sem01", "sem02", "sem03", "sem04", "sem05", "total"]
+    colunas = ["filial", "vendedor", "nome_vendedor", "linha"] + semanas
+    if isinstance(agregado, pd.DataFrame):
+        df = agregado.set_axis(colunas, axis=1)
+    else:
+        df = pd.DataFrame(agregado, columns=colunas)
+    texto = [c for c in semanas if not pd.api.types.is_numeric_dtype(df[c])]
+    if texto:
+        df[texto] = df[texto].apply(pd.to_numeric, errors="coerce")
+    for c in ("filial", "vendedor"):
+        # Tuplas com um NULL viram float64 (1.0 no nome/título): inteiro anulável
+        if pd.api.types.is_numeric_dtype(df[c]):
+            df[c] = df[c].astype("Int64")
+
+    def _por_linha(parte):
+        return parte.groupby("linha", as_index=False)[semanas].sum()
+
+    sem_meta = [dict(g, meta=None) for g in grupos]
+    saida = [("geral", None, agrupar_entradas(_por_linha(df), grupos))]
+    # dropna=False: a chave nula vira um grupo próprio (por último)
+    for filial, parte in df.groupby("filial", sort=True, dropna=False):
+        if pd.isna(filial):
+            nome, rotulo = "filial_sem", "SEM FILIAL"
+        else:
+            nome, rotulo = f"filial_{filial}", f"FILIAL {filial}"
+        saida.append((nome, rotulo, agrupar_entradas(_por_linha(parte), sem_meta)))
+    for vendedor, parte in df.groupby("vendedor", sort=True, dropna=False):
+        if pd.isna(vendedor):
+            nome, rotulo = "vendedor_sem", "SEM VENDEDOR"
+        else:
+            nome_vendedor = parte["nome_vendedor"].iloc[0]
+            nome_vendedor = "" if pd.isna(nome_vendedor) else str(nome_vendedor).strip()
+            nome, rotulo = f"vendedor_{vendedor}", f"VEND. {nome_vendedor or vendedor}"
+        saida.append((nome, rotulo, agrupar_entradas(_por_linha(parte), sem_meta)))
+    return saida
+
+
+ROTULOS_COLUNAS = ["", "SEM 01","SEM 02","SEM 03","SEM 04","SEM 05","TOTAL","META","%"]
+
+
+def preparar_celulas(df: pd.DataFrame):
+    """
+    Textos da tabela (rótulos e células, com linha de totais) a partir do df
+    com colunas ['descricao','sem01','sem02','sem03','sem04','sem05','total','meta','perc'].
+    Compartilhado pelos renderizadores matplotlib e Pillow.
     """
     cols = ["descricao","sem01","sem02","sem03","sem04","sem05","total","meta","perc"]
     df = df[cols].copy()
@@ -233,7 +216,7 @@ def render_entradas_table(
         "sem04": df["sem04"].sum(),
         "sem05": df["sem05"].sum(),
         "total": df["total"].sum(),
-        "meta": df["meta"].sum(),
+        "meta": df["meta"].sum(min_count=1),
         "perc": (df["total"].sum() / df["meta"].sum() * 100.0) if df["meta"].sum() else np.nan,
     }
 
@@ -241,7 +224,7 @@ def render_entradas_table(
     df_display.loc[:, "descricao"] = "ENTRADA - " + df_display["descricao"]
     df_display = pd.concat([df_display, pd.DataFrame([total_row])], ignore_index=True)
 
-    col_labels = ["", "SEM 01","SEM 02","SEM 03","SEM 04","SEM 05","TOTAL","META","%"]
+    col_labels = ROTULOS_COLUNAS
 
     cell_text = []
     for _, r in df_display.iterrows():
@@ -257,165 +240,481 @@ def render_entradas_table(
             _fmt_pct(r["perc"]),
         ])
 
-    n_rows = len(df_display) + 1  # header + corpo
-    n_cols = len(col_labels)
+    return col_labels, cell_text
 
-    fig, ax = plt.subplots(figsize=figsize)
-    ax.axis("off")
 
-    table = ax.table(
-        cellText=cell_text,
-        colLabels=col_labels,
-        cellLoc="center",
-        colLoc="center",
-        loc="center",
-    )
-    table.auto_set_font_size(False)
-    table.set_fontsize(font_size)
-    table.scale(1, 1.3)
-
-    # === Cabeçalho ===
-    for j in range(n_cols):
-        cell = table[0, j]
-        cell.set_facecolor(header_bg)
-        cell.get_text().set_color(header_fg)
-        cell.set_edgecolor("black")
-        cell.set_linewidth(1.0)
-
-    # === Borda/cores do corpo + lógica da coluna % ===
-    last_row_idx = len(df_display) - 1
-    for i in range(1, n_rows):
+def cor_percentual(text):
+    """
+    (fundo, texto) da célula % conforme a faixa, ou None se vazia.
+    """
+    text = text.replace("%", "")
+    try:
+        pv = float(text) if text else np.nan
+    except Exception:
+        pv = np.nan
+    if np.isnan(pv):
+        return None
+    if pv < 100:
+        return "#FAD0D0", "#B91C1C"  # vermelho claro
+    elif 100 <= pv < 120:
+        return "#E7F6E7", "#065F46"  # verde claro
+    return "#DDEEFF", "#1E3A8A"      # azul claro
+
+
+class FiguraResumo:
+    """
+    Figura matplotlib da tabela montada uma vez: cabeçalho, larguras, bordas,
+    coluna META, faixa do título e logo. desenhar() só troca o texto das
+    células, as cores da coluna % e o título antes de salvar, então várias
+    imagens com o mesmo número de linhas (ex.: uma por filial/vendedor)
+    reaproveitam o layout em vez de refazer a figura.
+    """
+
+    def __init__(
+        self,
+        n_linhas,
+        figsize=(12, 6),
+        header_bg=HEADER_BG,
+        meta_bg=META_BG,
+        header_fg=HEADER_FG,
+        col_widths=COL_WIDTHS,
+        font_size=FONTE_TABELA,
+        logo_path=logo_path
+    ):
+        # Import tardio: matplotlib só é carregado quando este backend é usado
+        import matplotlib.pyplot as plt
+        from matplotlib.layout_engine import TightLayoutEngine
+        from matplotlib.offsetbox import OffsetImage, AnnotationBbox
+
+        self._plt = plt
+        n_cols = len(ROTULOS_COLUNAS)
+        self.n_linhas = n_linhas  # linhas do corpo (grupos + totais)
+        n_rows = n_linhas + 1     # header + corpo
+
+        fig, ax = plt.subplots(figsize=figsize)
+        ax.axis("off")
+
+        table = ax.table(
+            cellText=[[""] * n_cols for _ in range(n_linhas)],
+            colLabels=ROTULOS_COLUNAS,
+            cellLoc="center",
+            colLoc="center",
+            loc="center",
+        )
+        table.auto_set_font_size(False)
+        table.set_fontsize(font_size)
+        table.scale(1, 1.3)
+
+        # === Cabeçalho ===
         for j in range(n_cols):
-            cell = table[i, j]
+            cell = table[0, j]
+            cell.set_facecolor(header_bg)
+            cell.get_text().set_color(header_fg)
             cell.set_edgecolor("black")
             cell.set_linewidth(1.0)
 
-            # Coluna META
-            if j == 7:
-                cell.set_facecolor(meta_bg)
-                cell.get_text().set_color("white")
+        # === Borda/cores do corpo (a coluna % é colorida em desenhar) ===
+        for i in range(1, n_rows):
+            for j in range(n_cols):
+                cell = table[i, j]
+                cell.set_edgecolor("black")
+                cell.set_linewidth(1.0)
+
+                # Coluna META
+                if j == 7:
+                    cell.set_facecolor(meta_bg)
+                    cell.get_text().set_color("white")
+
+        # === LARGURAS POR COLUNA ===
+        # Aplica a largura definida em col_widths para TODAS as células daquela coluna.
+        if col_widths and len(col_widths) == n_cols:
+            for j, w in enumerate(col_widths):
+                for i in range(n_rows):  # header + linhas
+                    table[i, j].set_width(w)
+
+        # Título com faixa
+        self._titulo = ax.set_title(
+            "",
+            fontsize=16, fontweight="bold", pad=16, color="white",
+            bbox=dict(facecolor=HEADER_BG, edgecolor="black", boxstyle="round,pad=0.4")
+        )
 
-            # Coluna % com cor condicional (linhas de categoria)
-            if j == 8 and i <= last_row_idx:
-                text = cell.get_text().get_text().replace("%", "")
-                try:
-                    pv = float(text) if text else np.nan
-                except Exception:
-                    pv = np.nan
-                if not np.isnan(pv):
-                    if pv < 100:
-                        cell.set_facecolor("#FAD0D0")  # vermelho claro
-                        cell.get_text().set_color("#B91C1C")
-                    elif 100 <= pv < 120:
-                        cell.set_facecolor("#E7F6E7")  # verde claro
-                        cell.get_text().set_color("#065F46")
-                    else:
-                        cell.set_facecolor("#DDEEFF")  # azul claro
-                        cell.get_text().set_color("#1E3A8A")
-
-    # === LARGURAS POR COLUNA ===
-    # Aplica a largura definida em col_widths para TODAS as células daquela coluna.
-    if col_widths and len(col_widths) == n_cols:
-        for j, w in enumerate(col_widths):
-            for i in range(n_rows):  # header + linhas
-                table[i, j].set_width(w)
-    else:
-        # fallback suave: nada a fazer, mantém proporções default
-        pass
-
-    # Título com faixa
-    ax.set_title(
-        title,
-        fontsize=16, fontweight="bold", pad=16, color="white",
-        bbox=dict(facecolor=HEADER_BG, edgecolor="black", boxstyle="round,pad=0.4")
-    )
+        if logo_path:
+            try:
+                logo = plt.imread(logo_path)
+                imagebox = OffsetImage(logo, zoom=0.3)  # ajuste o zoom conforme necessário
+                ab = AnnotationBbox(
+                    imagebox,
+                    (0.03, 1.08),  # posição relativa ao eixo (x>1 joga à direita do título)
+                    xycoords="axes fraction",
+                    frameon=False
+                )
+                ax.add_artist(ab)
+            except Exception as e:
+                print(f"Erro ao carregar logo: {e}")
+
+        # Mesmo ajuste do fig.tight_layout(), sem deixar um layout engine na
+        # figura (com ele o savefig redesenha tudo a cada imagem)
+        TightLayoutEngine().execute(fig)
+        self.fig = fig
+        self.table = table
+        # Recorte do bbox_inches="tight", calculado uma vez: com ele fixo o
+        # savefig desenha a figura uma vez só (o "tight" desenha duas)
+        self._recorte = None
+        self._largura_titulo = 0.0
+
+    def desenhar(self, df: pd.DataFrame, title: str, outfile: str):
+        """
+        Preenche a tabela com df (colunas como em preparar_celulas) e salva em outfile.
+        """
+        _, cell_text = preparar_celulas(df)
+        if len(cell_text) != self.n_linhas:
+            raise ValueError(f"FiguraResumo montada para {self.n_linhas} linhas, recebeu {len(cell_text)}")
+
+        last_row_idx = len(cell_text) - 1
+        for i, valores in enumerate(cell_text, start=1):
+            for j, texto in enumerate(valores):
+                cell = self.table[i, j]
+                cell.get_text().set_text(texto)
+
+                # Coluna % com cor condicional (linhas de categoria)
+                if j == 8 and i <= last_row_idx:
+                    fundo, cor = cor_percentual(texto) or ("white", "black")
+                    cell.set_facecolor(fundo)
+                    cell.get_text().set_color(cor)
+
+        self._titulo.set_text(title)
+        with metricas.span("savefig"):
+            self.fig.savefig(outfile, dpi=200, bbox_inches=self._bbox_tight())
+        return outfile
+
+    def _bbox_tight(self):
+        # Só o título muda de largura entre imagens: refaz o recorte se ele crescer
+        renderer = self.fig.canvas.get_renderer()
+        largura = self._titulo.get_window_extent(renderer).width
+        if self._recorte is None or largura > self._largura_titulo:
+            self.fig.canvas.draw()
+            self._recorte = self.fig.get_tightbbox(renderer).padded(0.1)  # pad_inches padrão
+            self._largura_titulo = largura
+        return self._recorte
+
+    def fechar(self):
+        self._plt.close(self.fig)
+
+
+def render_entradas_table(
+    df: pd.DataFrame,
+    title: str,
+    outfile: str,
+    figsize=(12, 6),
+    header_bg=HEADER_BG,
+    meta_bg=META_BG,
+    header_fg=HEADER_FG,
+    col_widths=COL_WIDTHS,
+    font_size=FONTE_TABELA,
+    logo_path=logo_path
+):
+    """
+    Espera df com colunas:
+    ['descricao','sem01','sem02','sem03','sem04','sem05','total','meta','perc']
+    """
+    figura = FiguraResumo(len(df) + 1, figsize=figsize, header_bg=header_bg, meta_bg=meta_bg,
+                          header_fg=header_fg, col_widths=col_widths, font_size=font_size,
+                          logo_path=logo_path)
+    try:
+        return figura.desenhar(df, title, outfile)
+    finally:
+        figura.fechar()
+
+@lru_cache(maxsize=16)
+def _fonte_pil(size, bold=False):
+    from PIL import ImageFont
+    # DejaVu é a fonte padrão do matplotlib: mantém a imagem comparável
+    nome = "DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf"
+    try:
+        return ImageFont.truetype(nome, size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+
+@lru_cache(maxsize=4)
+def _logo_pil(caminho, mtime, zoom):
+    # Logo já redimensionada; mtime na chave recarrega se o arquivo mudar
+    from PIL import Image
+    with Image.open(caminho) as logo:
+        logo = logo.convert("RGBA")
+        return logo.resize((max(1, round(logo.width * zoom)), max(1, round(logo.height * zoom))),
+                           Image.LANCZOS)
+
+
+def render_entradas_table_pil(
+    df: pd.DataFrame,
+    title: str,
+    outfile: str,
+    figsize=(12, 6),
+    header_bg=HEADER_BG,
+    meta_bg=META_BG,
+    header_fg=HEADER_FG,
+    col_widths=COL_WIDTHS,
+    font_size=FONTE_TABELA,
+    logo_path=logo_path,
+    dpi=200,
+):
+    """
+    Mesmo layout de render_entradas_table desenhado direto com Pillow, sem
+    importar matplotlib: faixa de título, logo, cabeçalho, coluna META e
+    faixas de cor da coluna %. Medidas em pontos convertidas para pixels no dpi.
+    """
+    from PIL import Image, ImageDraw
 
+    col_labels, cell_text = preparar_celulas(df)
+    n_cols = len(col_labels)
+    escala = dpi / 72.0
+    if not col_widths or len(col_widths) != n_cols:
+        col_widths = [1.0 / n_cols] * n_cols
+
+    fonte = _fonte_pil(round(font_size * escala))
+    fonte_titulo = _fonte_pil(round(16 * escala), bold=True)
+    borda = max(1, round(1.0 * escala))
+    margem = round(0.1 * dpi)  # pad_inches padrão do bbox_inches="tight"
+
+    # Largura útil do eixo após tight_layout; col_widths são frações dela (como no ax.table)
+    eixo_w = figsize[0] * dpi * 0.825
+    larguras = [round(w * eixo_w) for w in col_widths]
+    tabela_w = sum(larguras)
+    # Altura da linha do ax.table (texto + folga) * 1.3 do table.scale(1, 1.3)
+    linha_h = round(font_size * escala * 1.24 * 1.3)
+    tabela_h = linha_h * (len(cell_text) + 1)
+
+    # Faixa do título (boxstyle round,pad=0.4) e distância pad=16pt da tabela
+    tb = fonte_titulo.getbbox(title)
+    ascent, descent = fonte_titulo.getmetrics()
+    pad_titulo = round(0.4 * 16 * escala)
+    titulo_w = (tb[2] - tb[0]) + 2 * pad_titulo
+    titulo_h = ascent + descent + 2 * pad_titulo
+    gap = round(19 * escala)
+
+    largura = tabela_w + 2 * margem + borda
+    altura = margem + titulo_h + gap + tabela_h + margem + borda
+    img = Image.new("RGB", (largura, altura), "white")
+    draw = ImageDraw.Draw(img)
+
+    # ===== Título =====
+    tx0 = margem + (tabela_w - titulo_w) // 2
+    ty0 = margem
+    draw.rounded_rectangle([tx0, ty0, tx0 + titulo_w, ty0 + titulo_h], radius=pad_titulo,
+                           fill=HEADER_BG, outline="black", width=borda)
+    draw.text((tx0 + titulo_w / 2, ty0 + titulo_h / 2), title, font=fonte_titulo, fill="white", anchor="mm")
+
+    # ===== Logo (zoom 0.3, como o OffsetImage) =====
     if logo_path:
         try:
-            logo = plt.imread(logo_path)
-            imagebox = OffsetImage(logo, zoom=0.3)  # ajuste o zoom conforme necessário
-            ab = AnnotationBbox(
-                imagebox,
-                (0.03, 1.08),  # posição relativa ao eixo (x>1 joga à direita do título)
-                xycoords="axes fraction",
-                frameon=False
-            )
-            ax.add_artist(ab)
+            logo = _logo_pil(logo_path, os.stat(logo_path).st_mtime_ns, 0.3 * escala)
+            # (0.03, 1.08) em fração do eixo: um pouco abaixo do centro do título
+            ly = max(0, ty0 + titulo_h // 2 + round(7 * escala) - logo.height // 2)
+            img.paste(logo, (margem, ly), logo)
         except Exception as e:
             print(f"Erro ao carregar logo: {e}")
 
-    plt.tight_layout()
-    fig.savefig(outfile, dpi=200, bbox_inches="tight")
-    plt.close(fig)
+    # ===== Tabela =====
+    x_cols = [margem]
+    for w in larguras:
+        x_cols.append(x_cols[-1] + w)
+    y0 = margem + titulo_h + gap
+    last_row_idx = len(cell_text) - 1
+    linhas = [col_labels] + cell_text
+
+    for i, valores in enumerate(linhas):
+        y = y0 + i * linha_h
+        for j, texto in enumerate(valores):
+            fundo, cor = "white", "black"
+            if i == 0:
+                fundo, cor = header_bg, header_fg
+            elif j == 7:
+                fundo, cor = meta_bg, "white"
+            elif j == 8 and i <= last_row_idx:
+                fundo, cor = cor_percentual(texto) or (fundo, cor)
+            draw.rectangle([x_cols[j], y, x_cols[j + 1], y + linha_h], fill=fundo)
+            if texto:
+                draw.text(((x_cols[j] + x_cols[j + 1]) / 2, y + linha_h / 2), str(texto),
+                          font=fonte, fill=cor, anchor="mm")
+
+    # Grade por cima, uma linha por borda (células vizinhas não dobram a espessura)
+    y_fim = y0 + tabela_h
+    for x in x_cols:
+        draw.line([(x, y0 - borda // 2), (x, y_fim + borda // 2)], fill="black", width=borda)
+    for i in range(len(linhas) + 1):
+        y = y0 + i * linha_h
+        draw.line([(x_cols[0] - borda // 2, y), (x_cols[-1] + borda // 2, y)], fill="black", width=borda)
+
+    with metricas.span("savefig"):
+        img.save(outfile, dpi=(dpi, dpi))
     return outfile
 
-# ============ EXECUÇÃO ============
-def main():
-    # Inicia a VPN antes de conectar ao banco
-    if not start_vpn():
-        print("Erro ao iniciar a VPN. Abortando execução.")
-        return
 
-    con = fdb.connect(
+def renderizar_varios(itens, renderer="pillow", **kwargs):
+    """
+    Várias imagens de uma vez: itens = [(df, title, outfile)]. No matplotlib
+    a FiguraResumo é montada uma vez e reaproveitada enquanto o número de
+    linhas não mudar; no Pillow cada imagem é desenhada direto (fontes e logo
+    ficam em cache). Retorna a lista de arquivos gerados.
+    """
+    gerados = []
+    figura = None
+    try:
+        for df, title, outfile in itens:
+            if renderer == "pillow":
+                try:
+                    gerados.append(render_entradas_table_pil(df, title=title, outfile=outfile, **kwargs))
+                    continue
+                except Exception as e:
+                    print(f"Renderização Pillow falhou ({e}); usando matplotlib.")
+            if figura is None or figura.n_linhas != len(df) + 1:
+                if figura is not None:
+                    figura.fechar()
+                figura = FiguraResumo(len(df) + 1, **kwargs)
+            gerados.append(figura.desenhar(df, title, outfile))
+    finally:
+        if figura is not None:
+            figura.fechar()
+    return gerados
+
+
+def renderizar(df, renderer="pillow", **kwargs):
+    """
+    Gera a imagem com o backend escolhido ("pillow" ou "matplotlib").
+    Se o Pillow falhar, cai para o matplotlib.
+    """
+    if renderer == "pillow":
+        try:
+            return render_entradas_table_pil(df, **kwargs)
+        except Exception as e:
+            print(f"Renderização Pillow falhou ({e}); usando matplotlib.")
+    return render_entradas_table(df, **kwargs)
+
+
+# ============ EXECUÇÃO ============
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Imagem resumo das entradas do mês")
+    parser.add_argument("--renderer", choices=["pillow", "matplotlib"], default=os.getenv("ENTRADAS_RENDERER", "pillow"),
+                        help="backend da imagem (matplotlib fica como alternativa/fallback)")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="sincroniza o snapshot local (delta) e agrega a partir dele")
+    parser.add_argument("--sem-publicar", action="store_true",
+                        help="só gera a imagem, sem commit/push no repositório")
+    parser.add_argument("--por-grupo", action="store_true",
+                        help="gera também uma imagem por filial e por vendedor (mesma consulta) em ENTRADAS_GRUPOS_DIR")
+    gravacao = parser.add_mutually_exclusive_group()
+    gravacao.add_argument("--gravar", metavar="ARQUIVO",
+                          help="grava as consultas ao Firebird (SQL, parâmetros e resultado) em ARQUIVO (ver gravacao_fb)")
+    gravacao.add_argument("--replay", metavar="ARQUIVO",
+                          help="usa as consultas gravadas em ARQUIVO no lugar do Firebird (sem VPN/rede)")
+    return parser.parse_args(argv)
+
+
+def conectar():
+    return fdb.connect(
         host=FB_HOST,
         database=FB_DATABASE,
         user=FB_USER,
         password=FB_PASSWORD,
         charset=FB_CHARSET,
     )
-    try:
-        cur = con.cursor()
-        cur.execute(SQL)
-        rows = cur.fetchall()
-        cols = [d[0].lower() for d in cur.description]
-
-        df = pd.DataFrame(rows, columns=cols)
-
-        # Garante tipos e colunas esperadas
-        needed = ["descricao","sem01","sem02","sem03","sem04","sem05","total","meta","perc"]
-        for c in needed:
-            if c not in df.columns:
-                raise ValueError(f"Coluna esperada não encontrada: {c}")
-
-        for c in ["sem01","sem02","sem03","sem04","sem05","total","meta","perc"]:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-
-        # Caso perc venha NULL, calcula
-        if df["perc"].isna().any():
-            df["perc"] = np.where(df["meta"] > 0, (df["total"] / df["meta"] * 100.0), np.nan)
-
-        # Renderiza
-        outfile = render_entradas_table(
-            df,
-            title=TITULO,
-            outfile=ARQUIVO_SAIDA,
-            figsize=FIGSIZE,
-            col_widths=COL_WIDTHS,
-            font_size=FONTE_TABELA,
-            logo_path="logo_moya.png"
-        )
-        print(f"Imagem gerada: {outfile}")
 
-        repo_dir = '/home/ubuntu/repositorios/entradas_moya'
 
-        # Bloco do Git (mantido como no original)
+def gerar_resumo(con, renderer="pillow", snapshot=False, publicar=True, por_grupo=False):
+    """
+    Consulta, renderiza e publica a imagem do mês corrente usando uma conexão
+    já aberta (main ou o agendador). Não fecha a conexão. Retorna o arquivo gerado.
+    A publicação no Git só é enfileirada (ver publicador_git).
+    por_grupo=True gera, na mesma passada, também uma imagem por filial e por
+    vendedor em GRUPOS_DIR (ver resumos_por_grupo); o retorno continua sendo a geral.
+    """
+    periodo = periodo_mes_atual()
+    if snapshot:
+        snap = snapshot_os.open_snapshot()
+        try:
+            with metricas.span("snapshot_sync"):
+                snapshot_os.sync_snapshot(con, snap)
+            with metricas.span("fetch") as s:
+                por_linha = snapshot_os.load_semanas_linha(snap, *periodo, linhas=todas_linhas(),
+                                                           por_filial_vendedor=por_grupo)
+                s.contar(linhas=len(por_linha))
+        finally:
+            snap.close()
+    else:
+        with metricas.span("consulta"):
+            cur = executar(con, *montar_sql_resumo(*periodo, por_filial_vendedor=por_grupo))
+        with metricas.span("fetch") as s:
+            por_linha = fetch_dataframe(cur)
+            s.contar(linhas=len(por_linha))
+
+    titulo = titulo_mes()
+    with metricas.span("agregacao"):
+        if por_grupo:
+            itens = []
+            for nome, rotulo, df in resumos_por_grupo(por_linha):
+                if rotulo is None:
+                    itens.append((df, titulo, ARQUIVO_SAIDA))
+                else:
+                    itens.append((df, titulo_grupo(rotulo), os.path.join(GRUPOS_DIR, f"entradas_{nome}.png")))
+            os.makedirs(GRUPOS_DIR, exist_ok=True)
+        else:
+            itens = [(agrupar_entradas(por_linha), titulo, ARQUIVO_SAIDA)]
+
+    # Renderiza
+    with metricas.span("render", renderer=renderer) as s:
+        opcoes = dict(figsize=FIGSIZE, col_widths=COL_WIDTHS, font_size=FONTE_TABELA, logo_path="logo_moya.png")
+        if len(itens) == 1:
+            df, title, outfile = itens[0]
+            gerados = [renderizar(df, renderer=renderer, title=title, outfile=outfile, **opcoes)]
+        else:
+            gerados = renderizar_varios(itens, renderer=renderer, **opcoes)
+        s.contar(imagens=len(gerados), bytes=sum(os.path.getsize(f) for f in gerados))
+    outfile = gerados[0]
+    if len(gerados) == 1:
+        print(f"Imagem gerada: {outfile}")
+    else:
+        print(f"Imagens geradas: {outfile} + {len(gerados) - 1} por filial/vendedor em {GRUPOS_DIR}/")
+
+    # Commit/push em segundo plano (publicador_git): a renderização não espera
+    if publicar:
         try:
-            # Descomente as linhas abaixo para usar o Git
-            repo = Repo(repo_dir)
-            repo.git.add('entradas_moya.png')
-            repo.index.commit('Atualização entradas MOYA')
-            origin = repo.remote(name='origin')
-            origin.push()
-            print("Arquivo enviado para o GitHub com sucesso!")
+            with metricas.span("publicar"):
+                pub = get_publicador()
+                for arquivo in gerados:
+                    pub.publicar(arquivo)
         except Exception as e:
             print(f"Erro ao enviar para o GitHub: {e}")
 
-    finally:
+    return outfile
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with metricas.execucao("resumo"):
+        # Inicia a VPN antes de conectar ao banco (o replay não usa a rede)
+        if not args.replay:
+            with metricas.span("vpn"):
+                vpn_ok = start_vpn()
+            if not vpn_ok:
+                print("Erro ao iniciar a VPN. Abortando execução.")
+                return
+
+        with metricas.span("conexao"):
+            con = abrir_conexao(conectar, gravar=args.gravar, replay=args.replay)
         try:
-            cur.close()
-        except Exception:
-            pass
-        con.close()
+            gerar_resumo(con, renderer=args.renderer, snapshot=args.snapshot, publicar=not args.sem_publicar,
+                         por_grupo=args.por_grupo)
+        finally:
+            liberar_preparados(con)
+            con.close()
+
+        # Execução avulsa: espera o push antes de sair (e antes de derrubar a VPN)
+        if not args.sem_publicar:
+            with metricas.span("git_push"):
+                aguardar_publicacoes()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
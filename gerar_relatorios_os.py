@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Spacer, Paragraph
 from reportlab.lib import colors
@@ -8,17 +8,73 @@ from reportlab.lib.utils import ImageReader
 from reportlab.platypus import KeepTogether
 from dotenv import load_dotenv
 import fdb
+import pandas as pd
 import os
 import re
+import argparse
+import zlib
+import time as time_mod
+import hashlib
+import json
+from bisect import bisect_right
+from collections import Counter
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 from svglib.svglib import svg2rlg
 from reportlab.graphics import renderPDF
 
+import metricas
+import exportar_os
+import snapshot_os
+from gravacao_fb import abrir_conexao
+import publicador_git
+from consultas_os import (EXCLUIR_NOMES_RELATORIO, SELECT_DETALHE, executar, fetch_colunas, iter_colunas,
+                          liberar_preparados, montar_consulta, textos_coluna)
+from fast_table import FastTable
+
 load_dotenv()
 
 
-def make_header_footer(title: str, filter_text: str):
+# ------------ logo: decodificada uma vez por processo ------------
+_LOGO_CACHE = {}
+
+
+def _get_logo(path):
+    """
+    ImageReader da logo em cache por (caminho, mtime): o arquivo é lido e
+    decodificado uma vez por processo; uma logo nova no disco invalida o cache.
+    """
+    path = os.path.abspath(path)
+    mtime_ns = os.stat(path).st_mtime_ns
+    entry = _LOGO_CACHE.get(path)
+    if entry is None or entry[0] != mtime_ns:
+        logo = ImageReader(path)
+        logo.getRGBData()  # força a decodificação agora (fica guardada no reader)
+        entry = (mtime_ns, logo)
+        _LOGO_CACHE[path] = entry
+    return entry
+
+
+def _draw_logo(canvas, path, x, y, width, height):
+    """
+    Desenha a logo como form XObject: definida uma vez por documento e
+    apenas referenciada (doForm) nas demais páginas.
+    """
+    mtime_ns, logo = _get_logo(path)
+    form_name = f"Logo_{zlib.crc32(path.encode())}_{mtime_ns}_{width}x{height}"
+    if not canvas.hasForm(form_name):
+        canvas.beginForm(form_name)
+        canvas.drawImage(logo, 0, 0, width=width, height=height, mask="auto")
+        canvas.endForm()
+    canvas.saveState()
+    canvas.translate(x, y)
+    canvas.doForm(form_name)
+    canvas.restoreState()
+
+
+def make_header_footer(title: str, filter_text: str, logo_path: str = "logo_moya.png"):
     def header_footer(canvas, doc):
         canvas.saveState()
         page_w, page_h = A4
@@ -29,12 +85,11 @@ def make_header_footer(title: str, filter_text: str):
 
         # ===== Logo PNG =====
         try:
-            logo = ImageReader("logo_moya.png")
             logo_w = 60   # largura em pontos
             logo_h = 22   # altura em pontos
             logo_x = left_x + 10
             logo_y = top_y - logo_h + 45
-            canvas.drawImage(logo, logo_x, logo_y, width=logo_w, height=logo_h, mask="auto")
+            _draw_logo(canvas, logo_path, logo_x, logo_y, logo_w, logo_h)
         except Exception as e:
             print("Erro ao carregar logo PNG:", e)
             logo_w = 0
@@ -79,6 +134,11 @@ def get_conn(db_config):
     )
 
 
+def close_conn(conn):
+    liberar_preparados(conn)
+    conn.close()
+
+
 # ------------ NOVO: listar vendedores no período ------------
 def list_vendedores(conn, dt_ini, dt_fim):
     """
@@ -92,85 +152,141 @@ def list_vendedores(conn, dt_ini, dt_fim):
          WHERE o.Abertura BETWEEN ? AND ?
          ORDER BY 1
     """
-    cur = conn.cursor()
-    cur.execute(sql, (dt_ini, dt_fim))
-    return cur.fetchall()  # [(id, nomeReduzido), ...]
+    return executar(conn, sql, (dt_ini, dt_fim)).fetchall()  # [(id, nomeReduzido), ...]
+
+
+# Colunas exibidas no PDF; em modo "com_chaves" a query traz, após elas,
+# o.vendedor, p.linha e v.nomered para o fan-out em memória.
+N_COLS_RELATORIO = 12
+IDX_VENDEDOR_ID = N_COLS_RELATORIO
+IDX_LINHA_ID = N_COLS_RELATORIO + 1
+IDX_VENDEDOR_NOME = N_COLS_RELATORIO + 2
+IDX_DESC_LINHA = 2
+
+
+def _query_detalhe(dt_ini, dt_fim, vendedor=None, com_chaves=False):
+    select = SELECT_DETALHE
+    if com_chaves:
+        select += ", o.vendedor, p.linha, COALESCE(v.nomered, '')"
+    return montar_consulta(select, dt_ini, dt_fim, vendedor=vendedor,
+                           excluir_nomes=EXCLUIR_NOMES_RELATORIO, order_by="o.situacao, o.ordem")
+
+
+def _linhas_de_colunas(colunas):
+    """
+    Colunas (fetch_colunas/iter_colunas) -> linhas do relatório. As colunas
+    exibidas já saem como texto (um str() por valor distinto, NULL = None);
+    as chaves extras de com_chaves mantêm o valor Python (int/str).
+    """
+    colunas = list(colunas.values())
+    saida = [textos_coluna(c) for c in colunas[:N_COLS_RELATORIO]]
+    for c in colunas[N_COLS_RELATORIO:]:
+        saida.append([None if v is pd.NA else v for v in c.tolist()])
+    return list(zip(*saida))
 
 
-def get_data_from_firebird(conn, dt_ini, dt_fim, vendedor=None):
+def get_data_from_firebird(conn, dt_ini, dt_fim, vendedor=None, com_chaves=False):
     """
     Busca dados. Se vendedor for informado, aplica AND o.vendedor = ?
+    Se com_chaves=True, acrescenta ao final de cada linha o.vendedor, p.linha
+    e o nome reduzido do vendedor (ver split_por_vendedor / resumo_from_rows).
     """
     data = []
     try:
-        cursor = conn.cursor()
-        base_query = """
-        SELECT
-               o.situacao,
-               CASE o.situacao
-                 WHEN '90' THEN 'Cancelado'
-                 WHEN '99' THEN 'Encerrado'
-                 ELSE s.descricao
-               END AS desc_situacao,
-               REPLACE(L.descricao, 'REMESSA RETORNO - ', '') AS descricao_linha,
-               o.ordem, o.abertura, o.cadastro,  t.nome,
-               e.produto AS RR, e.descricao AS desc_equipamento,
-               CAST(o.Ent_Prev AS DATE) AS Prev_Conclusao,
-               o.vendedor || ' - ' || v.nomered AS nome_vendedor,
-               t.vendedortmk || ' - ' || v2.nomered AS nome_vend_interno
-          FROM osordem o
-          INNER JOIN cadastro t ON t.codigo = o.cadastro
-          INNER JOIN osequipamentos e ON e.equipamento = o.equipamento
-          INNER JOIN ceprodutos p ON p.produto = e.produto
-          LEFT JOIN celinhas L ON p.linha = L.linha
-          LEFT JOIN ossituacao s ON s.situacao = o.situacao
-          LEFT JOIN vendedores v ON v.vendedor = o.vendedor
-          LEFT JOIN vendedores v2 ON v2.vendedor = t.vendedortmk
-         WHERE o.Abertura BETWEEN ? AND ?
-         AND t.nome NOT LIKE '%JCC%'
-         AND t.nome NOT LIKE 'LOG %'
-        """
-        params = [dt_ini, dt_fim]
-        if vendedor is not None:
-            base_query += " AND o.vendedor = ?"
-            params.append(vendedor)
-
-        base_query += " ORDER BY o.situacao, o.ordem"
-        cursor.execute(base_query, tuple(params))
-        data = cursor.fetchall()
+        with metricas.span("consulta"):
+            cursor = executar(conn, *_query_detalhe(dt_ini, dt_fim, vendedor, com_chaves))
+        with metricas.span("fetch") as s:
+            data = _linhas_de_colunas(fetch_colunas(cursor))
+            s.contar(linhas=len(data))
     except Exception as e:
         print(f"Erro ao buscar dados do Firebird: {e}")
     return data
 
+
+def iter_data_from_firebird(conn, dt_ini, dt_fim, vendedor=None, com_chaves=True, batch_size=2000):
+    """
+    Mesma consulta de get_data_from_firebird, entregue linha a linha em lotes
+    de fetchmany(batch_size) para não materializar o período inteiro.
+    Erros são propagados (um PDF pela metade não deve passar despercebido).
+    """
+    cursor = executar(conn, *_query_detalhe(dt_ini, dt_fim, vendedor, com_chaves))
+    for colunas in iter_colunas(cursor, batch_size):
+        yield from _linhas_de_colunas(colunas)
+
 def get_resumo_linha(conn, dt_ini, dt_fim, vendedor=None):
     """
     Retorna lista de tuplas (linha, descricao, quantidade) do resumo por linha.
     """
-    sql = """
-        SELECT P.linha, REPLACE(L.descricao, 'REMESSA RETORNO - ', '') AS descricao, COUNT(E.produto) AS qtde
-          FROM osordem o
-          INNER JOIN cadastro t ON t.codigo = o.cadastro
-          INNER JOIN osequipamentos e ON e.equipamento = o.equipamento
-          INNER JOIN ceprodutos p ON p.produto = e.produto
-          LEFT JOIN celinhas L ON p.linha = L.linha
-          LEFT JOIN ossituacao s ON s.situacao = o.situacao
-          LEFT JOIN vendedores v ON v.vendedor = o.vendedor
-          LEFT JOIN vendedores v2 ON v2.vendedor = t.vendedortmk
-         WHERE o.Abertura BETWEEN ? AND ?
+    sql, params = montar_consulta(
+        "SELECT P.linha, REPLACE(L.descricao, 'REMESSA RETORNO - ', '') AS descricao, COUNT(E.produto) AS qtde",
+        dt_ini, dt_fim, vendedor=vendedor,
+        group_by="P.linha, L.descricao", order_by="P.linha, L.descricao",
+    )
+    with metricas.span("consulta_resumo"):
+        return executar(conn, sql, params).fetchall()  # [(linha, descricao, qtde), ...]
+
+
+# ------------ fan-out em memória (uma única consulta no período) ------------
+def strip_chaves(rows):
+    """
+    Remove as colunas extras de rows obtidas com com_chaves=True.
     """
-    params = [dt_ini, dt_fim]
-    if vendedor is not None:
-        sql += " AND o.vendedor = ?"
-        params.append(vendedor)
-    sql += " GROUP BY P.linha, L.descricao ORDER BY P.linha, L.descricao"
-    cur = conn.cursor()
-    cur.execute(sql, tuple(params))
-    return cur.fetchall()  # [(linha, descricao, qtde), ...]
+    return [row[:N_COLS_RELATORIO] for row in rows]
+
+
+def split_por_vendedor(rows):
+    """
+    Agrupa rows (com_chaves=True) por o.vendedor, preservando a ordem original.
+    Retorna (grupos, nomes): {vendedor_id: [rows]} e {vendedor_id: nomered}.
+    """
+    grupos = {}
+    nomes = {}
+    for row in rows:
+        vend_id = row[IDX_VENDEDOR_ID]
+        grupos.setdefault(vend_id, []).append(row)
+        nomes.setdefault(vend_id, row[IDX_VENDEDOR_NOME] or "")
+    return grupos, nomes
+
+
+def resumo_from_rows(rows):
+    """
+    Equivalente em memória de get_resumo_linha: lista de tuplas
+    (linha, descricao, quantidade) calculada a partir de rows com_chaves=True.
+    Diferença: as linhas já vêm sem os clientes de EXCLUIR_NOMES_RELATORIO
+    (JCC/LOG), então o resumo fecha com o Sub-Total da tabela; o
+    get_resumo_linha (modo por_vendedor) ainda conta esses clientes.
+    """
+    return _resumo_from_counter(Counter((row[IDX_LINHA_ID], row[IDX_DESC_LINHA]) for row in rows))
+
 
+def _resumo_from_counter(contagem):
+    # Mesma ordem do ORDER BY P.linha, L.descricao (Firebird: NULL primeiro)
+    def ordem(item):
+        (linha, descricao), _ = item
+        return (linha is not None, linha or "", descricao is not None, descricao or "")
 
-def generate_pdf(filename, data, filter_text, resumo_linha=None):
+    return [(linha, descricao, qtde) for (linha, descricao), qtde in sorted(contagem.items(), key=ordem)]
+
+
+HEADERS = [
+    "SITUAÇÃO",
+    "DESC. SITUAÇÃO",
+    "LINHA",
+    "ORDEM",
+    "ABERTURA",
+    "CADASTRO",
+    "NOME",
+    "RR",
+    "DESC. EQUIP.",
+    "PREV. CONCLUSÃO",
+    "VEND.",
+    "VEND. INTERNO",
+]
+
+
+def _new_doc(filename):
     # Margens maiores no topo/rodapé para não colidir com cabeçalho/rodapé
-    doc = SimpleDocTemplate(
+    return SimpleDocTemplate(
         filename,
         pagesize=A4,
         leftMargin=0.0001 * inch,
@@ -179,8 +295,8 @@ def generate_pdf(filename, data, filter_text, resumo_linha=None):
         bottomMargin=0.45 * inch,
     )
 
-    styles = getSampleStyleSheet()
 
+def _table_styles(styles):
     # Estilos customizados (minimalista, moderno, com boa legibilidade)
     body_style = ParagraphStyle(
         name="TableBody",
@@ -199,39 +315,15 @@ def generate_pdf(filename, data, filter_text, resumo_linha=None):
         textColor=colors.white,
         alignment=1
     )
+    return body_style, header_style
 
-    title_style = ParagraphStyle(
-        name="ReportTitle", fontName="Helvetica-Bold", fontSize=12, spaceAfter=6, alignment=1
-    )
-
-    story = []
-
-    headers = [
-        "SITUAÇÃO",
-        "DESC. SITUAÇÃO",
-        "LINHA",
-        "ORDEM",
-        "ABERTURA",
-        "CADASTRO",
-        "NOME",
-        "RR",
-        "DESC. EQUIP.",
-        "PREV. CONCLUSÃO",
-        "VEND.",
-        "VEND. INTERNO",
-    ]
-
-    # Envolver todos os campos em Paragraph para quebra de linha automática
-    table_data = [[Paragraph(h, header_style) for h in headers]]
-    for row in data:
-        processed_row = [Paragraph(str(item), body_style) for item in row]
-        table_data.append(processed_row)
 
+def _col_widths(doc):
     # Largura útil da página
     usable_width = A4[0] - (doc.leftMargin + doc.rightMargin)
 
     # Distribuição de colunas (soma = 1.0)
-    col_widths = [
+    return [
         usable_width * 0.06,   # SITUAÇÃO
         usable_width * 0.06,   # DESC. SITUAÇÃO
         usable_width * 0.08,   # LINHA
@@ -246,32 +338,139 @@ def generate_pdf(filename, data, filter_text, resumo_linha=None):
         usable_width * 0.07,   # VEND. INTERNO
     ]
 
-    table_style = TableStyle([
-        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#a51a19")),
-        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("FONTSIZE", (0, 0), (-1, 0), 8),
-        ("BOTTOMPADDING", (0, 0), (-1, 0), 6),
 
-        ("ALIGN", (0, 1), (-1, -1), "LEFT"),
-        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+DETAIL_TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#a51a19")),
+    ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("FONTSIZE", (0, 0), (-1, 0), 8),
+    ("BOTTOMPADDING", (0, 0), (-1, 0), 6),
+
+    ("ALIGN", (0, 1), (-1, -1), "LEFT"),
+    ("VALIGN", (0, 0), (-1, -1), "TOP"),
 
-        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.HexColor("#FFFFFF"), colors.HexColor("#F7F7F7")]),
-        ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#DDDDDD")),
+    ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.HexColor("#FFFFFF"), colors.HexColor("#F7F7F7")]),
+    ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#DDDDDD")),
 
-        ("LEFTPADDING", (0, 0), (-1, -1), 3),
-        ("RIGHTPADDING", (0, 0), (-1, -1), 3),
-        ("TOPPADDING", (0, 0), (-1, -1), 3),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 3),
-    ])
+    ("LEFTPADDING", (0, 0), (-1, -1), 3),
+    ("RIGHTPADDING", (0, 0), (-1, -1), 3),
+    ("TOPPADDING", (0, 0), (-1, -1), 3),
+    ("BOTTOMPADDING", (0, 0), (-1, -1), 3),
+])
+
+
+def _detail_table(rows, col_widths, body_style, header_style, fast=False):
+    if fast:
+        # Desenho direto no canvas (sem um Paragraph por célula)
+        return FastTable(rows, col_widths, HEADERS,
+                         font=body_style.fontName, font_size=body_style.fontSize, leading=body_style.leading,
+                         header_font=header_style.fontName, header_leading=header_style.leading)
+
+    # Envolver todos os campos em Paragraph para quebra de linha automática
+    table_data = [[Paragraph(h, header_style) for h in HEADERS]]
+    for row in rows:
+        processed_row = [Paragraph(str(item), body_style) for item in row]
+        table_data.append(processed_row)
 
     table = Table(table_data, colWidths=col_widths, repeatRows=1)
-    table.setStyle(table_style)
+    table.setStyle(DETAIL_TABLE_STYLE)
+    return table
+
+
+# Padding das células no DETAIL_TABLE_STYLE (o mesmo nos quatro lados)
+_PAD_CELULA = 3
+
+# A partir de quantas linhas generate_pdf usa a tabela paginada (layout de tabela longa)
+PAGINAR_MIN_LINHAS = int(os.getenv("REL_PAGINAR_MIN_LINHAS", "1000"))
+
+
+def usa_paginacao(n_linhas, fast=False, paginar=None):
+    """
+    Se generate_pdf vai montar a tabela paginada: paginar=None decide pelo
+    limiar PAGINAR_MIN_LINHAS; a FastTable e o relatório vazio nunca paginam.
+    """
+    if paginar is None:
+        paginar = n_linhas >= PAGINAR_MIN_LINHAS
+    return bool(paginar) and not fast and n_linhas > 0
+
+
+def _altura_util(doc):
+    # Altura disponível no frame do SimpleDocTemplate (padding de 6 em cima e embaixo)
+    return doc.height - 2 * 6
 
-    story.append(table)
-    story.append(Spacer(1, 8))
-    story.append(Paragraph(f"Sub-Total (Quantidade de motores): {len(data)}",
-                           ParagraphStyle(name="SubTotal", fontName="Helvetica-Bold", fontSize=9, alignment=2)))
+
+def _detail_tables_paginadas(rows, col_widths, body_style, header_style, altura_util):
+    """
+    Tabela de detalhe já dividida em blocos do tamanho de uma página (layout
+    de tabela longa). Cada linha é medida uma única vez (wrap dos Paragraph) e
+    o bloco fecha quando a próxima linha não cabe. Cada bloco é uma Table com
+    o cabeçalho e as alturas de linha já informadas, então o build não precisa
+    dividir a tabela nem medir de novo o restante a cada página: o tempo
+    cresce linearmente com o número de linhas.
+    Gerador: rows pode ser um iterador e só o bloco da página atual fica em
+    memória (generate_pdf_stream).
+    """
+    larguras = [w - 2 * _PAD_CELULA for w in col_widths]
+    header = [Paragraph(h, header_style) for h in HEADERS]
+    # Cabeçalho medido pela própria Table com o estilo (paddings efetivos)
+    medida = Table([header], colWidths=col_widths)
+    medida.setStyle(DETAIL_TABLE_STYLE)
+    altura_header = medida.wrap(sum(col_widths), altura_util)[1]
+
+    def _bloco(linhas, alturas):
+        # repeatRows=1: o bloco nunca é dividido deixando só o cabeçalho no fim
+        # da página anterior; se passar da página, a continuação repete o cabeçalho
+        table = Table([header] + linhas, colWidths=col_widths, rowHeights=[altura_header] + alturas, repeatRows=1)
+        # A Table dividida pelo build também reinicia as linhas zebradas a cada página
+        table.setStyle(DETAIL_TABLE_STYLE)
+        return table
+
+    bloco, alturas, usado = [], [], altura_header
+    for row in rows:
+        cells = [Paragraph(str(item), body_style) for item in row]
+        altura = max(p.wrap(w, altura_util)[1] for p, w in zip(cells, larguras)) + 2 * _PAD_CELULA
+        if bloco and usado + altura > altura_util:
+            yield _bloco(bloco, alturas)
+            bloco, alturas, usado = [], [], altura_header
+        bloco.append(cells)
+        alturas.append(altura)
+        usado += altura
+    if bloco:
+        yield _bloco(bloco, alturas)
+
+
+def _fast_tables_paginadas(rows, col_widths, body_style, header_style, altura_util, lote=200):
+    """
+    Equivalente de _detail_tables_paginadas com FastTable: as linhas são
+    medidas de lote em lote e cada página completa sai como um pedaço próprio;
+    o que sobra (menos de uma página) volta para o lote seguinte.
+    """
+    pendentes = []
+    for row in rows:
+        pendentes.append(row)
+        if len(pendentes) < lote:
+            continue
+        tabela = _detail_table(pendentes, col_widths, body_style, header_style, fast=True)
+        while True:
+            partes = tabela.split(tabela.width, altura_util)
+            if len(partes) < 2:
+                break
+            yield partes[0]
+            tabela = partes[1]
+        pendentes = pendentes[tabela._start:]
+    if pendentes:
+        yield _detail_table(pendentes, col_widths, body_style, header_style, fast=True)
+
+
+def _footer_flowables(total, resumo_linha, styles):
+    """
+    Sub-Total e (opcional) tabela "Resumo por Linha" do final do relatório.
+    """
+    story = [
+        Spacer(1, 8),
+        Paragraph(f"Sub-Total (Quantidade de motores): {total}",
+                  ParagraphStyle(name="SubTotal", fontName="Helvetica-Bold", fontSize=9, alignment=2)),
+    ]
     if resumo_linha:
         story.append(Spacer(1, 16))
         # Agrupe o título e a tabela juntos no KeepTogether
@@ -300,12 +499,103 @@ def generate_pdf(filename, data, filter_text, resumo_linha=None):
         ]))
         # Inclua o título e a tabela juntos no KeepTogether
         story.append(KeepTogether([resumo_title, resumo_table]))
+    return story
+
+
+def generate_pdf(filename, data, filter_text, resumo_linha=None, fast=False, paginar=None):
+    """
+    fast=True usa FastTable no lugar de Table/Paragraph na tabela de detalhe.
+    paginar=True divide a tabela Table/Paragraph em blocos do tamanho da página
+    antes do build (_detail_tables_paginadas); None liga só a partir de
+    PAGINAR_MIN_LINHAS linhas. A FastTable já divide em tempo linear.
+    """
+    doc = _new_doc(filename)
+    styles = getSampleStyleSheet()
+    body_style, header_style = _table_styles(styles)
+
+    if usa_paginacao(len(data), fast, paginar):
+        story = list(_detail_tables_paginadas(data, _col_widths(doc), body_style, header_style, _altura_util(doc)))
+    else:
+        story = [_detail_table(data, _col_widths(doc), body_style, header_style, fast=fast)]
+    story.extend(_footer_flowables(len(data), resumo_linha, styles))
 
     # Cabeçalho/rodapé em todas as páginas
     hf = make_header_footer("Relatórios de Entradas de Motores", filter_text)
     doc.build(story, onFirstPage=hf, onLaterPages=hf)
 
 
+# ------------ geração em streaming (memória limitada) ------------
+class _LazyStory(list):
+    """
+    Story consumido pela frente por doc.build (flowables[0] / del flowables[0]);
+    os itens são puxados de um gerador apenas quando o build precisa deles,
+    então só um bloco de tabela fica vivo por vez.
+    """
+
+    def __init__(self, gen, lookahead=2):
+        super().__init__()
+        self._gen = gen
+        self._lookahead = lookahead
+
+    def _fill(self):
+        while self._gen is not None and list.__len__(self) < self._lookahead:
+            try:
+                self.append(next(self._gen))
+            except StopIteration:
+                self._gen = None
+
+    def __len__(self):
+        self._fill()
+        return list.__len__(self)
+
+    def __getitem__(self, index):
+        self._fill()
+        return list.__getitem__(self, index)
+
+
+def generate_pdf_stream(filename, rows_iter, filter_text, chunk_rows=200, com_resumo=True, fast=False):
+    """
+    Versão de generate_pdf com memória limitada: rows_iter (linhas com_chaves=True,
+    p.ex. iter_data_from_firebird) é consumido conforme o build avança e a
+    tabela sai em blocos do tamanho de uma página (_detail_tables_paginadas;
+    com fast, _fast_tables_paginadas medindo chunk_rows linhas por vez), com o
+    cabeçalho só no topo de cada página. Sub-Total e resumo por linha saem de
+    contadores acumulados ao final. Retorna o total de linhas; sem linhas,
+    nenhum arquivo é gerado e o retorno é 0.
+    """
+    rows_iter = iter(rows_iter)
+    primeira = next(rows_iter, None)
+    if primeira is None:
+        return 0
+
+    doc = _new_doc(filename)
+    styles = getSampleStyleSheet()
+    body_style, header_style = _table_styles(styles)
+    col_widths = _col_widths(doc)
+    total = 0
+    contagem = Counter()
+
+    def linhas():
+        nonlocal total
+        for row in chain([primeira], rows_iter):
+            total += 1
+            contagem[(row[IDX_LINHA_ID], row[IDX_DESC_LINHA])] += 1
+            yield row[:N_COLS_RELATORIO]
+
+    def flowables():
+        if fast:
+            yield from _fast_tables_paginadas(linhas(), col_widths, body_style, header_style, _altura_util(doc),
+                                              lote=max(1, chunk_rows))
+        else:
+            yield from _detail_tables_paginadas(linhas(), col_widths, body_style, header_style, _altura_util(doc))
+        resumo = _resumo_from_counter(contagem) if com_resumo else None
+        yield from _footer_flowables(total, resumo, styles)
+
+    hf = make_header_footer("Relatórios de Entradas de Motores", filter_text)
+    doc.build(_LazyStory(flowables()), onFirstPage=hf, onLaterPages=hf)
+    return total
+
+
 # ------------ util para nome de arquivo ------------
 def sanitize_filename(s: str) -> str:
     s = re.sub(r"[\\/:*?\"<>|]+", "_", s)
@@ -313,9 +603,449 @@ def sanitize_filename(s: str) -> str:
     return s[:150] if len(s) > 150 else s
 
 
-if __name__ == "__main__":
+# ------------ renderização paralela ------------
+def _render_job(job, fast=False):
+    # Roda no worker: o tempo volta junto para as métricas do processo principal
+    filename, data, filter_text, resumo = job
+    inicio = time_mod.perf_counter()
+    generate_pdf(filename, data, filter_text, resumo_linha=resumo, fast=fast)
+    return filename, time_mod.perf_counter() - inicio
+
+
+# ------------ manifesto: pula PDFs cuja entrada não mudou ------------
+# Aumente ao mudar o layout (cabeçalho, tabela, estilos): invalida todo o manifesto
+LAYOUT_VERSION = 2
+MANIFESTO = "manifesto.json"
+
+
+def fingerprint_job(job, fast=False, logo_path="logo_moya.png"):
+    """
+    sha256 da entrada do documento: linhas, resumo, texto do filtro, versão do
+    layout, tipo de tabela (incluindo a paginada, que depende de
+    REL_PAGINAR_MIN_LINHAS) e a logo (mtime) — o que muda o PDF gerado.
+    """
+    filename, data, filter_text, resumo = job
+    h = hashlib.sha256()
+    try:
+        logo_mtime = os.stat(logo_path).st_mtime_ns
+    except OSError:
+        logo_mtime = None
+    paginar = usa_paginacao(len(data), fast)
+    h.update(repr((LAYOUT_VERSION, bool(fast), paginar, logo_mtime, filter_text)).encode())
+    for row in data:
+        h.update(repr(tuple(row)).encode())
+        h.update(b"\n")
+    h.update(repr(resumo).encode())
+    return h.hexdigest()
+
+
+def carregar_manifesto(caminho):
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def salvar_manifesto(caminho, manifesto):
+    tmp = f"{caminho}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=1, sort_keys=True)
+    os.replace(tmp, caminho)
+
+
+def render_pdfs(jobs, workers=1, fast=False, manifesto=None, forcar=False):
+    """
+    Renderiza jobs (filename, rows, filter_text, resumo) em um pool de processos.
+    Com workers <= 1 roda em sequência no próprio processo; fast repassa a generate_pdf.
+    Com manifesto (caminho do JSON), pula os documentos cujo fingerprint_job
+    não mudou e cujo arquivo existe (forcar=True renderiza tudo e atualiza).
+    Retorna (gerados, falhas), onde falhas é uma lista de (filename, erro).
+    """
+    pulados = []
+    digests = {}
+    registro = {}
+    if manifesto is not None:
+        base = os.path.dirname(os.path.abspath(manifesto))
+        registro = carregar_manifesto(manifesto)
+        pendentes = []
+        for job in jobs:
+            chave = os.path.relpath(os.path.abspath(job[0]), base)
+            digests[job[0]] = (chave, fingerprint_job(job, fast))
+            if not forcar and registro.get(chave) == digests[job[0]][1] and os.path.exists(job[0]):
+                pulados.append(job[0])
+            else:
+                pendentes.append(job)
+        jobs = pendentes
+
+    # Maiores primeiro: o tempo total tende ao do maior relatório
+    jobs = sorted(jobs, key=lambda job: len(job[1]), reverse=True)
+    gerados, falhas = [], []
+
+    linhas_por_job = {job[0]: len(job[1]) for job in jobs}
+
+    def _concluido(filename, segundos):
+        gerados.append(filename)
+        tamanho = os.path.getsize(filename)
+        metricas.registrar("pdf", segundos, arquivo=filename, linhas=linhas_por_job[filename], bytes=tamanho)
+        metricas.contar(documentos=1, bytes=tamanho, linhas=linhas_por_job[filename])
+        print("PDF gerado:", filename)
+
+    with metricas.span("render", workers=workers, documentos=0, bytes=0, linhas=0, pulados=len(pulados)):
+        if workers <= 1 or len(jobs) <= 1:
+            for job in jobs:
+                try:
+                    _concluido(*_render_job(job, fast))
+                except Exception as e:
+                    falhas.append((job[0], e))
+                    print(f"Erro ao gerar {job[0]}: {e}")
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+                futures = {pool.submit(_render_job, job, fast): job[0] for job in jobs}
+                for fut in as_completed(futures):
+                    filename = futures[fut]
+                    try:
+                        _concluido(*fut.result())
+                    except Exception as e:
+                        falhas.append((filename, e))
+                        print(f"Erro ao gerar {filename}: {e}")
+
+    if manifesto is not None:
+        for filename in gerados:
+            chave, digest = digests[filename]
+            registro[chave] = digest
+        for filename, _ in falhas:
+            # Falhou: o arquivo antigo (se houver) não corresponde mais à entrada
+            registro.pop(digests[filename][0], None)
+        salvar_manifesto(manifesto, registro)
+
+    print(f"Renderização concluída: {len(gerados)} gerado(s), {len(pulados)} sem alteração (pulado(s)), "
+          f"{len(falhas)} falha(s).")
+    for filename, erro in falhas:
+        print(f"  FALHA {filename}: {erro}")
+    return gerados, falhas
+
+
+def jobs_modo_unico(conn, start_date, end_date, filter_text_base, out_dir, filtro_ids, snap=None):
+    """
+    Uma única consulta no período; PDF geral e por vendedor saem das mesmas
+    linhas, divididas em memória por o.vendedor (resumo calculado localmente).
+    Com snap (snapshot_os), as linhas vêm do snapshot local em vez do Firebird.
+    """
+    if snap is not None:
+        rows = snapshot_os.load_detalhe(snap, start_date, end_date, com_chaves=True)
+    else:
+        rows = get_data_from_firebird(conn, start_date, end_date, com_chaves=True)
+    return jobs_de_linhas(rows, filter_text_base, out_dir, filtro_ids)
+
+
+def jobs_de_linhas(rows, filter_text_base, out_dir, filtro_ids):
+    """
+    Jobs do PDF geral e dos vendedores (filtro_ids vazio = todos) a partir de
+    rows já carregadas com com_chaves=True.
+    """
+    if not rows:
+        print("Nenhum dado encontrado para o PDF GERAL.")
+        return []
+
+    jobs = [(str(out_dir / "rel_GERAL.pdf"), strip_chaves(rows), filter_text_base, resumo_from_rows(rows))]
+
+    grupos, nomes = split_por_vendedor(rows)
+    # OS sem vendedor (o.vendedor nulo) só entram no PDF geral
+    grupos.pop(None, None)
+    for vend_id in sorted(grupos):
+        if filtro_ids and vend_id not in filtro_ids:
+            continue
+        dados_vend = grupos[vend_id]
+        nome_legivel = f"{vend_id} - {nomes[vend_id]}".strip(" -")
+        filtro_vend = f"{filter_text_base} | Vendedor: {nome_legivel}"
+        file_out = out_dir / f"rel_{vend_id}.pdf"
+        jobs.append((str(file_out), strip_chaves(dados_vend), filtro_vend, resumo_from_rows(dados_vend)))
+
+    for vend_id in sorted(set(filtro_ids or ()) - set(grupos)):
+        print(f"Sem dados para vendedor {vend_id}.")
+    return jobs
+
+
+def jobs_modo_por_vendedor(conn, start_date, end_date, filter_text_base, out_dir, filtro_ids):
+    """
+    Modo original: uma consulta de detalhe + uma de resumo por documento.
+    """
+    jobs = []
+
+    # (Opcional) Gera o PDF geral (tudo no período)
+    data_all = get_data_from_firebird(conn, start_date, end_date, vendedor=None)
+    resumo_all = get_resumo_linha(conn, start_date, end_date, vendedor=None)
+    if data_all:
+        jobs.append((str(out_dir / "rel_GERAL.pdf"), data_all, filter_text_base, resumo_all))
+    else:
+        print("Nenhum dado encontrado para o PDF GERAL.")
+
+    # Lista vendedores ativos no período
+    vendedores = list_vendedores(conn, start_date, end_date)
+    if not vendedores:
+        print("Nenhum vendedor com registros no período.")
+        return jobs
+
+    for vend_id, vend_nome in vendedores:
+        # OS sem vendedor só entram no PDF geral (vendedor=None seria o período inteiro)
+        if vend_id is None or (filtro_ids and vend_id not in filtro_ids):
+            continue
+
+        dados_vend = get_data_from_firebird(conn, start_date, end_date, vendedor=vend_id)
+        resumo_vend = get_resumo_linha(conn, start_date, end_date, vendedor=vend_id)
+        if not dados_vend:
+            print(f"Sem dados para vendedor {vend_id} ({vend_nome}).")
+            continue
+
+        nome_legivel = f"{vend_id} - {vend_nome}".strip(" -")
+        filtro_vend = f"{filter_text_base} | Vendedor: {nome_legivel}"
+
+        safe_nome = f"{vend_id}"
+        file_out = out_dir / f"rel_{safe_nome}.pdf"
+        jobs.append((str(file_out), dados_vend, filtro_vend, resumo_vend))
+    return jobs
+
+
+def gerar_streaming(conn, start_date, end_date, filter_text_base, out_dir, filtro_ids, chunk_rows=200,
+                    fast=False, snap=None):
+    """
+    Caminho de memória limitada para períodos longos: cada documento é
+    gerado direto do cursor (fetchmany) em blocos de tabela, em sequência.
+    Com snap (snapshot_os), o cursor é o do snapshot local.
+    Retorna a lista de arquivos gerados.
+    """
+    if snap is not None:
+        iter_rows = lambda vendedor=None: snapshot_os.iter_detalhe(snap, start_date, end_date,
+                                                                   vendedor=vendedor, com_chaves=True)
+        vendedores = snapshot_os.list_vendedores(snap, start_date, end_date)
+    else:
+        iter_rows = lambda vendedor=None: iter_data_from_firebird(conn, start_date, end_date, vendedor=vendedor)
+        vendedores = list_vendedores(conn, start_date, end_date)
+
+    gerados = []
+    file_out = out_dir / "rel_GERAL.pdf"
+    # Consulta e renderização são intercaladas: o span "pdf" mede as duas
+    with metricas.span("pdf", arquivo=str(file_out)) as s:
+        total = generate_pdf_stream(str(file_out), iter_rows(), filter_text_base, chunk_rows=chunk_rows, fast=fast)
+        if total:
+            s.contar(linhas=total, bytes=os.path.getsize(file_out))
+    if total:
+        print(f"PDF geral gerado: {file_out} ({total} linhas)")
+        gerados.append(str(file_out))
+    else:
+        print("Nenhum dado encontrado para o PDF GERAL.")
+
+    for vend_id, vend_nome in vendedores:
+        # OS sem vendedor só entram no PDF geral (vendedor=None seria o período inteiro)
+        if vend_id is None or (filtro_ids and vend_id not in filtro_ids):
+            continue
+
+        nome_legivel = f"{vend_id} - {vend_nome}".strip(" -")
+        filtro_vend = f"{filter_text_base} | Vendedor: {nome_legivel}"
+        file_out = out_dir / f"rel_{vend_id}.pdf"
+
+        with metricas.span("pdf", arquivo=str(file_out)) as s:
+            total = generate_pdf_stream(str(file_out), iter_rows(vend_id), filtro_vend,
+                                        chunk_rows=chunk_rows, fast=fast)
+            if total:
+                s.contar(linhas=total, bytes=os.path.getsize(file_out))
+        if not total:
+            # Os filtros de nome (EXCLUIR_NOMES_RELATORIO) podem tirar todas as linhas do vendedor
+            print(f"Sem dados para vendedor {vend_id} ({vend_nome}).")
+            continue
+        print(f"PDF gerado: {file_out} ({total} linhas)")
+        gerados.append(str(file_out))
+
+    return gerados
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Relatórios de entradas de motores (OS) em PDF")
+    parser.add_argument("--modo", choices=["unico", "por_vendedor"], default="unico",
+                        help="unico: uma consulta e divisão em memória; por_vendedor: consultas por vendedor")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="sincroniza o snapshot local (delta) e lê os dados dele em vez do Firebird")
+    parser.add_argument("--streaming", action="store_true",
+                        help="gera cada PDF direto do cursor, com memória limitada (períodos longos)")
+    parser.add_argument("--chunk-rows", type=int, default=200,
+                        help="linhas medidas por lote da FastTable no modo --streaming --fast-table")
+    parser.add_argument("--fast-table", action="store_true",
+                        help="desenha a tabela de detalhe direto no canvas (FastTable), bem mais rápido em relatórios grandes")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("REL_WORKERS", os.cpu_count() or 1)),
+                        help="processos para renderizar os PDFs (1 = sequencial)")
+    parser.add_argument("--backfill", nargs=2, type=date.fromisoformat, metavar=("INICIO", "FIM"),
+                        help="gera todos os períodos entre INICIO e FIM (AAAA-MM-DD) com uma só consulta, "
+                             "em rel/<período>/")
+    parser.add_argument("--bucket", choices=["semana", "mes"], default="semana",
+                        help="tamanho dos períodos do --backfill (semana = domingo a sábado)")
+    parser.add_argument("--dt-ini", type=date.fromisoformat, metavar="AAAA-MM-DD",
+                        help="início do período (com --dt-fim); padrão: 03/08/2025 a 09/08/2025")
+    parser.add_argument("--dt-fim", type=date.fromisoformat, metavar="AAAA-MM-DD", help="fim do período")
+    parser.add_argument("--periodo", choices=PERIODOS_MOVEIS,
+                        help="período móvel recalculado a cada execução (domingo a sábado), p.ex. no agendador")
+    parser.add_argument("--vendedores", type=_lista_vendedores, default=None,
+                        help='vendedores com PDF próprio, ex. "17,29" (padrão 17,29; "todos" = todos)')
+    parser.add_argument("--publicar", action="store_true",
+                        help="commit/push dos PDFs gerados no repositório (ENTRADAS_REPO_DIR), em segundo plano")
+    parser.add_argument("--forcar", action="store_true",
+                        help="renderiza todos os PDFs mesmo sem alteração na entrada (ignora rel/manifesto.json)")
+    gravacao = parser.add_mutually_exclusive_group()
+    gravacao.add_argument("--gravar", metavar="ARQUIVO",
+                          help="grava as consultas ao Firebird (SQL, parâmetros e resultado) em ARQUIVO (ver gravacao_fb)")
+    gravacao.add_argument("--replay", metavar="ARQUIVO",
+                          help="usa as consultas gravadas em ARQUIVO no lugar do Firebird (sem VPN/rede)")
+    parser.add_argument("--formato", choices=["pdf", *exportar_os.FORMATOS], default="pdf",
+                        help="csv/xlsx: exporta os dados brutos (colunas do QUERY_ENTRADA_DETALHADO) no lugar "
+                             "dos PDFs, em fluxo; com --backfill, o intervalo inteiro em um arquivo por vendedor")
+    parser.add_argument("--gzip", action="store_true", help="com --formato csv, grava .csv.gz")
+    args = parser.parse_args(argv)
+    if args.formato != "pdf" and (args.streaming or args.snapshot):
+        parser.error("--formato csv/xlsx não combina com --streaming/--snapshot")
+    if args.gzip and args.formato != "csv":
+        parser.error("--gzip só vale para --formato csv")
+    if args.backfill and args.streaming:
+        parser.error("--backfill não combina com --streaming")
+    if (args.dt_ini is None) != (args.dt_fim is None):
+        parser.error("--dt-ini e --dt-fim vão juntos")
+    if args.dt_ini and args.dt_ini > args.dt_fim:
+        parser.error("--dt-ini depois de --dt-fim")
+    if sum(map(bool, (args.dt_ini, args.periodo, args.backfill))) > 1:
+        parser.error("use só um de --dt-ini/--dt-fim, --periodo e --backfill")
+    if args.backfill and args.backfill[0] > args.backfill[1]:
+        parser.error("--backfill: INICIO depois de FIM")
+    return args
+
+
+def _lista_vendedores(texto):
+    # Conjunto vazio = sem filtro (todos os vendedores)
+    if texto.strip().lower() == "todos":
+        return set()
+    try:
+        return {int(v) for v in texto.split(",") if v.strip()}
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"lista de vendedores inválida: {texto!r}")
+
+
+# Período da execução avulsa sem --dt-ini/--dt-fim/--periodo
+PERIODO_PADRAO = (date(2025, 8, 3), date(2025, 8, 9))
+PERIODOS_MOVEIS = ("semana_atual", "semana_anterior")
+
+
+def periodo_relatorio(args, hoje=None):
+    """
+    (inicio, fim) dos PDFs: --periodo (semana de domingo a sábado que contém
+    hoje, ou a anterior) é recalculado a cada chamada, então o agendador
+    acompanha a semana; senão --dt-ini/--dt-fim ou PERIODO_PADRAO.
+    """
+    if args.periodo:
+        hoje = hoje or date.today()
+        # weekday(): segunda = 0 ... domingo = 6
+        inicio = hoje - timedelta(days=(hoje.weekday() + 1) % 7)
+        if args.periodo == "semana_anterior":
+            inicio -= timedelta(days=7)
+        return inicio, inicio + timedelta(days=6)
+    if args.dt_ini:
+        return args.dt_ini, args.dt_fim
+    return PERIODO_PADRAO
+
+
+def fim_do_dia(fim):
+    # Dias inteiros: o último dia do período entra até 23:59:59 (o.abertura pode ter hora)
+    return datetime.combine(fim, time.max)
+
+
+def texto_filtro(start_date, end_date):
+    # Corrige aspas internas no f-string
+    return (
+        f"Filtro: Abertura de {start_date.strftime('%d/%m/%Y')} até {end_date.strftime('%d/%m/%Y')}, "
+        f"Cadastro de 0 até 999999999, Produto (RR Motor) de até zz, Linha de até zz, "
+        f"Situação de até 99, Tipo = Detalhado"
+    )
+
+
+# ------------ backfill: vários períodos com uma consulta ------------
+IDX_ABERTURA = 4
+
+
+def periodos(inicio, fim, bucket="semana"):
+    """
+    Divide [inicio, fim] em períodos: "semana" (domingo a sábado, como
+    03/08..09/08/2025) ou "mes". O primeiro e o último são cortados no intervalo.
+    Retorna [(ini, fim, rótulo)], rótulo usado como subpasta em rel/.
+    """
+    saida = []
+    atual = inicio
+    while atual <= fim:
+        if bucket == "mes":
+            proximo = (atual.replace(day=1) + timedelta(days=32)).replace(day=1)
+            rotulo = atual.strftime("%Y-%m")
+        else:
+            # weekday(): segunda = 0 ... domingo = 6
+            proximo = atual + timedelta(days=7 - (atual.weekday() + 1) % 7)
+            rotulo = None
+        p_fim = min(proximo - timedelta(days=1), fim)
+        saida.append((atual, p_fim, rotulo or f"{atual.isoformat()}_{p_fim.isoformat()}"))
+        atual = proximo
+    return saida
+
+
+def _dia_abertura(row):
+    # Texto (fetch do Firebird, str(datetime)) ou date/datetime (snapshot)
+    valor = row[IDX_ABERTURA]
+    if isinstance(valor, str):
+        return date.fromisoformat(valor[:10])
+    if isinstance(valor, datetime):
+        return valor.date()
+    return valor
+
+
+def jobs_backfill(rows, faixas, out_dir, filtro_ids):
+    """
+    Fatia rows (período inteiro, com_chaves=True, ordem da consulta) por dia
+    de abertura em cada faixa de periodos() e monta os jobs de cada uma em
+    out_dir/<rótulo>/.
+    """
+    inicios = [ini for ini, _, _ in faixas]
+    por_faixa = [[] for _ in faixas]
+    for row in rows:
+        dia = _dia_abertura(row)
+        if dia is None:
+            continue
+        i = bisect_right(inicios, dia) - 1
+        if i >= 0 and dia <= faixas[i][1]:
+            por_faixa[i].append(row)
+
+    jobs = []
+    for (ini, fim, rotulo), linhas in zip(faixas, por_faixa):
+        pasta = out_dir / rotulo
+        print(f"Período {rotulo}: {len(linhas)} linhas")
+        if not linhas:
+            continue
+        pasta.mkdir(parents=True, exist_ok=True)
+        jobs += jobs_de_linhas(linhas, texto_filtro(ini, fim), pasta, filtro_ids)
+    return jobs
+
+
+def jobs_modo_backfill(conn, inicio, fim, bucket, out_dir, filtro_ids, snap=None):
+    """
+    Uma consulta para todo o intervalo (--backfill), dividida em memória por
+    período (--bucket) e vendedor; os jobs de todos os períodos vão juntos
+    para o pool de renderização.
+    """
+    faixas = periodos(inicio, fim, bucket)
+    dt_fim = fim_do_dia(fim)
+    print(f"Backfill {inicio.isoformat()} .. {fim.isoformat()}: {len(faixas)} período(s) ({bucket})")
+    if snap is not None:
+        rows = snapshot_os.load_detalhe(snap, inicio, dt_fim, com_chaves=True)
+    else:
+        rows = get_data_from_firebird(conn, inicio, dt_fim, com_chaves=True)
+    return jobs_backfill(rows, faixas, out_dir, filtro_ids)
+
+
+def db_config_padrao():
     # Configurações do banco de dados Firebird
-    db_config = {
+    return {
         "host": os.getenv("DT_HOST"),
         "port": 3050,
         "database": os.getenv("DT_DATABASE"),
@@ -323,62 +1053,109 @@ if __name__ == "__main__":
         "password": os.getenv("DT_PASSWORD")
     }
 
+
+def _publicar(gerados, args):
+    # Só enfileira: commit/push em segundo plano (publicador_git)
+    if not args.publicar or not gerados:
+        return
+    try:
+        with metricas.span("publicar", arquivos=len(gerados)):
+            pub = publicador_git.get_publicador()
+            for filename in gerados:
+                pub.publicar(filename)
+    except Exception as e:
+        print(f"Erro ao enviar para o GitHub: {e}")
+
+
+def executar_relatorios(conn, args, fechar_conexao=False):
+    """
+    Gera os PDFs do período com uma conexão já aberta (main ou o agendador).
+    fechar_conexao=True fecha conn assim que os dados estão em memória, antes
+    da etapa de CPU; caso contrário a conexão continua aberta para o chamador.
+    Retorna (gerados, falhas).
+    """
     # Datas para a consulta
-    start_date = datetime(2025, 8, 3).date()  # YYYY, M, D
-    end_date   = datetime(2025, 8, 9).date()  # YYYY, M, D
+    start_date, end_date = periodo_relatorio(args)
 
-    # Corrige aspas internas no f-string
-    filter_text_base = (
-        f"Filtro: Abertura de {start_date.strftime('%d/%m/%Y')} até {end_date.strftime('%d/%m/%Y')}, "
-        f"Cadastro de 0 até 999999999, Produto (RR Motor) de até zz, Linha de até zz, "
-        f"Situação de até 99, Tipo = Detalhado"
-    )
+    filter_text_base = texto_filtro(start_date, end_date)
+    # Mesmo limite final para PDFs, exportação e backfill
+    dt_fim = fim_do_dia(end_date)
 
     # Pasta de saída
     out_dir = Path("rel")
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    try:
-        conn = get_conn(db_config)
-
-        # (Opcional) Gera o PDF geral (tudo no período)
-        data_all = get_data_from_firebird(conn, start_date, end_date, vendedor=None)
-        resumo_all = get_resumo_linha(conn, start_date, end_date, vendedor=None)
-        if data_all:
-            generate_pdf(str(out_dir / "rel_GERAL.pdf"), data_all, filter_text_base, resumo_linha=resumo_all)
-            print("PDF geral gerado:", out_dir / "rel_GERAL.pdf")
-        else:
-            print("Nenhum dado encontrado para o PDF GERAL.")
+    filtro_ids = {17, 29} if args.vendedores is None else args.vendedores
 
-        # Lista vendedores ativos no período
-        vendedores = list_vendedores(conn, start_date, end_date)
-        filtro_ids = {17, 29}
-        if not vendedores:
-            print("Nenhum vendedor com registros no período.")
-        else:
-            for vend_id, vend_nome in vendedores:
-                if vend_id not in filtro_ids:
-                    continue
+    snap = None
+    try:
+        if args.formato != "pdf":
+            inicio, fim = args.backfill or (start_date, end_date)
+            with metricas.span("exportar", formato=args.formato) as s:
+                gerados, total = exportar_os.exportar_entradas(
+                    conn, inicio, fim_do_dia(fim), out_dir,
+                    formato=args.formato, gz=args.gzip, filtro_ids=filtro_ids)
+                s.contar(linhas=total, arquivos=len(gerados), bytes=sum(os.path.getsize(f) for f in gerados))
+            print(f"Exportação {args.formato}: {total} linhas em {len(gerados)} arquivo(s)")
+            _publicar(gerados, args)
+            return gerados, []
 
-                dados_vend = get_data_from_firebird(conn, start_date, end_date, vendedor=vend_id)
-                resumo_vend = get_resumo_linha(conn, start_date, end_date, vendedor=vend_id)
-                if not dados_vend:
-                    print(f"Sem dados para vendedor {vend_id} ({vend_nome}).")
-                    continue
+        if args.snapshot:
+            # Só o delta passa pela VPN; a leitura do período é local
+            snap = snapshot_os.open_snapshot()
+            with metricas.span("snapshot_sync"):
+                snapshot_os.sync_snapshot(conn, snap)
+            if fechar_conexao:
+                close_conn(conn)
+                conn = None
 
-                nome_legivel = f"{vend_id} - {vend_nome}".strip(" -")
-                filtro_vend = f"{filter_text_base} | Vendedor: {nome_legivel}"
+        if args.streaming:
+            gerados = gerar_streaming(conn, start_date, dt_fim, filter_text_base, out_dir, filtro_ids,
+                                      chunk_rows=args.chunk_rows, fast=args.fast_table, snap=snap)
+            _publicar(gerados, args)
+            return gerados, []
 
-                safe_nome = f"{vend_id}"
-                file_out = out_dir / f"rel_{safe_nome}.pdf"
+        if args.backfill:
+            jobs = jobs_modo_backfill(conn, *args.backfill, args.bucket, out_dir, filtro_ids, snap=snap)
+        elif args.modo == "unico" or snap is not None:
+            jobs = jobs_modo_unico(conn, start_date, dt_fim, filter_text_base, out_dir, filtro_ids, snap=snap)
+        else:
+            jobs = jobs_modo_por_vendedor(conn, start_date, dt_fim, filter_text_base, out_dir, filtro_ids)
 
-                generate_pdf(str(file_out), dados_vend, filtro_vend, resumo_linha=resumo_vend)
-                print("PDF gerado:", file_out)
+        # Dados já em memória: libera a conexão antes da etapa de CPU
+        if fechar_conexao and conn is not None:
+            close_conn(conn)
+            conn = None
 
-    except Exception as e:
-        print("Erro no processo:", e)
+        gerados, falhas = render_pdfs(jobs, workers=args.workers, fast=args.fast_table,
+                                      manifesto=str(out_dir / MANIFESTO), forcar=args.forcar)
+        _publicar(gerados, args)
+        return gerados, falhas
     finally:
+        if snap is not None:
+            snap.close()
+        if fechar_conexao and conn is not None:
+            close_conn(conn)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with metricas.execucao("relatorios") as ex:
         try:
-            conn.close()
-        except:
-            pass
+            with metricas.span("conexao"):
+                conn = abrir_conexao(lambda: get_conn(db_config_padrao()), gravar=args.gravar, replay=args.replay)
+            # executar_relatorios fecha a conexão assim que não precisa mais dela
+            gerados, falhas = executar_relatorios(conn, args, fechar_conexao=True)
+            ex.contar(documentos=len(gerados), falhas=len(falhas))
+        except Exception as e:
+            ex.erro = f"{type(e).__name__}: {e}"
+            print("Erro no processo:", e)
+
+        # Execução avulsa: espera o push dos PDFs antes de sair
+        if args.publicar:
+            with metricas.span("git_push"):
+                publicador_git.aguardar_publicacoes()
+
+
+if __name__ == "__main__":
+    main()
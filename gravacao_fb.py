@@ -0,0 +1,248 @@
+# Gravação e reprodução (record/replay) das consultas ao Firebird.
+# Em modo gravação, a conexão fdb é embrulhada e cada consulta executada tem
+# SQL, parâmetros, cursor.description e linhas guardados em um arquivo local
+# (pickle comprimido com gzip). Em modo replay, ConexaoReplay imita a conexão
+# fdb (cursor, execute, fetch*, description) servindo essas gravações, sem VPN
+# e sem rede: serve para iterar no layout, refazer uma renderização que falhou
+# ou alimentar testes de carga.
+#
+#   conn = ConexaoGravacao(get_conn(cfg), "gravacoes/relatorios.fbrec")  # grava ao fechar
+#   conn = ConexaoReplay("gravacoes/relatorios.fbrec")
+import gzip
+import os
+import pickle
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GRAVACOES_DIR = os.getenv("FB_GRAVACOES_DIR", "gravacoes")
+VERSAO_FORMATO = 1
+
+
+class ConsultaNaoGravada(LookupError):
+    pass
+
+
+def caminho_gravacao(nome):
+    """
+    Caminho do arquivo de gravação: nome sem diretório vai para GRAVACOES_DIR.
+    """
+    if os.path.dirname(nome):
+        return nome
+    return os.path.join(GRAVACOES_DIR, nome if nome.endswith(".fbrec") else f"{nome}.fbrec")
+
+
+def _chave(sql, params):
+    return sql, tuple(params or ())
+
+
+def salvar_gravacoes(caminho, gravacoes):
+    """
+    Grava {(sql, params): (description, linhas)} de forma atômica.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    tmp = f"{caminho}.{os.getpid()}.tmp"
+    with gzip.open(tmp, "wb", compresslevel=6) as f:
+        pickle.dump({"versao": VERSAO_FORMATO, "consultas": gravacoes}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, caminho)
+
+
+def carregar_gravacoes(caminho):
+    # pickle: abrir apenas gravações geradas localmente por este módulo
+    with gzip.open(caminho, "rb") as f:
+        dados = pickle.load(f)
+    if dados.get("versao") != VERSAO_FORMATO:
+        raise ValueError(f"Gravação {caminho} em formato não suportado: {dados.get('versao')}")
+    return dados["consultas"]
+
+
+# ------------ cursor em memória (comum à gravação e ao replay) ------------
+class _CursorMemoria:
+    """
+    Cursor com a interface usada pelos relatórios (execute, fetchone,
+    fetchmany, fetchall, iteração, description), servindo linhas já em memória.
+    """
+    arraysize = 1
+
+    def __init__(self, conn):
+        self.connection = conn
+        self.description = None
+        self.rowcount = -1
+        self._linhas = []
+        self._pos = 0
+
+    def _servir(self, description, linhas):
+        self.description = description
+        self._linhas = linhas
+        self._pos = 0
+        self.rowcount = len(linhas)
+
+    def fetchone(self):
+        if self._pos >= len(self._linhas):
+            return None
+        linha = self._linhas[self._pos]
+        self._pos += 1
+        return linha
+
+    def fetchmany(self, size=None):
+        fim = self._pos + (size or self.arraysize)
+        lote = self._linhas[self._pos:fim]
+        self._pos += len(lote)
+        return lote
+
+    def fetchall(self):
+        lote = self._linhas[self._pos:]
+        self._pos = len(self._linhas)
+        return lote
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._linhas = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ------------ gravação ------------
+class _Preparado:
+    def __init__(self, sql, real):
+        self.sql = sql
+        self.real = real
+
+
+class _CursorGravacao(_CursorMemoria):
+    def __init__(self, conn, real):
+        super().__init__(conn)
+        self._real = real
+
+    def prep(self, sql):
+        # Mantém o prepared statement real (consultas_os.executar reaproveita)
+        return _Preparado(sql, self._real.prep(sql))
+
+    def execute(self, operacao, params=()):
+        if isinstance(operacao, _Preparado):
+            sql = operacao.sql
+            self._real.execute(operacao.real, params)
+        else:
+            sql = operacao
+            self._real.execute(operacao, params)
+        description = self._real.description
+        # Lê tudo na hora: o replay precisa do resultado completo mesmo que o
+        # chamador pare no meio (o modo gravação não tem memória limitada)
+        linhas = [tuple(linha) for linha in self._real.fetchall()] if description else []
+        description = tuple(tuple(d) for d in description) if description else None
+        self.connection._registrar(sql, params, description, linhas)
+        self._servir(description, linhas)
+        return self
+
+    def close(self):
+        super().close()
+        self._real.close()
+
+
+class ConexaoGravacao:
+    """
+    Embrulha uma conexão fdb aberta e grava o resultado de cada consulta.
+    O arquivo é escrito em salvar() e ao fechar a conexão.
+    """
+
+    def __init__(self, conn, caminho):
+        self._conn = conn
+        self.caminho = caminho_gravacao(caminho)
+        self.gravacoes = {}
+
+    def _registrar(self, sql, params, description, linhas):
+        # Mesma consulta de novo: vale a última
+        self.gravacoes[_chave(sql, params)] = (description, linhas)
+
+    def cursor(self):
+        return _CursorGravacao(self, self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    @property
+    def closed(self):
+        return getattr(self._conn, "closed", False)
+
+    def salvar(self):
+        salvar_gravacoes(self.caminho, self.gravacoes)
+        print(f"Gravação salva: {self.caminho} ({len(self.gravacoes)} consulta(s))")
+
+    def close(self):
+        try:
+            self.salvar()
+        finally:
+            self._conn.close()
+
+
+# ------------ replay ------------
+class _CursorReplay(_CursorMemoria):
+    def execute(self, sql, params=()):
+        self._servir(*self.connection._buscar(sql, params))
+        return self
+
+
+class ConexaoReplay:
+    """
+    Conexão compatível com fdb (para o que os relatórios usam) que responde
+    com as consultas gravadas em caminho. Se a consulta exata (SQL +
+    parâmetros) não foi gravada mas o mesmo SQL tem uma única gravação, ela é
+    servida com aviso — ex.: o resumo do "mês atual" reproduzido em outro dia.
+    Com estrito=True, só a consulta exata serve; senão ConsultaNaoGravada.
+    """
+
+    def __init__(self, caminho, estrito=False):
+        self.caminho = caminho_gravacao(caminho)
+        self.gravacoes = carregar_gravacoes(self.caminho)
+        self.estrito = estrito
+        self.closed = False
+        self._por_sql = {}
+        for sql, params in self.gravacoes:
+            self._por_sql.setdefault(sql, []).append(params)
+
+    def _buscar(self, sql, params):
+        chave = _chave(sql, params)
+        if chave in self.gravacoes:
+            return self.gravacoes[chave]
+        candidatos = self._por_sql.get(sql, [])
+        if not self.estrito and len(candidatos) == 1:
+            print(f"Replay: parâmetros {chave[1]} não gravados; usando os da gravação {candidatos[0]}")
+            return self.gravacoes[(sql, candidatos[0])]
+        raise ConsultaNaoGravada(
+            f"Consulta não encontrada em {self.caminho} (parâmetros {chave[1]}; "
+            f"{len(candidatos)} gravação(ões) com o mesmo SQL)")
+
+    def cursor(self):
+        return _CursorReplay(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def abrir_conexao(abrir, gravar=None, replay=None):
+    """
+    Conexão para os scripts: replay (arquivo) não chama abrir(); gravar
+    (arquivo) embrulha a conexão real aberta por abrir() em ConexaoGravacao.
+    """
+    if replay:
+        conn = ConexaoReplay(replay)
+        print(f"Replay de {conn.caminho} ({len(conn.gravacoes)} consulta(s)), sem acesso ao banco")
+        return conn
+    conn = abrir()
+    return ConexaoGravacao(conn, gravar) if gravar else conn
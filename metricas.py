@@ -0,0 +1,224 @@
+# Instrumentação por fase: spans de tempo aninhados, com contagens (linhas,
+# bytes, documentos...) por fase. Cada execução (execucao("resumo"), ...) grava
+# um registro JSON por linha em METRICAS_DIR/execucoes.jsonl e, se
+# METRICAS_PROM_DIR estiver definido, um arquivo <job>.prom para o textfile
+# collector do node_exporter.
+#
+#   with metricas.execucao("resumo"):
+#       with metricas.span("consulta"):
+#           ...
+#       with metricas.span("fetch") as s:
+#           s.contar(linhas=len(rows))
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+METRICAS_DIR = os.getenv("METRICAS_DIR", "metricas")
+METRICAS_PROM_DIR = os.getenv("METRICAS_PROM_DIR")
+PREFIXO = "entradas"
+
+_execucao_atual = contextvars.ContextVar("execucao_atual", default=None)
+_span_atual = contextvars.ContextVar("span_atual", default=None)
+
+
+class Span:
+    def __init__(self, nome, pai=None, **atributos):
+        self.nome = nome
+        self.caminho = f"{pai.caminho}/{nome}" if pai is not None else nome
+        self.atributos = dict(atributos)
+        self.inicio = time.time()
+        self.segundos = None
+        self.erro = None
+
+    def contar(self, **valores):
+        """
+        Soma valores numéricos (linhas, bytes, ...) ao span; outros tipos substituem.
+        """
+        for chave, valor in valores.items():
+            atual = self.atributos.get(chave)
+            if isinstance(valor, (int, float)) and isinstance(atual, (int, float)):
+                self.atributos[chave] = atual + valor
+            else:
+                self.atributos[chave] = valor
+
+    def para_dict(self):
+        d = {"fase": self.caminho, "inicio": round(self.inicio, 3), "segundos": round(self.segundos or 0.0, 4)}
+        d.update(self.atributos)
+        if self.erro:
+            d["erro"] = self.erro
+        return d
+
+
+class _SpanNulo:
+    # Fora de uma execução: mede nada e aceita as mesmas chamadas
+    caminho = ""
+
+    def contar(self, **valores):
+        pass
+
+
+_NULO = _SpanNulo()
+
+
+class Execucao:
+    def __init__(self, job):
+        self.job = job
+        self.inicio = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def adicionar(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+
+@contextmanager
+def span(nome, **atributos):
+    """
+    Fase cronometrada dentro da execução atual (aninhada no span atual).
+    Sem execução ativa, não registra nada.
+    """
+    execucao_ = _execucao_atual.get()
+    if execucao_ is None:
+        yield _NULO
+        return
+    s = Span(nome, _span_atual.get(), **atributos)
+    token = _span_atual.set(s)
+    inicio = time.perf_counter()
+    try:
+        yield s
+    except BaseException as e:
+        s.erro = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.segundos = time.perf_counter() - inicio
+        _span_atual.reset(token)
+        execucao_.adicionar(s)
+
+
+def registrar(nome, segundos, **atributos):
+    """
+    Fase medida fora deste processo/contexto (ex.: PDF renderizado em um
+    worker), registrada como filha do span atual.
+    """
+    execucao_ = _execucao_atual.get()
+    if execucao_ is None:
+        return
+    s = Span(nome, _span_atual.get(), **atributos)
+    s.inicio = time.time() - segundos
+    s.segundos = segundos
+    execucao_.adicionar(s)
+
+
+def contar(**valores):
+    """
+    Soma contagens ao span atual (ver Span.contar).
+    """
+    atual = _span_atual.get()
+    if atual is not None:
+        atual.contar(**valores)
+
+
+@contextmanager
+def execucao(job, diretorio=None, prom_dir=None):
+    """
+    Uma execução do job: agrega os spans e, ao sair (com ou sem erro), grava o
+    registro JSON e o arquivo Prometheus. Execução aninhada reaproveita a de fora.
+    """
+    if _execucao_atual.get() is not None:
+        with span(job) as s:
+            yield s
+        return
+
+    ex = Execucao(job)
+    token_ex = _execucao_atual.set(ex)
+    raiz = Span(job)
+    token_span = _span_atual.set(raiz)
+    inicio = time.perf_counter()
+    sucesso = False
+    try:
+        yield raiz
+        # O job pode tratar o erro e marcá-lo em raiz.erro sem propagar
+        sucesso = raiz.erro is None
+    except BaseException as e:
+        raiz.erro = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        raiz.segundos = time.perf_counter() - inicio
+        _span_atual.reset(token_span)
+        _execucao_atual.reset(token_ex)
+        try:
+            _gravar(ex, raiz, sucesso, diretorio or METRICAS_DIR, prom_dir or METRICAS_PROM_DIR)
+        except Exception as e:
+            print(f"Erro ao gravar métricas: {e}")
+
+
+def _gravar(ex, raiz, sucesso, diretorio, prom_dir):
+    registro = {
+        "job": ex.job,
+        "inicio": datetime.fromtimestamp(ex.inicio).isoformat(timespec="seconds"),
+        "segundos": round(raiz.segundos, 4),
+        "sucesso": sucesso,
+        "erro": raiz.erro,
+        "atributos": raiz.atributos,
+        "fases": [s.para_dict() for s in sorted(ex.spans, key=lambda s: s.inicio)],
+    }
+    if diretorio:
+        os.makedirs(diretorio, exist_ok=True)
+        with open(os.path.join(diretorio, "execucoes.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+    if prom_dir:
+        _gravar_prom(ex, raiz, sucesso, prom_dir)
+
+
+def _rotulo(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+def _gravar_prom(ex, raiz, sucesso, prom_dir):
+    # Fases repetidas (um span por PDF, por consulta...) são somadas por caminho
+    por_fase = {}
+    for s in ex.spans:
+        agg = por_fase.setdefault(s.caminho, {"segundos": 0.0, "execucoes": 0})
+        agg["segundos"] += s.segundos or 0.0
+        agg["execucoes"] += 1
+        for chave, valor in s.atributos.items():
+            if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                agg[chave] = agg.get(chave, 0) + valor
+
+    job = _rotulo(ex.job)
+    linhas = [
+        f"# HELP {PREFIXO}_execucao_segundos Duração da última execução do job.",
+        f"# TYPE {PREFIXO}_execucao_segundos gauge",
+        f'{PREFIXO}_execucao_segundos{{job="{job}"}} {raiz.segundos:.6f}',
+        f"# HELP {PREFIXO}_execucao_sucesso 1 se a última execução terminou sem erro.",
+        f"# TYPE {PREFIXO}_execucao_sucesso gauge",
+        f'{PREFIXO}_execucao_sucesso{{job="{job}"}} {int(sucesso)}',
+        f"# HELP {PREFIXO}_execucao_timestamp_segundos Fim da última execução (epoch).",
+        f"# TYPE {PREFIXO}_execucao_timestamp_segundos gauge",
+        f'{PREFIXO}_execucao_timestamp_segundos{{job="{job}"}} {time.time():.0f}',
+    ]
+    metricas = sorted({k for agg in por_fase.values() for k in agg})
+    for metrica in metricas:
+        nome = f"{PREFIXO}_fase_{metrica}"
+        linhas.append(f"# HELP {nome} {metrica} por fase na última execução.")
+        linhas.append(f"# TYPE {nome} gauge")
+        for fase, agg in sorted(por_fase.items()):
+            if metrica in agg:
+                linhas.append(f'{nome}{{job="{job}",fase="{_rotulo(fase)}"}} {agg[metrica]}')
+
+    os.makedirs(prom_dir, exist_ok=True)
+    destino = os.path.join(prom_dir, f"{PREFIXO}_{ex.job}.prom")
+    # O node_exporter pode ler a qualquer momento: grava em .tmp e renomeia
+    tmp = f"{destino}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(linhas) + "\n")
+    os.replace(tmp, destino)
@@ -0,0 +1,200 @@
+# Publicação dos artefatos gerados (PNG do resumo, PDFs de rel/) em um
+# repositório Git, fora do caminho crítico da renderização: os arquivos entram
+# numa fila, uma thread junta o que chegou em um único commit (ignorando os que
+# não mudaram, por hash) e faz o push com novas tentativas.
+import atexit
+import hashlib
+import os
+import queue
+import shutil
+import threading
+import time
+
+from dotenv import load_dotenv
+from git import Repo
+
+load_dotenv()
+
+REPO_DIR = os.getenv("ENTRADAS_REPO_DIR", "/home/ubuntu/repositorios/entradas_moya")
+# Espera (s) por mais artefatos antes de commitar o lote
+JANELA_LOTE = float(os.getenv("GIT_JANELA_LOTE", "2"))
+TENTATIVAS_PUSH = int(os.getenv("GIT_TENTATIVAS_PUSH", "5"))
+# Tempo máximo (s) que o processo espera a fila esvaziar ao sair
+ESPERA_SAIDA = float(os.getenv("GIT_ESPERA_SAIDA", "120"))
+
+
+def _sha1_blob(caminho):
+    # Mesmo hash que o git dá ao conteúdo (git hash-object)
+    with open(caminho, "rb") as f:
+        dados = f.read()
+    h = hashlib.sha1(b"blob %d\0" % len(dados))
+    h.update(dados)
+    return h.hexdigest()
+
+
+class PublicadorGit:
+    """
+    publicar(caminho) só enfileira e retorna. A thread de fundo:
+      1. espera JANELA_LOTE segundos por outros artefatos;
+      2. copia para o repositório os que estão fora dele;
+      3. descarta os idênticos ao HEAD (hash do blob);
+      4. faz um commit com todos e o push, com backoff exponencial.
+    Push que falhou em todas as tentativas fica pendente e é refeito no
+    próximo lote (o commit local não se perde).
+    """
+
+    def __init__(self, repo_dir=REPO_DIR, remote="origin", janela=JANELA_LOTE,
+                 tentativas=TENTATIVAS_PUSH, espera_inicial=2.0, mensagem="Atualização entradas MOYA"):
+        self.repo = Repo(repo_dir)
+        self.raiz = os.path.abspath(self.repo.working_tree_dir)
+        self.remote = remote
+        self.janela = janela
+        self.tentativas = tentativas
+        self.espera_inicial = espera_inicial
+        self.mensagem = mensagem
+        self._fila = queue.Queue()
+        self._push_pendente = False
+        self._ultimo_hash = {}
+        self.stats = {"commits": 0, "pushes": 0, "falhas_push": 0, "sem_mudanca": 0}
+        self._thread = threading.Thread(target=self._loop, name="publicador-git", daemon=True)
+        self._thread.start()
+
+    def _destino(self, caminho, destino=None):
+        if destino:
+            return destino
+        caminho = os.path.abspath(caminho)
+        if caminho.startswith(self.raiz + os.sep):
+            return os.path.relpath(caminho, self.raiz)
+        relativo = os.path.relpath(caminho)
+        return relativo if not relativo.startswith("..") else os.path.basename(caminho)
+
+    def publicar(self, caminho, destino=None):
+        """
+        Enfileira caminho para publicação em destino (relativo à raiz do
+        repositório; padrão: o mesmo caminho relativo, ou o nome do arquivo).
+        """
+        self._fila.put((os.path.abspath(caminho), self._destino(caminho, destino)))
+
+    def aguardar(self, timeout=None):
+        """
+        Bloqueia até a fila ser processada (commit + push). True se esvaziou no prazo.
+        """
+        fim = None if timeout is None else time.monotonic() + timeout
+        with self._fila.all_tasks_done:
+            while self._fila.unfinished_tasks:
+                restante = None if fim is None else fim - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return False
+                self._fila.all_tasks_done.wait(restante)
+        return True
+
+    def _loop(self):
+        while True:
+            lote = [self._fila.get()]
+            # Junta o que chegar na janela em um commit só
+            limite = time.monotonic() + self.janela
+            while True:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._fila.get(timeout=restante))
+                except queue.Empty:
+                    break
+            try:
+                self._processar(lote)
+            except Exception as e:
+                print(f"Erro ao publicar no Git: {e}")
+            finally:
+                for _ in lote:
+                    self._fila.task_done()
+
+    def _no_head(self, destino):
+        try:
+            return self.repo.git.rev_parse(f"HEAD:{destino}")
+        except Exception:
+            return None
+
+    def _processar(self, lote):
+        # Último pedido de cada destino vence
+        por_destino = {}
+        for origem, destino in lote:
+            por_destino[destino] = origem
+
+        alterados = []
+        for destino, origem in por_destino.items():
+            alvo = os.path.join(self.raiz, destino)
+            if os.path.abspath(origem) != os.path.abspath(alvo):
+                os.makedirs(os.path.dirname(alvo), exist_ok=True)
+                shutil.copyfile(origem, alvo)
+            digest = _sha1_blob(alvo)
+            if self._ultimo_hash.get(destino) == digest or self._no_head(destino) == digest:
+                self._ultimo_hash[destino] = digest
+                self.stats["sem_mudanca"] += 1
+                continue
+            alterados.append((destino, digest))
+
+        if alterados:
+            self.repo.index.add([d for d, _ in alterados])
+            nomes = ", ".join(d for d, _ in alterados[:5])
+            extra = f" (+{len(alterados) - 5})" if len(alterados) > 5 else ""
+            self.repo.index.commit(f"{self.mensagem}: {nomes}{extra}")
+            self.stats["commits"] += 1
+            for destino, digest in alterados:
+                self._ultimo_hash[destino] = digest
+            self._push_pendente = True
+            print(f"Commit com {len(alterados)} artefato(s) ({len(por_destino) - len(alterados)} sem alteração)")
+        else:
+            print(f"Nada a publicar: {len(por_destino)} artefato(s) sem alteração")
+
+        if self._push_pendente:
+            self._push()
+
+    def _push(self):
+        espera = self.espera_inicial
+        for tentativa in range(1, self.tentativas + 1):
+            try:
+                resultados = self.repo.remote(name=self.remote).push()
+                # GitPython não levanta erro para push rejeitado: confere as flags
+                if any(r.flags & r.ERROR for r in resultados):
+                    raise RuntimeError("; ".join(r.summary.strip() for r in resultados))
+                self._push_pendente = False
+                self.stats["pushes"] += 1
+                print("Arquivo(s) enviado(s) para o GitHub com sucesso!")
+                return True
+            except Exception as e:
+                self.stats["falhas_push"] += 1
+                print(f"Erro ao enviar para o GitHub (tentativa {tentativa}/{self.tentativas}): {e}")
+                if tentativa < self.tentativas:
+                    time.sleep(espera)
+                    espera = min(espera * 2, 60.0)
+        return False
+
+
+_publicadores = {}
+_lock = threading.Lock()
+
+
+def get_publicador(repo_dir=REPO_DIR):
+    """
+    Publicador compartilhado do processo para repo_dir (criado no primeiro uso).
+    """
+    repo_dir = os.path.abspath(repo_dir)
+    with _lock:
+        pub = _publicadores.get(repo_dir)
+        if pub is None:
+            pub = PublicadorGit(repo_dir)
+            _publicadores[repo_dir] = pub
+        return pub
+
+
+def aguardar_publicacoes(timeout=ESPERA_SAIDA):
+    """
+    Espera as filas de todos os publicadores do processo (usado ao sair).
+    """
+    for pub in list(_publicadores.values()):
+        if not pub.aguardar(timeout):
+            print(f"Publicação Git não concluiu em {timeout:.0f}s; pendências ficam para a próxima execução.")
+
+
+atexit.register(aguardar_publicacoes)
@@ -0,0 +1,237 @@
+import os
+import sqlite3
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from dotenv import load_dotenv
+
+from consultas_os import (EXCLUIR_NOMES_RELATORIO, EXCLUIR_NOMES_RESUMO, condicoes_excluir_nomes, executar,
+                          montar_consulta)
+
+load_dotenv()
+
+# Snapshot local (SQLite) das entradas de OS já com o join
+# osordem/cadastro/osequipamentos/ceprodutos/celinhas/vendedores aplicado.
+# Os filtros de nome (JCC, LOG ...) NÃO são aplicados aqui: cada relatório
+# aplica os seus na leitura.
+SNAPSHOT_DB = os.getenv("OS_SNAPSHOT_DB", "snapshot_os.sqlite")
+
+# Janela (em dias de abertura) re-sincronizada a cada execução para
+# capturar mudanças de situação/vendedor em OS recentes.
+RECHECK_DIAS = int(os.getenv("OS_SNAPSHOT_RECHECK_DIAS", "45"))
+
+COLUNAS = [
+    "ordem", "situacao", "desc_situacao_base", "linha", "descricao_linha",
+    "abertura", "cadastro", "nome", "produto", "desc_equipamento",
+    "prev_conclusao", "vendedor", "nomered_vendedor", "vendedor_interno",
+    "nomered_vend_interno", "filial",
+]
+
+_SELECT_REMOTO = """
+    SELECT o.ordem, o.situacao, s.descricao,
+           p.linha, REPLACE(L.descricao, 'REMESSA RETORNO - ', ''),
+           o.abertura, o.cadastro, t.nome,
+           e.produto, e.descricao,
+           CAST(o.Ent_Prev AS DATE),
+           o.vendedor, v.nomered,
+           t.vendedortmk, v2.nomered,
+           o.filial"""
+
+_DDL = """
+CREATE TABLE IF NOT EXISTS entradas (
+    ordem INTEGER PRIMARY KEY,
+    situacao TEXT,
+    desc_situacao_base TEXT,
+    linha TEXT,
+    descricao_linha TEXT,
+    abertura DATE,
+    cadastro INTEGER,
+    nome TEXT,
+    produto TEXT,
+    desc_equipamento TEXT,
+    prev_conclusao DATE,
+    vendedor INTEGER,
+    nomered_vendedor TEXT,
+    vendedor_interno INTEGER,
+    nomered_vend_interno TEXT,
+    filial INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_entradas_abertura ON entradas (abertura);
+CREATE TABLE IF NOT EXISTS sync_meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+
+def _parse_date(raw):
+    # Colunas DATE podem guardar data ou timestamp (o.abertura vem como vier do Firebird)
+    s = raw.decode()
+    return datetime.fromisoformat(s) if len(s) > 10 else date.fromisoformat(s)
+
+
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_adapter(datetime, lambda d: d.isoformat(sep=" "))
+sqlite3.register_converter("DATE", _parse_date)
+
+
+def open_snapshot(path=SNAPSHOT_DB):
+    """
+    Abre (e cria, se preciso) o snapshot local.
+    """
+    con = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES)
+    # LIKE do Firebird diferencia maiúsculas/minúsculas
+    con.execute("PRAGMA case_sensitive_like = ON")
+    con.executescript(_DDL)
+    return con
+
+
+def _normaliza(row):
+    # Decimal do fdb -> int/float para o SQLite
+    out = []
+    for v in row:
+        if isinstance(v, Decimal):
+            v = int(v) if v == v.to_integral_value() else float(v)
+        out.append(v)
+    return out
+
+
+def _fetch_remoto(fb_conn, filtro, params, batch_size=2000):
+    cur = executar(fb_conn, *montar_consulta(_SELECT_REMOTO, where=(filtro,), params=params))
+    while True:
+        batch = cur.fetchmany(batch_size)
+        if not batch:
+            break
+        yield [_normaliza(row) for row in batch]
+
+
+def sync_snapshot(fb_conn, snap=None, recheck_dias=RECHECK_DIAS, hoje=None):
+    """
+    Sincronização incremental a partir do Firebird:
+      1. OS novas: o.ordem > MAX(ordem) local (watermark);
+      2. janela recente: abertura >= hoje - recheck_dias é apagada e
+         recarregada, pegando mudanças de situação e OS removidas.
+    Na primeira execução (snapshot vazio) carrega tudo.
+    Retorna dict com contagens {"novas": n, "recheck": n}.
+    """
+    own = snap is None
+    snap = snap or open_snapshot()
+    hoje = hoje or date.today()
+    desde = hoje - timedelta(days=recheck_dias)
+    placeholders = ", ".join("?" for _ in COLUNAS)
+    insert = f"INSERT OR REPLACE INTO entradas ({', '.join(COLUNAS)}) VALUES ({placeholders})"
+    stats = {"novas": 0, "recheck": 0}
+    try:
+        watermark = snap.execute("SELECT COALESCE(MAX(ordem), 0) FROM entradas").fetchone()[0]
+        with snap:
+            if watermark:
+                snap.execute("DELETE FROM entradas WHERE abertura >= ?", (desde,))
+                for batch in _fetch_remoto(fb_conn, "o.abertura >= ?", (desde,)):
+                    snap.executemany(insert, batch)
+                    stats["recheck"] += len(batch)
+            for batch in _fetch_remoto(fb_conn, "o.ordem > ?", (watermark,)):
+                snap.executemany(insert, batch)
+                stats["novas"] += len(batch)
+            snap.execute("INSERT OR REPLACE INTO sync_meta (chave, valor) VALUES ('ultima_sync', ?)",
+                         (datetime.now().isoformat(timespec="seconds"),))
+    finally:
+        if own:
+            snap.close()
+    print(f"Snapshot sincronizado: {stats['novas']} OS novas, {stats['recheck']} revalidadas "
+          f"(abertura >= {desde.isoformat()}).")
+    return stats
+
+
+# ------------ leitura no formato de cada relatório ------------
+def _excluir_nomes(padroes):
+    # Mesmos filtros de nome das consultas ao Firebird (consultas_os.EXCLUIR_NOMES_*)
+    return " ".join(f"AND {c}" for c in condicoes_excluir_nomes(padroes, coluna="nome"))
+
+
+_SQL_DETALHE = """
+    SELECT situacao,
+           CASE situacao
+             WHEN '90' THEN 'Cancelado'
+             WHEN '99' THEN 'Encerrado'
+             ELSE desc_situacao_base
+           END,
+           descricao_linha,
+           ordem, abertura, cadastro, nome,
+           produto, desc_equipamento,
+           prev_conclusao,
+           vendedor || ' - ' || nomered_vendedor,
+           vendedor_interno || ' - ' || nomered_vend_interno
+           {chaves}
+      FROM entradas
+     WHERE abertura BETWEEN ? AND ?
+       {excluir}
+"""
+
+
+def iter_detalhe(snap, dt_ini, dt_fim, vendedor=None, com_chaves=False, batch_size=2000):
+    """
+    Mesmas colunas/ordem de gerar_relatorios_os.get_data_from_firebird, lidas
+    do snapshot (com_chaves=True acrescenta vendedor, linha e nome reduzido).
+    """
+    chaves = ", vendedor, linha, COALESCE(nomered_vendedor, '')" if com_chaves else ""
+    sql = _SQL_DETALHE.format(chaves=chaves, excluir=_excluir_nomes(EXCLUIR_NOMES_RELATORIO))
+    params = [dt_ini, dt_fim]
+    if vendedor is not None:
+        sql += " AND vendedor = ?"
+        params.append(vendedor)
+    sql += " ORDER BY situacao, ordem"
+    cur = snap.execute(sql, params)
+    while True:
+        batch = cur.fetchmany(batch_size)
+        if not batch:
+            break
+        yield from batch
+
+
+def load_detalhe(snap, dt_ini, dt_fim, vendedor=None, com_chaves=False):
+    return list(iter_detalhe(snap, dt_ini, dt_fim, vendedor=vendedor, com_chaves=com_chaves))
+
+
+def list_vendedores(snap, dt_ini, dt_fim):
+    """
+    Equivalente a gerar_relatorios_os.list_vendedores sobre o snapshot.
+    """
+    return snap.execute("""
+        SELECT DISTINCT vendedor, COALESCE(nomered_vendedor, '')
+          FROM entradas
+         WHERE abertura BETWEEN ? AND ?
+         ORDER BY 1
+    """, (dt_ini, dt_fim)).fetchall()
+
+
+def load_semanas_linha(snap, dt_ini, dt_fim, linhas=None, por_filial_vendedor=False):
+    """
+    Equivalente a consultas_os.SELECT_SEMANAS_LINHA sobre o snapshot:
+    (linha, sem01..sem05, total) por linha, com o filtro de nomes do resumo.
+    por_filial_vendedor=True equivale a SELECT_SEMANAS_FILIAL_VENDEDOR:
+    (filial, vendedor, nome_vendedor, linha, sem01..sem05, total).
+    """
+    chaves = "filial, vendedor, nomered_vendedor, linha" if por_filial_vendedor else "linha"
+    sql = """
+        SELECT {colunas},
+               SUM(CASE WHEN dia BETWEEN 1 AND 7 THEN 1 ELSE 0 END),
+               SUM(CASE WHEN dia BETWEEN 8 AND 14 THEN 1 ELSE 0 END),
+               SUM(CASE WHEN dia BETWEEN 15 AND 21 THEN 1 ELSE 0 END),
+               SUM(CASE WHEN dia BETWEEN 22 AND 28 THEN 1 ELSE 0 END),
+               SUM(CASE WHEN dia >= 29 THEN 1 ELSE 0 END),
+               COUNT(produto)
+          FROM (SELECT {chaves}, produto, CAST(strftime('%d', abertura) AS INTEGER) AS dia
+                  FROM entradas
+                 WHERE abertura BETWEEN ? AND ?
+                   {excluir}{filtro_linhas})
+         GROUP BY {chaves}
+    """
+    params = [dt_ini, dt_fim]
+    filtro_linhas = ""
+    if linhas:
+        filtro_linhas = " AND linha IN (%s)" % ", ".join("?" for _ in linhas)
+        params += list(linhas)
+    colunas = chaves.replace("nomered_vendedor", "COALESCE(nomered_vendedor, '')")
+    sql = sql.format(colunas=colunas, chaves=chaves, excluir=_excluir_nomes(EXCLUIR_NOMES_RESUMO),
+                     filtro_linhas=filtro_linhas)
+    return snap.execute(sql, params).fetchall()
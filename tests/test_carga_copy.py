@@ -0,0 +1,48 @@
+from types import SimpleNamespace
+
+import pandas as pd
+
+from carga_copy import ler_copy
+
+
+class _CursorFalso:
+    # CSV como o Postgres escreve com NULL '\N': NULL sem aspas, '' entre aspas
+    CSV = b'id,nome,ativo\n1,\\N,t\n2,"",f\n3,abc,\\N\n'
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.description = [SimpleNamespace(name="id", type_code=23), SimpleNamespace(name="nome", type_code=25),
+                            SimpleNamespace(name="ativo", type_code=16)]
+
+    def copy_expert(self, sql, arquivo):
+        self.conn.sql_copy = sql
+        arquivo.write(self.CSV if "NULL '\\N'" in sql else self.CSV.replace(b"\\N", b""))
+
+
+class _ConexaoFalsa:
+    sql_copy = None
+
+    def cursor(self):
+        return _CursorFalso(self)
+
+
+def test_copy_distingue_null_de_string_vazia():
+    conn = _ConexaoFalsa()
+
+    df = ler_copy(conn, "SELECT id, nome, ativo FROM t")
+
+    assert "NULL '\\N'" in conn.sql_copy
+    assert pd.isna(df.loc[0, "nome"])
+    assert df.loc[1, "nome"] == ""
+    assert df.loc[2, "nome"] == "abc"
+    assert df["ativo"].tolist()[:2] == [True, False] and pd.isna(df.loc[2, "ativo"])
+    assert str(df["id"].dtype) == "Int64"
@@ -0,0 +1,47 @@
+from datetime import date, datetime
+
+import exportar_os
+
+
+class _Cursor:
+    def __init__(self, linhas):
+        self.linhas = list(linhas)
+        self.params = None
+
+    def execute(self, sql, params=()):
+        self.params = params
+
+    def fetchmany(self, n):
+        lote, self.linhas = self.linhas[:n], self.linhas[n:]
+        return lote
+
+
+class _Conn:
+    def __init__(self, linhas=()):
+        self.cur = _Cursor(linhas)
+
+    def cursor(self):
+        return self.cur
+
+
+def _linha(ordem, vendedor):
+    linha = [None] * len(exportar_os.CABECALHO)
+    linha[3] = ordem
+    linha[exportar_os.IDX_VENDEDOR] = vendedor
+    return tuple(linha)
+
+
+def test_exportacao_sem_linhas_nao_gera_arquivos(tmp_path):
+    arquivos, total = exportar_os.exportar_entradas(_Conn(), date(2025, 8, 3), date(2025, 8, 9), tmp_path)
+
+    assert (arquivos, total) == ([], 0)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_exportacao_gera_geral_e_vendedores_com_linhas(tmp_path):
+    conn = _Conn([_linha(1, 17), _linha(2, 5), _linha(3, None)])
+    arquivos, total = exportar_os.exportar_entradas(conn, date(2025, 8, 3), date(2025, 8, 9), tmp_path,
+                                                    filtro_ids={17, 29}, batch_size=2)
+
+    assert total == 3
+    assert [p.rsplit("/", 1)[-1] for p in arquivos] == ["rel_GERAL.csv", "rel_17.csv"]
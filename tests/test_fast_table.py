@@ -0,0 +1,41 @@
+from reportlab.lib import colors
+
+from fast_table import FastTable
+
+BRANCO, CINZA = colors.HexColor("#FFFFFF"), colors.HexColor("#F7F7F7")
+
+
+class _Canvas:
+    """Registra a cor de cada retângulo de fundo desenhado."""
+
+    def __init__(self):
+        self.cor = None
+        self.fundos = []
+
+    def setFillColor(self, cor):
+        self.cor = cor
+
+    def rect(self, *args, **kwargs):
+        self.fundos.append(self.cor)
+
+    def __getattr__(self, nome):
+        return lambda *args, **kwargs: None
+
+
+def _fundos_das_linhas(tabela):
+    tabela.wrap(500, 1000)
+    tabela.canv = _Canvas()
+    tabela.draw()
+    return tabela.canv.fundos[1:]  # o primeiro é o cabeçalho
+
+
+def test_zebra_recomeca_em_cada_pagina():
+    rows = [[str(i), "x"] for i in range(5)]
+    tabela = FastTable(rows, [100, 100], ["A", "B"], row_backgrounds=(BRANCO, CINZA))
+    layout = tabela._layout
+    # Cabe só o cabeçalho e 3 linhas: a segunda página começa na linha 3
+    altura = layout.header_height + layout.offsets[3] + 0.5
+    primeira, segunda = tabela.split(500, altura)
+
+    assert _fundos_das_linhas(primeira) == [BRANCO, CINZA, BRANCO]
+    assert _fundos_das_linhas(segunda) == [BRANCO, CINZA]
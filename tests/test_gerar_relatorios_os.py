@@ -0,0 +1,33 @@
+from datetime import datetime
+
+import pytest
+
+import gerar_relatorios_os as rel
+
+
+@pytest.fixture
+def limites(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    capturados = {}
+
+    def exportar(conn, inicio, fim, out_dir, **kwargs):
+        capturados["exportacao"] = (inicio, fim)
+        return [], 0
+
+    def jobs(conn, inicio, fim, *args, **kwargs):
+        capturados["pdf"] = (inicio, fim)
+        return []
+
+    monkeypatch.setattr(rel.exportar_os, "exportar_entradas", exportar)
+    monkeypatch.setattr(rel, "jobs_modo_unico", jobs)
+    monkeypatch.setattr(rel, "render_pdfs", lambda *args, **kwargs: ([], []))
+    return capturados
+
+
+def test_pdf_e_exportacao_usam_o_mesmo_limite_final(limites):
+    datas = ["--dt-ini", "2025-08-03", "--dt-fim", "2025-08-09"]
+    rel.executar_relatorios(None, rel.parse_args(datas + ["--modo", "unico"]))
+    rel.executar_relatorios(None, rel.parse_args(datas + ["--formato", "csv"]))
+
+    assert limites["pdf"] == limites["exportacao"]
+    assert limites["pdf"][1] == datetime(2025, 8, 9, 23, 59, 59, 999999)
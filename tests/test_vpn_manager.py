@@ -0,0 +1,26 @@
+import vpn_manager
+
+
+def _sem_novo_daemon(monkeypatch):
+    chamadas = []
+    monkeypatch.setattr(vpn_manager.subprocess, "run", lambda *a, **k: chamadas.append(a))
+    monkeypatch.setattr(vpn_manager, "_pids_openvpn", lambda: ["123"])
+    monkeypatch.setattr(vpn_manager, "tunnel_ativo", lambda host=None: False)
+    return chamadas
+
+
+def test_start_vpn_aguarda_openvpn_em_execucao(monkeypatch):
+    chamadas = _sem_novo_daemon(monkeypatch)
+    monkeypatch.setattr(vpn_manager, "aguardar_tunel", lambda deadline=None, host=None: 0.5)
+
+    assert vpn_manager.start_vpn() is True
+    assert chamadas == []
+    assert vpn_manager._iniciada_aqui is False
+
+
+def test_start_vpn_openvpn_em_execucao_sem_tunel_no_prazo(monkeypatch):
+    chamadas = _sem_novo_daemon(monkeypatch)
+    monkeypatch.setattr(vpn_manager, "aguardar_tunel", lambda deadline=None, host=None: None)
+
+    assert vpn_manager.start_vpn() is False
+    assert chamadas == []
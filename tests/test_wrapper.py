@@ -0,0 +1,21 @@
+import appconfig
+from wrapper import DataWrapper
+
+
+def test_carregar_todos_sem_consultas_configuradas(monkeypatch):
+    # Nenhuma QUERY_* no .env: cada consulta vira erro próprio, sem derrubar o lote
+    for nome in ("QUERY_PAGAMENTO", "QUERY_GROUP_GEF", "QUERY_GROUP_EMPENHO", "QUERY_DATA_VENCIMENTO"):
+        monkeypatch.setattr(appconfig, nome, None)
+
+    dfs, erros = DataWrapper.carregar_todos()
+
+    assert dfs == {}
+    assert sorted(erros) == ["empenho", "gef", "pagamentos", "vencimento"]
+    assert all(isinstance(e, ValueError) for e in erros.values())
+
+
+def test_carregar_lote_aceita_query_e_banco():
+    dfs, erros = DataWrapper.carregar_lote({"a": None, "b": [None, "datatalk"]})
+
+    assert dfs == {}
+    assert all(isinstance(e, ValueError) for e in erros.values())
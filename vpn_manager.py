@@ -1,39 +1,159 @@
 import subprocess
 import os
+import socket
 import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+VPN_CONFIG = "/home/ubuntu/vpn_moya/VPN-UDP4-1200-dataguvi-moya-config.ovpn"
+FB_PORT = 3050
+
+# Prazo total (s) para o túnel responder após iniciar o daemon
+VPN_DEADLINE = float(os.getenv("VPN_DEADLINE", "30"))
+
+# True quando start_vpn subiu o daemon neste processo (e não reaproveitou um túnel)
+_iniciada_aqui = False
+
+
+def _interface_tun():
+    """
+    Retorna o nome da primeira interface tun/tap ativa, ou None.
+    """
+    try:
+        nomes = os.listdir("/sys/class/net")
+    except OSError:
+        return None
+    for nome in sorted(nomes):
+        if not nome.startswith(("tun", "tap")):
+            continue
+        try:
+            with open(f"/sys/class/net/{nome}/operstate") as f:
+                estado = f.read().strip()
+        except OSError:
+            continue
+        # tun costuma reportar "unknown" mesmo ativa
+        if estado in ("up", "unknown"):
+            return nome
+    return None
+
+
+def _rota_para(host):
+    """
+    True se o kernel roteia host por uma interface tun/tap.
+    """
+    if not host:
+        return False
+    try:
+        result = subprocess.run(["ip", "route", "get", host], capture_output=True, text=True, timeout=2)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return result.returncode == 0 and any(f" dev {p}" in result.stdout for p in ("tun", "tap"))
+
+
+def probe_firebird(host=None, port=FB_PORT, timeout=1.0):
+    """
+    Tenta um connect TCP em host:port (Firebird). True se aceitou.
+    """
+    host = host or os.getenv("DT_HOST")
+    if not host:
+        return False
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def tunnel_ativo(host=None):
+    """
+    Túnel utilizável: interface tun/tap de pé (ou rota por ela) e Firebird respondendo.
+    """
+    host = host or os.getenv("DT_HOST")
+    return (_interface_tun() is not None or _rota_para(host)) and probe_firebird(host)
+
+
+def _pids_openvpn():
+    cmd = ["pgrep", "-f", f"openvpn.*{os.path.basename(VPN_CONFIG)}"]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    return [pid.strip() for pid in result.stdout.split()] if result.stdout else []
+
+
+def aguardar_tunel(deadline=VPN_DEADLINE, host=None):
+    """
+    Espera ativa até o túnel responder: aguarda a interface/rota e então faz
+    probes TCP em DT_HOST:3050 com backoff exponencial (0.1s .. 1s), até o
+    prazo total. Retorna o tempo decorrido em segundos, ou None se estourou.
+    """
+    host = host or os.getenv("DT_HOST")
+    inicio = time.monotonic()
+    espera = 0.1
+    t_interface = None
+    while True:
+        agora = time.monotonic() - inicio
+        if t_interface is None and (_interface_tun() is not None or _rota_para(host)):
+            t_interface = agora
+            print(f"Interface do túnel disponível em {t_interface:.2f}s")
+        if t_interface is not None and probe_firebird(host, timeout=min(1.0, max(0.1, deadline - agora))):
+            return time.monotonic() - inicio
+        if time.monotonic() - inicio + espera > deadline:
+            return None
+        time.sleep(espera)
+        espera = min(espera * 2, 1.0)
+
 
 def start_vpn():
     """
     Inicia a conexão VPN usando o OpenVPN
     """
+    global _iniciada_aqui
+    inicio = time.monotonic()
+
+    # OpenVPN já rodando (outro processo/execução): reaproveita sem novo daemon;
+    # se o túnel ainda está subindo, espera por ele no mesmo prazo
+    if _pids_openvpn():
+        if tunnel_ativo():
+            print(f"VPN já conectada; reaproveitando túnel ({time.monotonic() - inicio:.2f}s)")
+            return True
+        print("OpenVPN já em execução; aguardando o túnel subir")
+        decorrido = aguardar_tunel()
+        if decorrido is None:
+            print(f"VPN não respondeu em {VPN_DEADLINE:.0f}s ({os.getenv('DT_HOST')}:{FB_PORT})")
+            return False
+        print(f"VPN pronta em {time.monotonic() - inicio:.2f}s (túnel existente)")
+        return True
+
     try:
         # Comando para iniciar a VPN
-        cmd = ["sudo", "openvpn", "--config", "/home/ubuntu/vpn_moya/VPN-UDP4-1200-dataguvi-moya-config.ovpn", "--daemon"]
-        
+        cmd = ["sudo", "openvpn", "--config", VPN_CONFIG, "--daemon"]
+
         # Executa o comando
         subprocess.run(cmd, check=True)
+        _iniciada_aqui = True
         print("VPN iniciada com sucesso")
-        
-        # Aguarda alguns segundos para a conexão se estabelecer
-        time.sleep(5)
-        return True
-        
+
     except subprocess.CalledProcessError as e:
         print(f"Erro ao iniciar VPN: {e}")
         return False
 
+    # Aguarda o túnel de fato responder (em vez de um sleep fixo)
+    decorrido = aguardar_tunel()
+    if decorrido is None:
+        print(f"VPN não respondeu em {VPN_DEADLINE:.0f}s ({os.getenv('DT_HOST')}:{FB_PORT})")
+        return False
+    print(f"VPN pronta em {time.monotonic() - inicio:.2f}s (Firebird respondeu após {decorrido:.2f}s)")
+    return True
+
 def stop_vpn():
     """
     Para a conexão VPN matando o processo OpenVPN
     """
     try:
         # Procura por processos OpenVPN com o arquivo de configuração específico
-        cmd = ["pgrep", "-f", "openvpn.*VPN-UDP4-1200-dataguvi-moya-config.ovpn"]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.stdout:
+        pids = _pids_openvpn()
+
+        if pids:
             # Se encontrou processos, mata cada um deles
-            pids = result.stdout.strip().split('\n')
             print("Desconectando VPN com PIDs:")
             print('\n'.join(pids))
             
@@ -51,6 +171,17 @@ def stop_vpn():
         print(f"Erro ao parar VPN: {e}")
         return False
 
+def stop_vpn_se_iniciada():
+    """
+    Para a VPN apenas se este processo a iniciou (para uso em atexit):
+    um túnel reaproveitado continua de pé para quem o abriu.
+    """
+    global _iniciada_aqui
+    if _iniciada_aqui:
+        _iniciada_aqui = False
+        return stop_vpn()
+    return False
+
 if __name__ == "__main__":
     import sys
     
@@ -1,8 +1,14 @@
 import appconfig as cfg
 import pandas as pd
 import logging
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+import cache_consultas
+import metricas
+from carga_copy import iter_copy, ler_copy
 from dotenv import load_dotenv
-from conn_pstg import start_connection_datalake, start_connection_datatalk
+from conn_pstg import PG_POOL_MAX, PG_POOL_TIMEOUT, conexao
 
 load_dotenv()
 logger = logging.getLogger(cfg.APP_NAME)
@@ -10,29 +16,152 @@ logger = logging.getLogger(cfg.APP_NAME)
 class DataWrapper:
 
     @staticmethod
-    def get_reports_pagamentos():
-        conn = start_connection_datalake()           
-        df = pd.read_sql_query(cfg.QUERY_PAGAMENTO, conn)
-        df = pd.DataFrame(df)
-        return df
-    
-    @staticmethod
-    def get_group_gef():
-        conn = start_connection_datalake()           
-        df = pd.read_sql_query(cfg.QUERY_GROUP_GEF, conn)
-        df = pd.DataFrame(df)
-        return df
-    
-    @staticmethod
-    def get_group_empenho():
-        conn = start_connection_datalake()           
-        df = pd.read_sql_query(cfg.QUERY_GROUP_EMPENHO, conn)
-        df = pd.DataFrame(df)
-        return df
-    
-    @staticmethod
-    def get_data_venc():
-        conn = start_connection_datalake()           
-        df = pd.read_sql_query(cfg.QUERY_DATA_VENCIMENTO, conn)
-        df = pd.DataFrame(df)
-        return df
+    def _ler(query, banco="datalake", timeout=None, params=None, cache_ttl=None,
+             copy=False, dtypes=None, chunksize=None):
+        """
+        Lê query em um DataFrame. Opções (também aceitas pelos get_*):
+          cache_ttl (s): reaproveita um resultado igual (mesma query/params/banco
+            e mesmos copy/dtypes) gravado em disco há menos de cache_ttl;
+          copy=True: carga via COPY TO STDOUT (carga_copy), com dtypes explícitos
+            sobrepondo os inferidos;
+          chunksize: devolve um iterador de DataFrames (sempre via COPY, sem cache),
+            para resultados maiores que a memória.
+        """
+        if not query:
+            raise ValueError("Consulta não configurada (QUERY_* no .env; ver appconfig)")
+        if chunksize:
+            return DataWrapper._iter_ler(query, banco, timeout, params, dtypes, chunksize)
+
+        with metricas.span("datawrapper", banco=banco, copy=bool(copy)) as s:
+            # copy e dtypes mudam os tipos das colunas: entram na chave do cache
+            opcoes = {"copy": bool(copy), "dtypes": dtypes}
+            if cache_ttl:
+                df = cache_consultas.obter(query, params, banco, opcoes=opcoes)
+                if df is not None:
+                    s.contar(cache="hit", linhas=len(df))
+                    return df
+                s.contar(cache="miss")
+
+            # Conexão emprestada do pool e devolvida ao fim da leitura
+            with conexao(banco) as conn:
+                DataWrapper._aplicar_timeout(conn, timeout)
+                if copy:
+                    df = ler_copy(conn, query, params, dtypes)
+                else:
+                    df = pd.read_sql_query(query, conn, params=params, dtype=dtypes)
+            df = pd.DataFrame(df)
+            s.contar(linhas=len(df))
+
+            if cache_ttl:
+                try:
+                    cache_consultas.gravar(df, query, params, banco, ttl=cache_ttl, opcoes=opcoes)
+                except Exception as e:
+                    logger.warning("Falha ao gravar cache: %s", e)
+            return df
+
+    @staticmethod
+    def _aplicar_timeout(conn, timeout):
+        if timeout:
+            # SET LOCAL vale só para esta transação (desfeita na devolução ao pool)
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL statement_timeout = %s", (int(timeout * 1000),))
+
+    @staticmethod
+    def _iter_ler(query, banco, timeout, params, dtypes, chunksize):
+        # A conexão fica emprestada até o fim (ou abandono) da iteração
+        with conexao(banco) as conn:
+            DataWrapper._aplicar_timeout(conn, timeout)
+            yield from iter_copy(conn, query, params, dtypes, chunksize=chunksize)
+
+    @staticmethod
+    def get_reports_pagamentos(**opcoes):
+        return DataWrapper._ler(cfg.QUERY_PAGAMENTO, **opcoes)
+
+    @staticmethod
+    def get_group_gef(**opcoes):
+        return DataWrapper._ler(cfg.QUERY_GROUP_GEF, **opcoes)
+
+    @staticmethod
+    def get_group_empenho(**opcoes):
+        return DataWrapper._ler(cfg.QUERY_GROUP_EMPENHO, **opcoes)
+
+    @staticmethod
+    def get_data_venc(**opcoes):
+        return DataWrapper._ler(cfg.QUERY_DATA_VENCIMENTO, **opcoes)
+
+    @staticmethod
+    def carregar_lote(consultas, timeout=None, max_workers=None, cache_ttl=None, copy=False):
+        """
+        Executa várias consultas em paralelo, cada uma em sua conexão do pool.
+        consultas: {nome: query} ou {nome: (query, banco)}.
+        timeout (s) vale por consulta (statement_timeout no servidor).
+        cache_ttl (s) liga o cache em disco e copy=True a carga via COPY para todas (ver _ler).
+        Uma consulta com erro não derruba as outras.
+        Retorna (dfs, erros): {nome: DataFrame} e {nome: exceção}.
+        """
+        # Só (query, banco) é desmembrado: uma query não configurada (None)
+        # chega ao _ler e vira erro dessa consulta, sem derrubar o lote
+        consultas = {nome: tuple(q) if isinstance(q, (tuple, list)) else (q, "datalake")
+                     for nome, q in consultas.items()}
+        dfs, erros = {}, {}
+        if not consultas:
+            return dfs, erros
+
+        inicio = time.monotonic()
+        workers = max_workers or min(len(consultas), PG_POOL_MAX)
+        pool = ThreadPoolExecutor(max_workers=workers)
+        try:
+            # Cada thread roda numa cópia do contexto: os spans de métricas
+            # (metricas.span) continuam ligados à execução do chamador
+            futures = {pool.submit(contextvars.copy_context().run, DataWrapper._ler, query, banco, timeout,
+                                   cache_ttl=cache_ttl, copy=copy): nome
+                       for nome, (query, banco) in consultas.items()}
+            # Folga para a espera por conexão; o corte principal é o do servidor
+            limite = None
+            if timeout:
+                lotes = -(-len(consultas) // workers)
+                limite = lotes * (timeout + PG_POOL_TIMEOUT)
+            feitos, pendentes = wait(futures, timeout=limite)
+            for fut in feitos:
+                nome = futures[fut]
+                try:
+                    dfs[nome] = fut.result()
+                except Exception as e:
+                    erros[nome] = e
+                    logger.error("Consulta %s falhou: %s", nome, e)
+            for fut in pendentes:
+                nome = futures[fut]
+                fut.cancel()
+                erros[nome] = TimeoutError(f"consulta {nome} sem resposta em {limite:g}s")
+                logger.error("Consulta %s excedeu o tempo limite", nome)
+        finally:
+            # Não espera threads presas: o resultado delas já foi descartado
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        logger.info("Lote de %d consulta(s) em %.2fs: %d ok, %d erro(s)",
+                    len(consultas), time.monotonic() - inicio, len(dfs), len(erros))
+        return dfs, erros
+
+    @staticmethod
+    def carregar_todos(timeout=None, cache_ttl=None, copy=False):
+        """
+        Os quatro conjuntos (pagamentos, gef, empenho, vencimento) em paralelo:
+        o tempo total fica o da consulta mais lenta. Retorna (dfs, erros).
+        """
+        return DataWrapper.carregar_lote({
+            "pagamentos": cfg.QUERY_PAGAMENTO,
+            "gef": cfg.QUERY_GROUP_GEF,
+            "empenho": cfg.QUERY_GROUP_EMPENHO,
+            "vencimento": cfg.QUERY_DATA_VENCIMENTO,
+        }, timeout=timeout, cache_ttl=cache_ttl, copy=copy)
+
+    @staticmethod
+    def invalidar_cache(query=None):
+        """
+        Descarta o cache de uma consulta (cfg.QUERY_*) ou todo ele.
+        """
+        return cache_consultas.invalidar(query)
+
+    @staticmethod
+    def estatisticas_cache():
+        return cache_consultas.estatisticas()